@@ -2,4 +2,12 @@
 
 from .__info__ import __version__
 
-from .hik_camera import HikCamera
+
+def __getattr__(name):
+    # Import hik_camera.hik_camera on first use of HikCamera, `import hik_camera` stays light
+    if name in ("HikCamera", "MultiHikCamera"):
+        from . import hik_camera
+
+        globals()[name] = getattr(hik_camera, name)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,228 @@
+# Generated from MvCameraNode-CH.csv by hik_camera.hik_camera.gen_nodes_py(), don't edit
+
+# key: (dtype, depend)
+nodes = {
+    "DeviceType": ("ienumeration", ""),
+    "DeviceScanType": ("ienumeration", ""),
+    "DeviceVendorName": ("istring", ""),
+    "DeviceModelName": ("istring", ""),
+    "DeviceManufacturerInfo": ("istring", ""),
+    "DeviceVersion": ("istring", ""),
+    "DeviceFirmwareVersion": ("istring", ""),
+    "DeviceSerialNumber": ("istring", ""),
+    "DeviceID": ("istring", ""),
+    "DeviceUserID": ("istring", ""),
+    "DeviceUptime": ("iinteger", ""),
+    "BoardDeviceType": ("iinteger", ""),
+    "DeviceConnectionSelector": ("iinteger", ""),
+    "DeviceConnectionSpeed": ("iinteger", ""),
+    "DeviceConnectionStatus": ("ienumeration", ""),
+    "DeviceLinkSelector": ("iinteger", ""),
+    "DeviceLinkSpeed": ("iinteger", ""),
+    "DeviceLinkConnectionCount": ("iinteger", ""),
+    "DeviceLinkHeartbeatMode": ("ienumeration", ""),
+    "DeviceLinkHeartbeatTimeout": ("iinteger", ""),
+    "DeviceStreamChannelCount": ("iinteger", ""),
+    "DeviceStreamChannelSelector": ("iinteger", ""),
+    "DeviceStreamChannelType": ("ienumeration", ""),
+    "DeviceStreamChannelLink": ("iinteger", ""),
+    "DeviceStreamChannelEndianness": ("ienumeration", ""),
+    "DeviceStreamChannelPacketSize": ("iinteger", ""),
+    "DeviceEventChannelCount": ("iinteger", ""),
+    "DeviceCharacterSet": ("ienumeration", ""),
+    "DeviceReset": ("icommand", ""),
+    "DeviceTemperatureSelector": ("ienumeration", ""),
+    "DeviceTemperature": ("ifloat", ""),
+    "FindMe": ("icommand", ""),
+    "DeviceMaxThroughput": ("iinteger", ""),
+    "WidthMax": ("iinteger", ""),
+    "HeightMax": ("iinteger", ""),
+    "RegionSelector": ("ienumeration", ""),
+    "RegionDestination": ("ienumeration", ""),
+    "Width": ("iinteger", ""),
+    "Height": ("iinteger", ""),
+    "OffsetX": ("iinteger", ""),
+    "OffsetY": ("iinteger", ""),
+    "ReverseX": ("iboolean", ""),
+    "ReverseY": ("iboolean", ""),
+    "ReverseScanDirection": ("iboolean", ""),
+    "PixelFormat": ("ienumeration", ""),
+    "PixelSize": ("ienumeration", ""),
+    "ImageCompressionMode": ("ienumeration", ""),
+    "ImageCompressionQuality": ("iinteger", ""),
+    "TestPatternGeneratorSelector": ("ienumeration", ""),
+    "TestPattern": ("ienumeration", "TestPatternGeneratorSelector"),
+    "BinningSelector": ("ienumeration", ""),
+    "BinningHorizontal": ("ienumeration", "BinningSelector"),
+    "BinningVertical": ("ienumeration", "BinningSelector"),
+    "DecimationHorizontal": ("ienumeration", ""),
+    "DecimationVertical": ("ienumeration", ""),
+    "Deinterlacing": ("ienumeration", ""),
+    "FrameSpecInfoSelector": ("ienumeration", ""),
+    "FrameSpecInfo": ("iboolean", ""),
+    "AcquisitionMode": ("ienumeration", ""),
+    "AcquisitionStart": ("icommand", ""),
+    "AcquisitionStop": ("icommand", ""),
+    "AcquisitionBurstFrameCount": ("iinteger", ""),
+    "AcquisitionFrameRate": ("ifloat", ""),
+    "AcquisitionFrameRateEnable": ("iboolean", ""),
+    "AcquisitionLineRate": ("iinteger", ""),
+    "AcquisitionLineRateEnable": ("iboolean", ""),
+    "ResultingLineRate": ("iinteger", ""),
+    "ResultingFrameRate": ("ifloat", ""),
+    "TriggerSelector": ("ienumeration", ""),
+    "TriggerMode": ("ienumeration", "TriggerSelector"),
+    "TriggerSoftware": ("icommand", "TriggerSelector"),
+    "TriggerSource": ("ienumeration", "TriggerSelector"),
+    "TriggerActivation": ("ienumeration", "TriggerSelector"),
+    "TriggerDelay": ("ifloat", "TriggerSelector"),
+    "TriggerCacheEnable": ("iboolean", ""),
+    "SensorShutterMode": ("ienumeration", ""),
+    "ExposureMode": ("ienumeration", ""),
+    "ExposureTime": ("ifloat", ""),
+    "ExposureAuto": ("ienumeration", ""),
+    "AutoExposureTimeLowerLimit": ("iinteger", ""),
+    "AutoExposureTimeUpperLimit": ("iinteger", ""),
+    "GainShutPrior": ("ienumeration", ""),
+    "FrameTimeoutEnable": ("iboolean", ""),
+    "FrameTimeoutTime": ("iinteger", ""),
+    "HDREnable": ("iboolean", ""),
+    "HDRSelector": ("iinteger", ""),
+    "HDRShuter": ("iinteger", ""),
+    "HDRGain": ("ifloat", ""),
+    "LineSelector": ("ienumeration", ""),
+    "LineMode": ("ienumeration", "LineSelector"),
+    "LineInverter": ("iboolean", "LineSelector"),
+    "LineTermination": ("iboolean", ""),
+    "LineStatus": ("iboolean", "LineSelector"),
+    "LineStatusAll": ("iinteger", ""),
+    "LineSource": ("ienumeration", "LineSelector"),
+    "StrobeEnable": ("iboolean", ""),
+    "LineDebouncerTime": ("iinteger", ""),
+    "StrobeLineDuration": ("iinteger", ""),
+    "StrobeLineDelay": ("iinteger", ""),
+    "StrobeLinePreDelay": ("iinteger", ""),
+    "CounterSelector": ("ienumeration", ""),
+    "CounterEventSource": ("ienumeration", "CounterSelector"),
+    "CounterResetSource": ("ienumeration", "CounterSelector"),
+    "CounterReset": ("icommand", "CounterSelector"),
+    "CounterValue": ("iinteger", "CounterSelector"),
+    "CounterCurrentValue": ("iinteger", ""),
+    "Gain": ("ifloat", "GainSelector"),
+    "GainAuto": ("ienumeration", "GainSelector"),
+    "AutoGainLowerLimit": ("ifloat", ""),
+    "AutoGainUpperLimit": ("ifloat", ""),
+    "ADCGainEnable": ("iboolean", ""),
+    "DigitalShift": ("ifloat", ""),
+    "DigitalShiftEnable": ("iboolean", ""),
+    "Brightness": ("iinteger", ""),
+    "BlackLevel": ("iinteger", "BlackLevelSelector"),
+    "BlackLevelEnable": ("iboolean", ""),
+    "BlackLevelAuto": ("ienumeration", "BlackLevelSelector"),
+    "BalanceWhiteAuto": ("ienumeration", ""),
+    "BalanceRatioSelector": ("ienumeration", ""),
+    "BalanceRatio": ("iinteger", "BalanceRatioSelector"),
+    "Gamma": ("ifloat", ""),
+    "GammaSelector": ("ienumeration", ""),
+    "GammaEnable": ("iboolean", ""),
+    "Sharpness": ("iinteger", ""),
+    "SharpnessEnable": ("iboolean", ""),
+    "SharpnessAuto": ("ienumeration", ""),
+    "Hue": ("iinteger", ""),
+    "HueEnable": ("iboolean", ""),
+    "HueAuto": ("ienumeration", ""),
+    "Saturation": ("iinteger", ""),
+    "SaturationEnable": ("iboolean", ""),
+    "SaturationAuto": ("ienumeration", ""),
+    "DigitalNoiseReductionMode": ("ienumeration", ""),
+    "NoiseReduction": ("iinteger", ""),
+    "AirspaceNoiseReduction": ("iinteger", ""),
+    "TemporalNoiseReduction": ("iinteger", ""),
+    "AutoFunctionAOISelector": ("ienumeration", ""),
+    "AutoFunctionAOIWidth": ("iinteger", ""),
+    "AutoFunctionAOIHeight": ("iinteger", ""),
+    "AutoFunctionAOIOffsetX": ("iinteger", ""),
+    "AutoFunctionAOIOffsetY": ("iinteger", ""),
+    "AutoFunctionAOIUsageIntensity": ("iboolean", ""),
+    "AutoFunctionAOIUsageWhiteBalance": ("iboolean", ""),
+    "LUTSelector": ("ienumeration", ""),
+    "LUTEnable": ("iboolean", "LUTSelector"),
+    "LUTIndex": ("iinteger", "LUTSelector"),
+    "LUTValue": ("iinteger", "LUTSelector][LUTIndex"),
+    "LUTValueAll": ("register", "LUTSelector"),
+    "EncoderSelector": ("ienumeration", ""),
+    "EncoderSourceA": ("ienumeration", ""),
+    "EncoderSourceB": ("ienumeration", ""),
+    "EncoderTriggerMode": ("ienumeration", ""),
+    "EncoderCounterMode": ("ienumeration", ""),
+    "EncoderCounter": ("iinteger", ""),
+    "EncoderCounterMax": ("iinteger", ""),
+    "EncoderCounterReset": ("icommand", ""),
+    "EncoderMaxReverseCounter": ("iinteger", ""),
+    "EncoderReverseCounterReset": ("icommand", ""),
+    "InputSource": ("ienumeration", ""),
+    "SignalAlignment": ("ienumeration", ""),
+    "PreDivider": ("iinteger", ""),
+    "Multiplier": ("iinteger", ""),
+    "PostDivider": ("iinteger", ""),
+    "ShadingSelector": ("ienumeration", ""),
+    "ActivateShading": ("icommand", ""),
+    "NUCEnable": ("iboolean", ""),
+    "FPNCEnable": ("iboolean", ""),
+    "PRNUCEnable": ("iboolean", ""),
+    "UserSetCurrent": ("iinteger", ""),
+    "UserSetSelector": ("ienumeration", ""),
+    "UserSetLoad": ("icommand", "UserSetSelector"),
+    "UserSetSave": ("icommand", "UserSetSelector"),
+    "UserSetDefault": ("ienumeration", ""),
+    "PayloadSize": ("iinteger", ""),
+    "GevVersionMajor": ("iinteger", ""),
+    "GevVersionMinor": ("iinteger", ""),
+    "GevDeviceModeIsBigEndian": ("iboolean", ""),
+    "GevDeviceModeCharacterSet": ("ienumeration", ""),
+    "GevInterfaceSelector": ("iinteger", ""),
+    "GevMACAddress": ("iinteger", ""),
+    "GevSupportedOptionSelector": ("ienumeration", ""),
+    "GevSupportedOption": ("iboolean", "GevSupportedOptionSelector"),
+    "GevCurrentIPConfigurationLLA": ("iboolean", ""),
+    "GevCurrentIPConfigurationDHCP": ("iboolean", "GevInterfaceSelector"),
+    "GevCurrentIPConfigurationPersistentIP": ("iboolean", "GevInterfaceSelector"),
+    "GevPAUSEFrameReception": ("iboolean", "GevInterfaceSelector"),
+    "GevCurrentIPAddress": ("iinteger", "GevInterfaceSelector"),
+    "GevCurrentSubnetMask": ("iinteger", "GevInterfaceSelector"),
+    "GevCurrentDefaultGateway": ("iinteger", "GevInterfaceSelector"),
+    "GevFirstURL": ("istring", ""),
+    "GevSecondURL": ("istring", ""),
+    "GevNumberOfInterfaces": ("iinteger", ""),
+    "GevPersistentIPAddress": ("iinteger", "GevInterfaceSelector"),
+    "GevPersistentSubnetMask": ("iinteger", "GevInterfaceSelector"),
+    "GevPersistentDefaultGateway": ("iinteger", "GevInterfaceSelector"),
+    "GevLinkSpeed": ("iinteger", ""),
+    "GevMessageChannelCount": ("iinteger", ""),
+    "GevStreamChannelCount": ("iinteger", ""),
+    "GevHeartbeatTimeout": ("iinteger", ""),
+    "GevGVCPHeartbeatDisable": ("iboolean", ""),
+    "GevTimestampTickFrequency": ("iinteger", ""),
+    "GevTimestampControlLatch": ("icommand", ""),
+    "GevTimestampControlReset": ("icommand", ""),
+    "GevTimestampControlLatchReset": ("icommand", ""),
+    "GevTimestampValue": ("iinteger", ""),
+    "ActionDeviceKey": ("iinteger", ""),
+    "ActionSelector": ("iinteger", ""),
+    "ActionGroupKey": ("iinteger", "ActionSelector"),
+    "ActionGroupMask": ("iinteger", "ActionSelector"),
+    "GevCCP": ("ienumeration", ""),
+    "GevStreamChannelSelector": ("iinteger", ""),
+    "GevSCPInterfaceIndex": ("iinteger", "GevStreamChannelSelector"),
+    "GevSCPHostPort": ("iinteger", "GevStreamChannelSelector"),
+    "GevSCPDirectionGevStreamChannelSelector]": ("iinteger", ""),
+    "GevSCPSFireTestPacket": ("iboolean", "GevStreamChannelSelector"),
+    "GevSCPSDoNotFragment": ("iboolean", "GevStreamChannelSelector"),
+    "GevSCPSBigEndian": ("iboolean", "GevStreamChannelSelector"),
+    "PacketUnorderSupport": ("iboolean", ""),
+    "GevSCPSPacketSize": ("iinteger", ""),
+    "GevSCPD": ("iinteger", "GevStreamChannelSelector"),
+    "GevSCDA": ("iinteger", "GevStreamChannelSelector"),
+    "GevSCSP": ("iinteger", "GevStreamChannelSelector"),
+    "TLParamsLocked": ("iinteger", ""),
+}
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+"""
+Host-side auto exposure: a few frames to converge, instead of the camera's slow ExposureAuto=Continuous.
+
+The brightness of a frame is linear in ExposureTime * 10^(Gain/20), so one measured frame predicts
+the exposure that hits the target. Saturated frames under-report their brightness, they are
+stepped down hard and corrected on the next frame.
+"""
+
+import json
+import math
+import os
+from threading import Lock
+
+import numpy as np
+
+# ip -> last converged dict(ExposureTime, Gain) of adjust_auto_exposure, seeds the next __enter__
+# Used with config["exposure_cache"]=True, no cache by default
+DEFAULT_EXPOSURE_CACHE = os.path.join(
+    os.path.expanduser("~"), ".cache", "hik_camera", "exposure.json"
+)
+_exposure_cache_lock = Lock()
+
+
+def load_exposure_cache(path: str = DEFAULT_EXPOSURE_CACHE) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_exposure(ip: str, values: dict, path: str = DEFAULT_EXPOSURE_CACHE) -> None:
+    """
+    Store the converged exposure of a camera, other cameras' entries are kept.
+    """
+    with _exposure_cache_lock:
+        cache = load_exposure_cache(path)
+        cache[ip] = values
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+
+def get_roi_stats(
+    img: np.ndarray,
+    roi: tuple = None,
+    step: int = 4,
+    max_value: int = 255,
+    bayer: bool = False,
+    bins: int = 64,
+) -> dict:
+    """
+    Brightness statistics of a decimated ROI of a frame, 1/step² of the pixels are read.
+
+    Args:
+        img (np.ndarray): 解码后的图 (h, w) 或 (h, w, c), 也可以是 raw Bayer 图
+        roi (tuple, optional): (x0, y0, x1, y1), 取值 0~1 表示占图像宽高的比例. Defaults to None, 全图.
+        step (int, optional): 降采样步长. Defaults to 4.
+        max_value (int, optional): 满幅值, uint8 为 255, 12bit raw 为 4095. Defaults to 255.
+        bayer (bool, optional): img 是 Bayer 图, 每个采样点取 2x2 的 RGGB 均值, 不偏向某个颜色. Defaults to False.
+        bins (int, optional): 直方图 bin 数. Defaults to 64.
+
+    Returns:
+        dict(mean, saturated, hist): mean 与 saturated (饱和像素比例) 归一化到 0~1, hist 为各 bin 的像素比例
+    """
+    h, w = img.shape[:2]
+    if roi is not None:
+        x0, y0, x1, y1 = roi
+        y0, x0 = int(y0 * h), int(x0 * w)
+        img = img[y0 : max(int(y1 * h), y0 + 2), x0 : max(int(x1 * w), x0 + 2)]
+    if bayer:
+        # Even step keeps every sample on the same CFA site, average the 2x2 quad at each sample
+        step += step % 2
+        img = img[: img.shape[0] // 2 * 2, : img.shape[1] // 2 * 2]
+        sub = (
+            img[0::step, 0::step].astype(np.float32)
+            + img[0::step, 1::step]
+            + img[1::step, 0::step]
+            + img[1::step, 1::step]
+        ) / 4
+    else:
+        sub = img[::step, ::step]
+        if sub.ndim == 3:
+            sub = sub.mean(-1, dtype=np.float32)
+    sub = np.asarray(sub, np.float32) / max_value
+    hist = np.bincount(
+        np.minimum((sub * bins).astype(np.int32), bins - 1).ravel(), minlength=bins
+    ) / sub.size
+    return dict(
+        mean=float(sub.mean()),
+        saturated=float((sub >= 0.98).mean()),
+        hist=hist,
+    )
+
+
+class AutoExposureController:
+    """
+    Sets ExposureTime (then Gain, when ExposureTime reaches max_exposure) from the frames of a camera.
+
+    Feed it every frame by `cam.set_host_auto_exposure(...)`, or call update(img) by hand.
+    """
+
+    def __init__(
+        self,
+        cam,
+        target: float = 0.45,
+        roi: tuple = None,
+        step: int = 4,
+        tolerance: float = 0.08,
+        min_exposure: float = 20,
+        max_exposure: float = 100000,
+        max_gain: float = 20,
+        max_ratio: float = 32,
+    ) -> None:
+        """
+        Args:
+            cam (HikCamera): 相机
+            target (float, optional): ROI 目标平均亮度, 0~1. Defaults to 0.45.
+            roi (tuple, optional): 测光区域 (x0, y0, x1, y1), 取值 0~1. Defaults to None, 全图.
+            step (int, optional): 统计时的降采样步长. Defaults to 4.
+            tolerance (float, optional): 亮度与 target 的相对误差小于该值视为收敛. Defaults to 0.08.
+            min_exposure (float, optional): 曝光时间下限, 单位 us. Defaults to 20.
+            max_exposure (float, optional): 曝光时间上限, 单位 us, 超出部分由 Gain 补足. Defaults to 100000.
+            max_gain (float, optional): Gain 上限, 单位 dB. Defaults to 20.
+            max_ratio (float, optional): 每帧曝光量最多变化的倍数. Defaults to 32.
+        """
+        self.cam = cam
+        self.target = target
+        self.roi = roi
+        self.step = step
+        self.tolerance = tolerance
+        self.min_exposure = min_exposure
+        self.max_exposure = max_exposure
+        self.max_gain = max_gain
+        self.max_ratio = max_ratio
+        self.exposure = None
+        self.gain = None
+        self.converged = False
+        self.last_stats = None
+        self.frames = 0
+
+    def start(self) -> None:
+        """
+        Turn off the camera's own auto exposure and gain, read the current values.
+        """
+        self.cam.set_items(dict(ExposureAuto="Off", GainAuto="Off"))
+        self.exposure = float(self.cam["ExposureTime"])
+        self.gain = float(self.cam["Gain"])
+        self.converged = False
+
+    def update(self, img: np.ndarray, exposure: float = None, gain: float = None) -> bool:
+        """
+        Measure a frame and set the exposure for the next one.
+
+        Args:
+            exposure, gain (float, optional): 该帧实际的曝光时间和增益 (来自帧信息).
+                Defaults to None, the last values set, frames in flight are then measured as if already updated.
+
+        Returns:
+            True if this frame is within tolerance of the target.
+        """
+        if self.exposure is None:
+            self.start()
+        decoder = self.cam.get_decoder()
+        max_value = 255 if decoder.dtype == np.uint8 else (1 << min(decoder.bit, 16)) - 1
+        stats = get_roi_stats(
+            img,
+            self.roi,
+            self.step,
+            max_value,
+            bayer=decoder.name.startswith("Bayer"),
+        )
+        self.last_stats = stats
+        self.frames += 1
+        exposure = self.exposure if exposure is None else exposure
+        gain = self.gain if gain is None else gain
+        mean = max(stats["mean"], 1e-4)
+        self.converged = abs(mean - self.target) <= self.tolerance * self.target
+        if self.converged:
+            return True
+        ratio = self.target / mean
+        if stats["saturated"] > 0.5:
+            # The true brightness is unknown above the clip, step down hard
+            ratio = min(ratio, 1 / self.max_ratio)
+        ratio = min(max(ratio, 1 / self.max_ratio), self.max_ratio)
+        self._apply(exposure * 10 ** (gain / 20) * ratio)
+        return False
+
+    def _apply(self, amount: float) -> None:
+        # amount = ExposureTime * linear gain, fill ExposureTime first, then Gain
+        exposure = min(max(amount, self.min_exposure), self.max_exposure)
+        gain = 20 * math.log10(max(amount / exposure, 1))
+        gain = min(gain, self.max_gain)
+        items = {}
+        if abs(exposure - self.exposure) > 1e-3 * self.exposure:
+            items["ExposureTime"] = exposure
+        if abs(gain - self.gain) > 1e-3:
+            items["Gain"] = gain
+        if items:
+            self.cam.set_items(items)
+        self.exposure, self.gain = exposure, gain
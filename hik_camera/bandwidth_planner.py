@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+Plan GevSCPSPacketSize / GevSCPD of the cameras behind one NIC, so their aggregate burst fits the NIC.
+
+GigE cameras send a frame as a burst of packets at their full link speed. When several cameras
+burst at once into one NIC, the NIC overflows and packets are lost. GevSCPD (inter-packet delay)
+slows every camera down to its share of the NIC.
+"""
+
+import math
+
+# IP + UDP + GVSP headers, counted in GevSCPSPacketSize
+PACKET_HEADER_BYTES = 36
+# Ethernet header + FCS + preamble + inter-frame gap, on the wire but not in GevSCPSPacketSize
+ETHERNET_OVERHEAD_BYTES = 38
+# Fraction of the NIC bandwidth to plan for
+UTILIZATION = 0.9
+
+
+def plan_nic(cams: dict, nic_mbps: float, concurrent: int = None) -> dict:
+    """
+    Compute GevSCPD of each camera so that `concurrent` cameras bursting at once fit the NIC.
+
+    Args:
+        cams (dict): ip -> dict(payload=PayloadSize, link_mbps=GevLinkSpeed, packet_size=GevSCPSPacketSize)
+        nic_mbps (float): 网口速率
+        concurrent (int, optional): 同时传输的相机数. Defaults to None, all cameras.
+
+    Returns:
+        dict(nic_mbps, concurrent, cams={ip: dict(..., scpd, packets, frame_ms)}, worst_latency_ms)
+            scpd: GevSCPD in ns
+            frame_ms: predicted transfer time of one frame while `concurrent` cameras send
+            worst_latency_ms: predicted time until every camera's frame arrived,
+                when all cameras are triggered at once
+    """
+    concurrent = min(concurrent or len(cams), len(cams))
+    share_bps = nic_mbps * 1e6 * UTILIZATION / concurrent
+    plan_cams = {}
+    for ip, cam in cams.items():
+        packet_size = cam["packet_size"]
+        wire_bits = (packet_size + ETHERNET_OVERHEAD_BYTES) * 8
+        # Time one packet occupies the camera's link, and the period its share of the NIC allows
+        packet_s = wire_bits / (cam["link_mbps"] * 1e6)
+        period_s = max(packet_s, wire_bits / share_bps)
+        packets = math.ceil(cam["payload"] / (packet_size - PACKET_HEADER_BYTES))
+        plan_cams[ip] = dict(
+            cam,
+            scpd=int(round((period_s - packet_s) * 1e9)),
+            packets=packets,
+            frame_ms=packets * period_s * 1e3,
+        )
+    # Cameras beyond `concurrent` wait for a previous transfer, in rounds
+    frame_mss = sorted((cam["frame_ms"] for cam in plan_cams.values()), reverse=True)
+    rounds = math.ceil(len(cams) / concurrent)
+    worst_latency_ms = sum(frame_mss[:rounds])
+    return dict(
+        nic_mbps=nic_mbps,
+        concurrent=concurrent,
+        cams=plan_cams,
+        worst_latency_ms=worst_latency_ms,
+    )
+
+
+def format_plan(host_ip: str, plan: dict) -> str:
+    lines = [
+        f"{host_ip} NIC {plan['nic_mbps']}Mbps, {plan['concurrent']} cameras send at once, "
+        f"worst-case frame latency {plan['worst_latency_ms']:.1f}ms"
+    ]
+    for ip, cam in plan["cams"].items():
+        lines.append(
+            f"    {ip}: PayloadSize={cam['payload']} GevLinkSpeed={cam['link_mbps']} "
+            f"GevSCPSPacketSize={cam['packet_size']} GevSCPD={cam['scpd']} "
+            f"-> {cam['frame_ms']:.1f}ms/frame"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # 6 个百万像素相机, 千兆网口
+    cams = {
+        f"192.168.1.{i}": dict(payload=1280 * 1024, link_mbps=1000, packet_size=8164)
+        for i in range(2, 8)
+    }
+    print(format_plan("192.168.1.1", plan_nic(cams, 1000)))
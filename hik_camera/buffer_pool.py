@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Preallocated, aligned frame buffers that the SDK writes frames into directly.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+def aligned_empty(shape, dtype=np.uint8, align=4096) -> np.ndarray:
+    """
+    Allocate an uninitialized C-contiguous array whose data pointer is aligned to `align` bytes.
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(nbytes + align, np.uint8)
+    offset = -raw.ctypes.data % align
+    return raw[offset : offset + nbytes].view(dtype).reshape(shape)
+
+
+class FrameBufferPool:
+    """
+    Ring of preallocated, aligned frame buffers.
+
+    The SDK writes each frame straight into a free buffer, `HikCamera.get_frame`
+    returns a view on that buffer (or on a decode output owned by the same slot),
+    and the view stays valid until it is handed back with `release`.
+    No memory is allocated per frame once every slot has been used once.
+    """
+
+    def __init__(self, nbytes: int, n: int = 3, align: int = 4096) -> None:
+        """
+        Args:
+            nbytes (int): size of each buffer, usually the camera's PayloadSize.
+            n (int, optional): number of buffers in the ring. Defaults to 3.
+            align (int, optional): alignment of each buffer in bytes. Defaults to 4096.
+        """
+        assert n >= 1, n
+        self.nbytes = nbytes
+        self.align = align
+        self.buffers = [aligned_empty(nbytes, np.uint8, align) for _ in range(n)]
+        # Decode outputs of each slot, keyed by (shape, dtype), e.g. unpacked 12bit raw
+        self._outs = [{} for _ in range(n)]
+        self._free = deque(range(n))
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+    @property
+    def n_free(self) -> int:
+        return len(self._free)
+
+    def acquire(self, timeout: float = None) -> int:
+        """
+        Take a free slot, waiting up to `timeout` seconds for one to be released.
+
+        Returns:
+            Index of the slot, pass it to `buffer` / `out` / `release_slot`.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                raise TimeoutError(
+                    f"All {len(self)} frame buffers are in use for {timeout}s, "
+                    "release frames with `cam.release_frame(img)`"
+                )
+            return self._free.popleft()
+
+    def buffer(self, slot: int) -> np.ndarray:
+        return self.buffers[slot]
+
+    def out(self, slot: int, shape, dtype) -> np.ndarray:
+        """
+        Aligned decode output owned by `slot`, allocated on first use and reused afterwards.
+        """
+        key = (tuple(shape), np.dtype(dtype).str)
+        outs = self._outs[slot]
+        if key not in outs:
+            outs[key] = aligned_empty(shape, dtype, self.align)
+        return outs[key]
+
+    def release_slot(self, slot: int) -> None:
+        with self._cond:
+            if slot not in self._free:
+                self._free.append(slot)
+                self._cond.notify()
+
+    def slot_of(self, arr: np.ndarray) -> int:
+        """
+        Find the slot whose memory `arr` is a view of, None if `arr` is not from this pool.
+        """
+        addr = arr.__array_interface__["data"][0]
+        for slot in range(len(self)):
+            for buf in [self.buffers[slot], *self._outs[slot].values()]:
+                begin = buf.__array_interface__["data"][0]
+                if begin <= addr < begin + buf.nbytes:
+                    return slot
+        return None
+
+    def release(self, arr: np.ndarray) -> bool:
+        """
+        Give the slot backing `arr` back to the ring. Views on it become invalid.
+
+        Returns:
+            True if `arr` belonged to this pool.
+        """
+        slot = self.slot_of(arr)
+        if slot is None:
+            return False
+        self.release_slot(slot)
+        return True
+
+
+if __name__ == "__main__":
+    pool = FrameBufferPool(4024 * 3036 * 3, n=3)
+    slot = pool.acquire()
+    img = pool.buffer(slot)[: 16 * 16 * 3].reshape(16, 16, 3)
+    assert img.ctypes.data % pool.align == 0
+    begin = time.time()
+    assert pool.release(img[1:, 2:])
+    print("release spend", time.time() - begin, "free", pool.n_free)
@@ -1,5 +1,6 @@
 import boxx, cv2
 from hik_camera import HikCamera
+from hik_camera.image_writer import get_image_writer
 
 
 class CvShow:
@@ -56,6 +57,16 @@ if __name__ == "__main__":
     print("All camera IP adresses:", ips)
     print("Press 'q' to quit")
     print("Press 'space' to save the current frame from all cameras")
+
+    def print_saved(future):
+        # "drop" backpressure cancels the save when the queue is full
+        if future.cancelled():
+            print("Dropped a frame, the writer queue is full")
+        elif future.exception() is not None:
+            print("Save failed:", future.exception())
+        else:
+            print("Save to", future.result())
+
     cams = Hik.get_all_cams()
     with cams, CvShow() as cvshow:
         for idx, key in enumerate(cvshow):
@@ -63,11 +74,18 @@ if __name__ == "__main__":
                 break
             timestr = localTimeStr(1)
             for ip, cam in cams.items():
-                img = cam.get_frame()
-                if cam.is_raw:  # 如果是采集的 raw 图, demosaicing 为 RGB
-                    img = cam.raw_to_uint8_rgb(img, poww=0.5)
-                cvshow.imshow(img[::3, ::3], window=ip)
                 if key == " ":
+                    # 保存时取全分辨率图
+                    img = cam.get_frame()
+                    if cam.is_raw:  # 如果是采集的 raw 图, demosaicing 为 RGB
+                        img = cam.raw_to_uint8_rgb(img, poww=0.5)
                     imgp = pathjoin(dirr, f"{timestr}~{ip}.jpg")
-                    print("Save to", imgp)
-                    boxx.imsave(imgp, img)
+                    # 后台线程编码写盘, 不阻塞其他相机的采集
+                    cam.save_async(img, imgp).add_done_callback(print_saved)
+                    preview = img[::4, ::4]
+                else:
+                    # 预览只解码需要的像素, raw 图按 2x2 superpixel 转 RGB
+                    preview = cam.get_preview(scale=4, poww=0.5)
+                cvshow.imshow(preview, window=ip)
+    # 等待所有图片写完
+    get_image_writer().close()
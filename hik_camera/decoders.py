@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+"""
+Decoders from the SDK frame buffer to numpy images.
+
+Decoders are registered per MVS pixel type (`MV_FRAME_OUT_INFO_EX.enPixelType`).
+Every decoder has the signature `decode(buf, h, w, out=None) -> np.ndarray`:
+    - buf: 1-D uint8 array holding the frame, may be longer than the image (chunk data)
+    - h, w: nHeight, nWidth of the frame info (the ROI size)
+    - out: optional preallocated output of shape `decoder.get_shape(h, w)` and `decoder.dtype`
+A decoder with `view=True` returns a view on `buf` when `out` is None.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Threads of unpack_12bit_packed, and the frame size from which it starts using them
+UNPACK_THREADS = min(os.cpu_count() or 1, 4)
+UNPACK_THREAD_MIN_PIXELS = 1 << 20
+
+# PixelType_Gvsp_* of MvGvspPixelType (PFNC codes), see MvCameraNode-CH.csv
+name_to_pixel_type = {
+    "Mono8": 0x01080001,
+    "Mono10": 0x01100003,
+    "Mono10Packed": 0x010C0004,
+    "Mono12": 0x01100005,
+    "Mono12Packed": 0x010C0006,
+    "Mono16": 0x01100007,
+    "RGB8Packed": 0x02180014,
+    "BGR8Packed": 0x02180015,
+    "YUV422_8": 0x02100032,
+    "YUV422_8_UYVY": 0x0210001F,
+    "YUV8_UYV": 0x02180020,
+    "BayerGR8": 0x01080008,
+    "BayerRG8": 0x01080009,
+    "BayerGB8": 0x0108000A,
+    "BayerBG8": 0x0108000B,
+    "BayerGR10": 0x0110000C,
+    "BayerRG10": 0x0110000D,
+    "BayerGB10": 0x0110000E,
+    "BayerBG10": 0x0110000F,
+    "BayerGR10Packed": 0x010C0026,
+    "BayerRG10Packed": 0x010C0027,
+    "BayerGB10Packed": 0x010C0028,
+    "BayerBG10Packed": 0x010C0029,
+    "BayerGR12": 0x01100010,
+    "BayerRG12": 0x01100011,
+    "BayerGB12": 0x01100012,
+    "BayerBG12": 0x01100013,
+    "BayerGR12Packed": 0x010C002A,
+    "BayerRG12Packed": 0x010C002B,
+    "BayerGB12Packed": 0x010C002C,
+    "BayerBG12Packed": 0x010C002D,
+    "BayerGR16": 0x0110002E,
+    "BayerRG16": 0x0110002F,
+    "BayerGB16": 0x01100030,
+    "BayerBG16": 0x01100031,
+    # PFNC lsb-first 12bit packed
+    "Mono12p": 0x010C0047,
+    "BayerBG12p": 0x010C0053,
+    "BayerGB12p": 0x010C0055,
+    "BayerGR12p": 0x010C0057,
+    "BayerRG12p": 0x010C0059,
+}
+pixel_type_to_name = {v: k for k, v in name_to_pixel_type.items()}
+
+
+class Decoder(
+    namedtuple("Decoder", "pixel_type name bit dtype channels view decode")
+):
+    """
+    Registry entry of a pixel type.
+
+    bit: significant bits of a Mono/Bayer sample (e.g. 12 for Bayer12Packed and Bayer12),
+        bits per pixel on the wire for color formats (e.g. 24 for RGB8Packed).
+    """
+
+    def get_shape(self, h: int, w: int) -> tuple:
+        return (h, w) if self.channels == 1 else (h, w, self.channels)
+
+    def __call__(self, buf: np.ndarray, h: int, w: int, out=None) -> np.ndarray:
+        return self.decode(buf, h, w, out)
+
+
+pixel_type_to_decoder = {}
+
+
+def register_decoder(names, bit=None, dtype=np.uint8, channels=1, view=False):
+    """
+    Decorator that registers `decode(buf, h, w, out=None)` for the pixel formats in `names`.
+
+    Args:
+        names (list[str]): pixel format names, keys of name_to_pixel_type.
+        bit (int, optional): see Decoder. Defaults to the bits per pixel of the pixel type.
+    """
+
+    def register(decode):
+        for name in names:
+            pixel_type = name_to_pixel_type[name]
+            pixel_type_to_decoder[pixel_type] = Decoder(
+                pixel_type=pixel_type,
+                name=name,
+                bit=bit or (pixel_type >> 16) & 0xFF,
+                dtype=np.dtype(dtype),
+                channels=channels,
+                view=view,
+                decode=decode,
+            )
+        return decode
+
+    return register
+
+
+def get_decoder(pixel_type: int) -> Decoder:
+    """
+    Returns the registered Decoder of a MV_FRAME_OUT_INFO_EX.enPixelType.
+    """
+    if pixel_type not in pixel_type_to_decoder:
+        raise NotImplementedError(
+            "No decoder for pixel type 0x%08X (%s)"
+            % (pixel_type, pixel_type_to_name.get(pixel_type, "unknown"))
+        )
+    return pixel_type_to_decoder[pixel_type]
+
+
+def _to_out(img, out):
+    if out is None:
+        return img
+    np.copyto(out, img)
+    return out
+
+
+@register_decoder(
+    ["Mono8", "BayerGR8", "BayerRG8", "BayerGB8", "BayerBG8"], bit=8, view=True
+)
+def decode_8bit(buf, h, w, out=None):
+    return _to_out(buf[: h * w].reshape(h, w), out)
+
+
+@register_decoder(["RGB8Packed"], channels=3, view=True)
+def decode_rgb8(buf, h, w, out=None):
+    return _to_out(buf[: h * w * 3].reshape(h, w, 3), out)
+
+
+@register_decoder(["BGR8Packed"], channels=3, view=True)
+def decode_bgr8(buf, h, w, out=None):
+    # Channel-reversed view, RGB like the other color formats
+    rgb = buf[: h * w * 3].reshape(h, w, 3)[..., ::-1]
+    if out is None:
+        return rgb
+    for c in range(3):
+        out[..., c] = rgb[..., c]
+    return out
+
+
+def _decode_16bit(buf, h, w, out=None):
+    # Little-endian uint16, reinterpret the bytes instead of computing hi * 256 + lo
+    return _to_out(buf[: h * w * 2].view("<u2").reshape(h, w), out)
+
+
+for _bit in (10, 12, 16):
+    register_decoder(
+        [
+            f"{color}{_bit}"
+            for color in ["Mono", "BayerGR", "BayerRG", "BayerGB", "BayerBG"]
+        ],
+        bit=_bit,
+        dtype=np.uint16,
+        view=True,
+    )(_decode_16bit)
+
+
+_unpack_executor = None
+
+
+def _get_unpack_executor():
+    global _unpack_executor
+    if _unpack_executor is None:
+        _unpack_executor = ThreadPoolExecutor(
+            UNPACK_THREADS, thread_name_prefix="hik_unpack"
+        )
+    return _unpack_executor
+
+
+def _unpack_12bit_pairs(src, pairs, layout):
+    """
+    Unpack the 3 byte groups of `src` into the (n, 2) uint16 `pairs`, without temporaries.
+    Every step is a single NumPy ufunc that releases the GIL.
+    """
+    p0, p1 = pairs[:, 0], pairs[:, 1]
+    n = len(pairs)
+    if layout == "gige":
+        groups = src.reshape(-1, 3)
+        # p1 = B2 << 4 | B1 & 0xF, p0 serves as scratch
+        np.left_shift(groups[:, 2], 4, out=p0, dtype=np.uint16)
+        np.bitwise_and(groups[:, 1], 15, out=p1, dtype=np.uint16)
+        np.bitwise_or(p1, p0, out=p1)
+        # p0 = B0 << 4 | B1 >> 4, i.e. big-endian uint16 of (B0, B1) >> 4
+        b0b1 = np.ndarray((n,), ">u2", src, 0, (3,))
+        np.right_shift(b0b1, 4, out=p0)
+    elif layout == "lsb":
+        # p0 = (B1 & 0xF) << 8 | B0, i.e. little-endian uint16 of (B0, B1) & 0xFFF
+        np.bitwise_and(np.ndarray((n,), "<u2", src, 0, (3,)), 0xFFF, out=p0)
+        # p1 = B2 << 4 | B1 >> 4, i.e. little-endian uint16 of (B1, B2) >> 4
+        np.right_shift(np.ndarray((n,), "<u2", src, 1, (3,)), 4, out=p1)
+    else:
+        raise NotImplementedError(f"Unknown 12bit packed layout: {layout}")
+
+
+def unpack_12bit_packed(src, h, w, out=None, layout="gige", threads=None):
+    """
+    Unpack 12bit packed pixels (2 pixels in 3 bytes) into a uint16 (h, w) array.
+
+    Args:
+        src (np.ndarray): contiguous uint8 buffer, may be longer than h * w * 3 // 2.
+        out (np.ndarray, optional): C-contiguous uint16 (h, w) output. Defaults to a new array.
+        layout (str, optional): byte layout of a 3 byte group (B0, B1, B2). Defaults to "gige".
+            - "gige": GigE Vision packed, as Hikrobot Bayer12Packed/Mono12Packed:
+                B0 = p0[11:4], B1 = p0[3:0] << 4 | p1[3:0], B2 = p1[11:4]
+            - "lsb": PFNC lsb-first, as Mono12p/Bayer12p:
+                B0 = p0[7:0], B1 = p1[3:0] << 4 | p0[11:8], B2 = p1[11:4]
+        threads (int, optional): rows are split into this many chunks run in a thread pool.
+            Defaults to UNPACK_THREADS for frames larger than UNPACK_THREAD_MIN_PIXELS, else 1.
+    """
+    if out is None:
+        out = np.empty((h, w), np.uint16)
+    assert out.flags.c_contiguous and out.dtype == np.uint16, "out should be C-contiguous uint16"
+    n_pair = h * w // 2
+    src = src[: n_pair * 3]
+    pairs = out.reshape(-1, 2)
+    if threads is None:
+        threads = UNPACK_THREADS if h * w >= UNPACK_THREAD_MIN_PIXELS else 1
+    threads = max(min(threads, h), 1)
+    if threads == 1:
+        _unpack_12bit_pairs(src, pairs, layout)
+        return out
+    # Split on row boundaries
+    rows = np.linspace(0, h, threads + 1).astype(int)
+    pair_bounds = rows * w // 2
+    futures = [
+        _get_unpack_executor().submit(
+            _unpack_12bit_pairs, src[begin * 3 : end * 3], pairs[begin:end], layout
+        )
+        for begin, end in zip(pair_bounds[:-1], pair_bounds[1:])
+        if end > begin
+    ]
+    [future.result() for future in futures]
+    return out
+
+
+@register_decoder(
+    [
+        "Mono12Packed",
+        "BayerGR12Packed",
+        "BayerRG12Packed",
+        "BayerGB12Packed",
+        "BayerBG12Packed",
+    ],
+    bit=12,
+    dtype=np.uint16,
+)
+def decode_12bit_packed(buf, h, w, out=None):
+    return unpack_12bit_packed(buf, h, w, out, layout="gige")
+
+
+@register_decoder(
+    ["Mono12p", "BayerGR12p", "BayerRG12p", "BayerGB12p", "BayerBG12p"],
+    bit=12,
+    dtype=np.uint16,
+)
+def decode_12bit_p(buf, h, w, out=None):
+    return unpack_12bit_packed(buf, h, w, out, layout="lsb")
+
+
+@register_decoder(
+    [
+        "Mono10Packed",
+        "BayerGR10Packed",
+        "BayerRG10Packed",
+        "BayerGB10Packed",
+        "BayerBG10Packed",
+    ],
+    bit=10,
+    dtype=np.uint16,
+)
+def decode_10bit_packed(buf, h, w, out=None):
+    # Same layout as 12bit packed with 2bit low parts: B1 = p0[1:0] << 4 | p1[1:0]
+    groups = buf[: h * w * 3 // 2].reshape(-1, 3)
+    if out is None:
+        out = np.empty((h, w), np.uint16)
+    pairs = out.reshape(-1, 2)
+    np.left_shift(groups[:, 0], 2, out=pairs[:, 0], dtype=np.uint16)
+    pairs[:, 0] |= (groups[:, 1] >> 4) & 3
+    np.left_shift(groups[:, 2], 2, out=pairs[:, 1], dtype=np.uint16)
+    pairs[:, 1] |= groups[:, 1] & 3
+    return out
+
+
+# Full range BT.601 (JFIF) chroma terms of every 8bit U/V, |term| < 256 so y + term fits in int16
+_yuv_uv = np.arange(256, dtype=np.float64) - 128
+_yuv_luts = dict(
+    rv=np.round(1.402 * _yuv_uv).astype(np.int16),
+    gu=np.round(-0.344136 * _yuv_uv).astype(np.int16),
+    gv=np.round(-0.714136 * _yuv_uv).astype(np.int16),
+    bu=np.round(1.772 * _yuv_uv).astype(np.int16),
+)
+
+
+def _yuv_to_rgb(ys, u, v, h, w, out):
+    """
+    ys: Y planes sharing the chroma u, v, e.g. [Y0, Y1] of YUV422, each of the same shape as u.
+    """
+    if out is None:
+        out = np.empty((h, w, 3), np.uint8)
+    luts = _yuv_luts
+    chromas = [
+        luts["rv"][v],
+        luts["gu"][u] + luts["gv"][v],
+        luts["bu"][u],
+    ]
+    grouped = out.reshape(u.shape + (len(ys), 3))
+    tmp = np.empty(u.shape, np.int16)
+    for i, y in enumerate(ys):
+        for c, chroma in enumerate(chromas):
+            np.add(chroma, y, out=tmp)
+            np.clip(tmp, 0, 255, out=tmp)
+            np.copyto(grouped[..., i, c], tmp, casting="unsafe")
+    return out
+
+
+@register_decoder(["YUV422_8"], channels=3)
+def decode_yuyv(buf, h, w, out=None):
+    # Y0 U Y1 V
+    quad = buf[: h * w * 2].reshape(h, w // 2, 4)
+    return _yuv_to_rgb([quad[..., 0], quad[..., 2]], quad[..., 1], quad[..., 3], h, w, out)
+
+
+@register_decoder(["YUV422_8_UYVY"], channels=3)
+def decode_uyvy(buf, h, w, out=None):
+    # U Y0 V Y1
+    quad = buf[: h * w * 2].reshape(h, w // 2, 4)
+    return _yuv_to_rgb([quad[..., 1], quad[..., 3]], quad[..., 0], quad[..., 2], h, w, out)
+
+
+@register_decoder(["YUV8_UYV"], channels=3)
+def decode_uyv(buf, h, w, out=None):
+    uyv = buf[: h * w * 3].reshape(h, w, 3)
+    return _yuv_to_rgb([uyv[..., 1]], uyv[..., 0], uyv[..., 2], h, w, out)
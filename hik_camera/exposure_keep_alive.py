@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Keep the auto exposure of triggered cameras alive, see HikCamera.continuous_adjust_exposure.
+
+In trigger mode the camera only adjusts its exposure on frames. A camera that is not triggered for
+a long time wakes up with a stale exposure, so it gets a keep-alive frame every `interval` seconds.
+"""
+
+import heapq
+import time
+from threading import Condition, Lock, Thread
+
+
+class KeepAliveGroup:
+    """
+    Keep-alive frames of the cameras sharing one lock_name or NIC, taken by one worker thread.
+
+    The cameras are in a heap keyed on their next due time. A production frame only updates
+    `self.due` (under the group lock, not held during keep-alive frames); the worker re-keys the
+    stale heap entry when it reaches the top, so refreshing a camera is O(1) and the worker sleeps
+    until the next due time, no polling.
+    Closed cameras are dropped, the worker exits when none is left and the next add starts a new one.
+    """
+
+    # Min seconds between two frames of the group, avoids congesting the network
+    min_gap = 1
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.cams = {}
+        # ip -> next due time, the source of truth; heap entries may be older
+        self.due = {}
+        self.heap = []
+        self.last_frame = 0
+        self.shots = 0
+        self.cond = Condition()
+        self.thread = None
+
+    def add(self, cam, interval: float) -> None:
+        with self.cond:
+            cam.interval = interval
+            self.cams[cam.ip] = cam
+            self.due[cam.ip] = max(cam.last_time_get_frame, time.time()) + interval
+            # Rare, rebuild instead of tracking the old entry of a re-added camera
+            self.heap = [(self.due[ip], ip) for ip in self.cams]
+            heapq.heapify(self.heap)
+            self.cond.notify()
+            if self.thread is None:
+                self.thread = Thread(
+                    target=self._run, name=f"HikCamera-keep-alive-{self.name}", daemon=True
+                )
+                self.thread.start()
+
+    def remove(self, cam) -> None:
+        with self.cond:
+            if self.cams.get(cam.ip) is not cam:
+                return
+            del self.cams[cam.ip]
+            self.due.pop(cam.ip, None)
+            self.heap = [(due, ip) for due, ip in self.heap if ip != cam.ip]
+            heapq.heapify(self.heap)
+            self.cond.notify()
+
+    def touch(self, cam) -> None:
+        """
+        cam got a frame, postpone its keep-alive. Called on every frame.
+        """
+        with self.cond:
+            if self.cams.get(cam.ip) is not cam:
+                # Removed meanwhile, don't bring back its due time
+                return
+            self.due[cam.ip] = cam.last_time_get_frame + cam.interval
+            self.last_frame = max(self.last_frame, cam.last_time_get_frame)
+
+    def _get_gap(self) -> float:
+        # 避免任意两次拍照的时间间隔过小, 而导致网络堵塞
+        interval = min(cam.interval for cam in self.cams.values())
+        return max(interval / len(self.cams) / 4, self.min_gap)
+
+    def _run(self) -> None:
+        with self.cond:
+            while True:
+                if not self.heap:
+                    self.thread = None
+                    return
+                due, ip = self.heap[0]
+                if self.due[ip] > due:
+                    # Refreshed by a production frame meanwhile
+                    heapq.heapreplace(self.heap, (self.due[ip], ip))
+                    continue
+                now = time.time()
+                wake = max(due, self.last_frame + self._get_gap())
+                if wake > now:
+                    self.cond.wait(wake - now)
+                    continue
+                cam = self.cams[ip]
+                if not cam.is_open:
+                    # Closed without remove, e.g. by a failed reset
+                    heapq.heappop(self.heap)
+                    del self.cams[ip]
+                    self.due.pop(ip, None)
+                    continue
+                self.due[ip] = now + cam.interval
+                heapq.heapreplace(self.heap, (self.due[ip], ip))
+                self.last_frame = now
+                self.cond.release()
+                try:
+                    cam.get_frame_with_config()
+                    self.shots += 1
+                except Exception as e:
+                    print(f"Keep-alive frame of {ip}: {type(e).__name__}: {e}")
+                finally:
+                    self.cond.acquire()
+
+
+_groups = {}
+_groups_lock = Lock()
+
+
+def get_keep_alive_group(name: str) -> KeepAliveGroup:
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = KeepAliveGroup(name)
+        return _groups[name]
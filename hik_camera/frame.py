@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+Frame: an image with the MV_FRAME_OUT_INFO_EX it came with, returned with config["return_frame"].
+"""
+
+import time
+
+import numpy as np
+
+
+class Frame:
+    """
+    A decoded image and the info of its frame, `__slots__` keeps it as small as a tuple.
+
+    np.asarray(frame) and frame.img give the image.
+    """
+
+    __slots__ = (
+        "img",
+        "ip",
+        "frame_num",
+        "dev_timestamp",
+        "host_timestamp",
+        "lost_packet",
+        "frame_len",
+        "width",
+        "height",
+        "pixel_type",
+        "exposure",
+        "gain",
+        "complete",
+    )
+
+    def __init__(
+        self,
+        img: np.ndarray,
+        ip: str,
+        frame_info,
+        host_timestamp: float,
+        complete: bool,
+    ) -> None:
+        """
+        Args:
+            frame_info (MV_FRAME_OUT_INFO_EX): 该帧的帧信息
+            host_timestamp (float): 主机收到该帧的 time.time()
+            complete (bool): 没有丢包且数据长度完整
+        """
+        self.img = img
+        self.ip = ip
+        self.frame_num = frame_info.nFrameNum
+        self.dev_timestamp = (
+            frame_info.nDevTimeStampHigh << 32 | frame_info.nDevTimeStampLow
+        )
+        self.host_timestamp = host_timestamp
+        self.lost_packet = getattr(frame_info, "nLostPacket", 0)
+        self.frame_len = frame_info.nFrameLen
+        self.width = frame_info.nWidth
+        self.height = frame_info.nHeight
+        self.pixel_type = frame_info.enPixelType
+        self.exposure = frame_info.fExposureTime
+        self.gain = getattr(frame_info, "fGain", None)
+        self.complete = complete
+
+    @property
+    def shape(self) -> tuple:
+        return self.img.shape
+
+    @property
+    def age(self) -> float:
+        """
+        Seconds since the host received the frame.
+        """
+        return time.time() - self.host_timestamp
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        if dtype is not None and dtype != self.img.dtype:
+            return self.img.astype(dtype)
+        return self.img.copy() if copy else self.img
+
+    def __repr__(self) -> str:
+        return (
+            f"Frame(ip={self.ip}, frame_num={self.frame_num}, shape={self.img.shape}, "
+            f"dtype={self.img.dtype}, lost_packet={self.lost_packet}, complete={self.complete})"
+        )
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+"""
+Background heartbeat of the open cameras.
+
+A dropped link is noticed within `interval * failures` seconds instead of when get_frame times out
+(TIMEOUT_MS, 40s). The camera is marked unhealthy, get_frame on it fails fast with CameraUnhealthyError,
+and the monitor reopens it in the background as soon as it answers again.
+"""
+
+import time
+from threading import Event, Lock, Thread
+
+HEALTHY = "healthy"
+UNHEALTHY = "unhealthy"
+RECONNECTING = "reconnecting"
+
+
+class CameraUnhealthyError(ConnectionError):
+    """
+    The health monitor lost the camera, it is being reconnected in the background.
+    """
+
+
+class HealthMonitor:
+    """
+    One daemon thread that checks every registered camera each `interval` seconds.
+
+    A check is a register read when the camera lock is free, otherwise (a frame is being grabbed)
+    a GVCP probe, so the heartbeat never waits for a 40s get_frame.
+    """
+
+    def __init__(self, interval: float = 1.0, failures: int = 2) -> None:
+        """
+        Args:
+            interval (float, optional): 心跳间隔秒数. Defaults to 1.0.
+            failures (int, optional): 连续失败几次标记为 unhealthy. Defaults to 2.
+        """
+        self.interval = interval
+        self.failures = failures
+        self.cams = {}
+        self.subscribers = []
+        self._lock = Lock()
+        # Each thread has its own stop event: a camera registering while the last thread
+        # is still stopping starts a new thread instead of reviving the stopped one
+        self._stop = None
+        self._thread = None
+
+    def register(self, cam) -> None:
+        with self._lock:
+            if self.cams.get(cam.ip) is cam:
+                # Reopened by a reconnect or reset, keep its health
+                return
+            self.cams[cam.ip] = cam
+            cam.health_state = HEALTHY
+            cam.health = dict(
+                state=HEALTHY,
+                since=time.time(),
+                failures=0,
+                last_check=None,
+                last_error=None,
+                reconnects=0,
+            )
+            if self._thread is None:
+                self._stop = Event()
+                self._thread = Thread(
+                    target=self._run,
+                    args=(self._stop,),
+                    name="HikCamera-health",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def unregister(self, cam) -> None:
+        with self._lock:
+            if self.cams.get(cam.ip) is cam:
+                del self.cams[cam.ip]
+            if not self.cams and self._thread is not None:
+                self._stop.set()
+                self._thread = None
+
+    def subscribe(self, func) -> None:
+        """
+        func(cam, old_state, new_state) is called from the monitor thread on every state change.
+        """
+        self.subscribers.append(func)
+
+    def get_states(self) -> dict:
+        """
+        Returns:
+            ip -> cam.health, dict(state, since, failures, last_check, last_error, reconnects)
+        """
+        with self._lock:
+            cams = list(self.cams.values())
+        return {cam.ip: dict(cam.health) for cam in cams}
+
+    def _set_state(self, cam, state, error=None) -> None:
+        old = cam.health["state"]
+        if error is not None:
+            cam.health["last_error"] = error
+        if old == state:
+            return
+        cam.health.update(state=state, since=time.time())
+        cam.health_state = state
+        for func in self.subscribers:
+            try:
+                func(cam, old, state)
+            except Exception as e:
+                print(f"HealthMonitor subscriber {func}: {type(e).__name__}: {e}")
+
+    def _run(self, stop: Event) -> None:
+        while not stop.wait(self.interval):
+            with self._lock:
+                cams = list(self.cams.values())
+            for cam in cams:
+                if cam.health["state"] == RECONNECTING:
+                    continue
+                self.check(cam)
+
+    def check(self, cam) -> bool:
+        """
+        Heartbeat of one camera, starts reconnecting it after `failures` failed checks in a row.
+        """
+        ok, error = cam._heartbeat()
+        health = cam.health
+        health["last_check"] = time.time()
+        if ok:
+            health["failures"] = 0
+            if health["state"] == HEALTHY:
+                return True
+        else:
+            health["failures"] += 1
+            if health["state"] == HEALTHY and health["failures"] < self.failures:
+                return False
+            self._set_state(cam, UNHEALTHY, error)
+        if ok or cam._ping():
+            # Reachable again (or the link came back), reopen it without blocking the other cameras
+            self._set_state(cam, RECONNECTING)
+            Thread(
+                target=self._reconnect, args=(cam,), name=f"HikCamera-reconnect-{cam.ip}", daemon=True
+            ).start()
+        return ok
+
+    def _reconnect(self, cam) -> None:
+        try:
+            cam._recover_reopen()
+        except Exception as e:
+            self._set_state(cam, UNHEALTHY, f"{type(e).__name__}: {e}")
+            return
+        cam.health["reconnects"] += 1
+        cam.health["failures"] = 0
+        self._set_state(cam, HEALTHY)
+
+
+_monitor = None
+_monitor_lock = Lock()
+
+
+def get_health_monitor(interval: float = None, failures: int = None) -> HealthMonitor:
+    """
+    The process wide monitor, arguments update its settings.
+    """
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = HealthMonitor()
+        if interval is not None:
+            _monitor.interval = interval
+        if failures is not None:
+            _monitor.failures = failures
+        return _monitor
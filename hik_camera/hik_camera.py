@@ -7,17 +7,44 @@ Provides a class `HikCamera` that wraps the MVS camera SDK.
 Underlines the SDK's C APIs with ctypes library.
 """
 
+import contextlib
 import ctypes
+import functools
+import json
+from collections import defaultdict, deque
 from ctypes import byref, POINTER, cast, sizeof, memset
 import os
+import queue
 import sys
-from threading import Lock, Thread
+from concurrent.futures import Future
+from threading import Event, Lock, RLock, Semaphore, Thread, current_thread
 import time
 from typing import Any
 
-import boxx
 import numpy as np
 
+from .lazy_import import LazyModule
+from ._nodes import nodes
+from .buffer_pool import FrameBufferPool
+from .decoders import Decoder, get_decoder
+from .bandwidth_planner import format_plan, plan_nic
+from .transfer_scheduler import compute_slots, get_nic_speed_mbps, get_scheduler
+from .recovery import RecoveryEngine, gvcp_probe
+from .health_monitor import HEALTHY, CameraUnhealthyError, get_health_monitor
+from .exposure_keep_alive import get_keep_alive_group
+from .raw_pipeline import get_raw_converter
+from .preview import decode_preview
+from .image_writer import get_image_writer
+from .raw_container import RawWriter, get_frame_nbytes
+from .frame import Frame
+from .metrics import get_metrics
+from .auto_exposure import (
+    DEFAULT_EXPOSURE_CACHE,
+    AutoExposureController,
+    load_exposure_cache,
+    save_exposure,
+)
+
 
 # Retrieve the path to the Hikrobot MVS SDK given the operating system
 if sys.platform.startswith("win"):
@@ -29,18 +56,35 @@ else:
     MVCAM_SDK_PATH = os.environ.get("MVCAM_SDK_PATH", "/opt/MVS")
     MvImportDir = os.path.join(MVCAM_SDK_PATH, "Samples/64/Python/MvImport")
 
-# Import SDK python wrapper from Hikrobot MVS SDK
-with boxx.impt(MvImportDir):
+
+def _import_sdk():
+    """
+    Import SDK python wrapper from Hikrobot MVS SDK
+    """
+    sys.path.insert(0, MvImportDir)
     try:
-        import MvCameraControl_class as hik
+        import MvCameraControl_class
     except ModuleNotFoundError as e:
         boxx.pred(
             "ERROR: can't find MvCameraControl_class.py in: %s, please install MVS SDK"
             % MvImportDir
         )
         raise e
+    finally:
+        sys.path.remove(MvImportDir)
+    return MvCameraControl_class
+
+
+# boxx (with pandas) and the SDK are loaded on first use, `import hik_camera` stays fast
+boxx = LazyModule("boxx")
+# Only the coroutine APIs (aget_frame, astream) need asyncio
+asyncio = LazyModule("asyncio")
+hik = LazyModule("MvCameraControl_class", _import_sdk)
 
-_lock_name_to_lock = {None: boxx.withfun()}
+_lock_name_to_lock = {None: contextlib.nullcontext()}
+# SDK image buffers of a new handle (strategy 0 is MV_GrabStrategy_OneByOne), stream() puts them back
+GRAB_BUFFER_DEFAULTS = dict(node_num=1, strategy=0, output_queue_size=1)
+_host_ip_to_packet_size_lock = defaultdict(Lock)
 
 # Convert 32-bit integer to IP address
 int_to_ip = (
@@ -53,26 +97,161 @@ ip_to_int = lambda ip: sum(
 )
 
 
-def get_host_ip_by_target_ip(target_ip: str) -> str:
+@functools.lru_cache()
+def get_frame_info_callback_type():
+    """
+    Type of the frame callback of MV_CC_RegisterImageCallBackEx
+    """
+    winfun_ctype = (
+        ctypes.WINFUNCTYPE if sys.platform.startswith("win") else ctypes.CFUNCTYPE
+    )
+    return winfun_ctype(
+        None,
+        POINTER(ctypes.c_ubyte),
+        POINTER(hik.MV_FRAME_OUT_INFO_EX),
+        ctypes.c_void_p,
+    )
+
+
+async def _run_in_executor(loop, func, *args):
+    """
+    loop.run_in_executor, but a cancellation waits for func to return before it propagates,
+    so the caller can undo what func did (release a lock it took, remove a waiter it added).
+    """
+    future = loop.run_in_executor(None, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+def _set_future(future, result, exception=None):
+    # Runs in the event loop thread, the future may be cancelled by a timeout meanwhile
+    if future.done():
+        return
+    if exception is None:
+        future.set_result(result)
+    else:
+        future.set_exception(exception)
+
+
+class ImageCallback:
+    """
+    Handler of MV_CC_RegisterImageCallBackEx, runs in the SDK's grabbing thread.
+
+    Each frame goes to the oldest waiter (one waiter per software trigger, a None waiter
+    drops the frame) and to every subscriber. Waiters and subscribers are called as
+    `func(pData, frame_info)` and must be done with pData when they return.
+    """
+
+    def __init__(self, cam: "HikCamera") -> None:
+        self.cam = cam
+        self.waiters = deque()
+        self.subscribers = []
+        self.lock = Lock()
+        # Keep a reference, the SDK only holds the C function pointer
+        self.c_callback = get_frame_info_callback_type()(self._on_frame)
+
+    def add_waiter(self, func) -> None:
+        with self.lock:
+            self.waiters.append(func)
+
+    def remove_waiter(self, func) -> None:
+        with self.lock:
+            if func in self.waiters:
+                self.waiters.remove(func)
+
+    def _on_frame(self, pData, pFrameInfo, pUser) -> None:
+        frame_info = pFrameInfo.contents
+        with self.lock:
+            funcs = [self.waiters.popleft()] if self.waiters else []
+        funcs += list(self.subscribers)
+        for func in funcs:
+            if func is None:
+                continue
+            try:
+                func(pData, frame_info)
+            except Exception as e:
+                # Never raise into the SDK thread
+                boxx.pred(type(e).__name__, e)
+        self.cam._frame_refreshed()
+
+
+def issue_action_command(
+    device_key: int = 1,
+    group_key: int = 1,
+    group_mask: int = 1,
+    broadcast_address: str = "255.255.255.255",
+    timeout_ms: int = 100,
+) -> list:
+    """
+    Broadcast one GigE Vision action command, every camera whose action keys match is triggered at once.
+
+    Args:
+        broadcast_address (str, optional): 广播地址, 多网口时用相机网段的广播地址, 如 "192.168.1.255".
+        timeout_ms (int, optional): 等待相机应答的时间, 0 表示不要应答.
+
+    Returns:
+        IPs of the cameras that acknowledged the command.
+    """
+    stActionCmdInfo = hik.MV_ACTION_CMD_INFO()
+    stActionCmdInfo.nDeviceKey = device_key
+    stActionCmdInfo.nGroupKey = group_key
+    stActionCmdInfo.nGroupMask = group_mask
+    stActionCmdInfo.bActionTimeEnable = 0
+    stActionCmdInfo.pBroadcastAddress = broadcast_address.encode()
+    stActionCmdInfo.nTimeOut = timeout_ms
+    stActionCmdResults = hik.MV_ACTION_CMD_RESULT_LIST()
+    assert not hik.MvCamera.MV_GIGE_IssueActionCommand(
+        stActionCmdInfo, stActionCmdResults
+    )
+    results = stActionCmdResults.pResults[: stActionCmdResults.nNumResults]
+    return [
+        bytes(result.strDeviceAddress).split(b"\0")[0].decode()
+        for result in results
+        if result.nStatus == 0
+    ]
+
+
+# Route lookups by camera IP, and by subnet (/24) for the opt-in per_subnet lookups
+_target_ip_to_host_ip = {}
+_subnet_to_host_ip = {}
+
+
+def get_host_ip_by_target_ip(
+    target_ip: str, cache: bool = True, per_subnet: bool = False
+) -> str:
     """
     Returns the IP address of the network interface
     that is used to connect to the camera with the given IP address.
 
     Args:
         target_ip (str): IP address of the camera.
+        cache (bool, optional): 复用该 IP 已查到的结果. Defaults to True.
+        per_subnet (bool, optional): 复用同一网段 (/24) 已查到的结果, 仅当同一网段的相机都接在同一网口时使用
+            (如 /24 被拆分到多个网口或有更精确的路由时会得到错误的网口). Defaults to False.
 
     Returns:
         IP address of the network interface that is used to connect to the camera.
     """
     import socket
 
-    return [
+    subnet = target_ip.rsplit(".", 1)[0]
+    if cache and target_ip in _target_ip_to_host_ip:
+        return _target_ip_to_host_ip[target_ip]
+    if cache and per_subnet and subnet in _subnet_to_host_ip:
+        return _subnet_to_host_ip[subnet]
+    host_ip = [
         (s.connect((target_ip, 80)), s.getsockname()[0], s.close())
         for s in [socket.socket(socket.AF_INET, socket.SOCK_DGRAM)]
     ][0][1]
+    _target_ip_to_host_ip[target_ip] = host_ip
+    _subnet_to_host_ip[subnet] = host_ip
+    return host_ip
 
 
-def get_setting_df() -> boxx.pd.DataFrame:
+def get_setting_df() -> "boxx.pd.DataFrame":
     """
     Read the MvCameraNode-CH.csv file and return a pandas DataFrame
     which contains the camera settings key names, dependencies, and data types.
@@ -97,15 +276,93 @@ def get_setting_df() -> boxx.pd.DataFrame:
     return setting_df
 
 
-class HikCamera(hik.MvCamera):
+def get_node_table(setting_df: "boxx.pd.DataFrame" = None) -> dict:
+    """
+    Dict version of get_setting_df for O(1) lookup: key -> dict(dtype, depend).
+    The first row wins when a key is listed twice.
+    """
+    if setting_df is None:
+        setting_df = get_setting_df()
+    node_table = {}
+    for key, depend, dtype in zip(
+        setting_df["key"], setting_df["depend"], setting_df["dtype"]
+    ):
+        node_table.setdefault(key, dict(dtype=dtype, depend=depend))
+    return node_table
+
+
+# dtype -> (SDK getter, new value holder, attribute of the value)
+_node_getters = {
+    "iboolean": ("MV_CC_GetBoolValue", ctypes.c_bool, "value"),
+    "ienumeration": ("MV_CC_GetEnumValue", lambda: hik.MVCC_ENUMVALUE(), "nCurValue"),
+    "ifloat": ("MV_CC_GetFloatValue", lambda: hik.MVCC_FLOATVALUE(), "fCurValue"),
+    "iinteger": ("MV_CC_GetIntValueEx", lambda: hik.MVCC_INTVALUE_EX(), "nCurValue"),
+    "istring": ("MV_CC_GetStringValue", lambda: hik.MVCC_STRINGVALUE(), "chCurValue"),
+}
+# dtype -> SDK setter, enumeration and command are handled in _compile_accessors
+_node_setters = {
+    "iboolean": "MV_CC_SetBoolValue",
+    "ifloat": "MV_CC_SetFloatValue",
+    "iinteger": "MV_CC_SetIntValue",
+    "istring": "MV_CC_SetStringValue",
+    "register": "MV_CC_RegisterEventCallBackEx",
+}
+
+
+def gen_nodes_py(path: str = None) -> str:
     """
+    Compile MvCameraNode-CH.csv into the _nodes.py module, so the node table loads without pandas.
+    Rerun it after editing the CSV.
+    """
+    if path is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_nodes.py")
+    lines = [
+        "# Generated from MvCameraNode-CH.csv by hik_camera.hik_camera.gen_nodes_py(), don't edit",
+        "",
+        "# key: (dtype, depend)",
+        "nodes = {",
+    ]
+    for key, node in get_node_table().items():
+        dtype, depend = json.dumps(node["dtype"]), json.dumps(node["depend"])
+        lines.append(f"    {json.dumps(key)}: ({dtype}, {depend}),")
+    lines.append("}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+# Auto mode node -> the node the camera adjusts while it is on
+_auto_nodes = {"ExposureAuto": "ExposureTime", "GainAuto": "Gain"}
+
+
+def _same_setting(current: Any, value: Any) -> bool:
+    if isinstance(value, str) != isinstance(current, str):
+        # Enumeration written by name, read back as integer
+        return False
+    if isinstance(value, float) or isinstance(current, float):
+        # Float nodes are float32 in the camera
+        return abs(current - value) <= 1e-6 * max(abs(value), 1)
+    return current == value
+
+
+class _SettingDf:
+    # Class attribute HikCamera.setting_df, parsed from the CSV with pandas on first access
+    def __get__(self, obj, cls):
+        if not hasattr(self, "df"):
+            self.df = get_setting_df()
+        return self.df
+
+
+class _HikCamera:
+    r"""
     Class that wraps the MVS camera SDK, implementing it as a context manager.
 
+    A subclass of the SDK's MvCamera, built when `HikCamera` is first accessed, see _build_hik_camera.
+
     API reference: %MVCAM_SDK_PATH%\Development\Documentations\Machine Vision Camera SDK Developer Guide Windows (C) V4.3.0.chm
     """
 
     continuous_adjust_exposure_cams = {}
-    _continuous_adjust_exposure_thread_on = False
 
     def __init__(
         self,
@@ -121,17 +378,77 @@ class HikCamera(hik.MvCamera):
             ip (str, optional): 相机 IP. Defaults to ips[0].
             host_ip (str, optional): 从哪个网口. Defaults to None.
             setting_items (dict, optional): 海康相机 xls 的标准命令和值, 更推荐 override setting. Defaults to None.
-            config (dict, optional): 该库的 config . Defaults to dict(lock_name=None(no_lock), repeat_trigger=1).
+            config (dict, optional): 该库的 config . Defaults to dict(lock_name=None(no_lock), repeat_trigger=1, buffer_pool=0).
+                buffer_pool (int): 预分配 n 个对齐的帧缓存, SDK 直接写入其中, get_frame 返回其上的 view (零拷贝),
+                    用完后需调用 `cam.release_frame(img)` 归还. 0 表示不启用, get_frame 返回独立的数组.
+                fast_restore (bool): 重新打开或 reset 后仍调用 setting(), 但跳过相机已是该值的节点 (重新打开时先读回),
+                    再补写 settings_snapshot 中其余不同的节点 (如打开后 setitem 的). Defaults to True.
+                transfer_scheduler (bool): 代替 lock_name, 同一网口 (host_ip) 的相机按网口带宽并发传输,
+                    同时占用网口带宽的相机不超过 网口速率 / 相机链路速率, 排队的相机轮流获得传输.
+                    每帧只在曝光和 PayloadSize 的线上传输时间 (nbytes * 8 / 链路速率) 内占用带宽.
+                    网口速率由 psutil 获取 (pip install hik_camera[nic]), 也可用 nic_mbps 指定,
+                    同一网口的 nic_mbps 须一致.
+                recovery (dict): robust_get_frame 逐级恢复的参数, 传给 RecoveryEngine,
+                    如 dict(budgets=dict(retry=2, device_reset=0), backoff=0.05, max_backoff=2),
+                    每级恢复后以 probe_timeout_ms (默认 3000) 短超时取帧, 失败即升级.
+                exposure_cache (str or bool): adjust_auto_exposure 收敛后的曝光按 IP 存入该 json,
+                    下次 __enter__ 时先写入相机, 自动曝光从接近收敛处开始. True 表示 ~/.cache/hik_camera/exposure.json.
+                    Defaults to None, 不读也不写.
+                health_monitor (bool or dict): 打开后由后台线程定时心跳检测, 掉线的相机标记为 unhealthy,
+                    get_frame 立即抛出 CameraUnhealthyError 而不是等待 TIMEOUT_MS, 并在后台重连.
+                    dict(interval=1.0, failures=2): 心跳间隔秒数, 连续失败几次算掉线.
+                return_frame (bool): get_frame/stream 等返回 Frame (图像 + 帧号, 设备时间戳, 丢包数等帧信息),
+                    而不是 np.ndarray. Defaults to False.
+                retrigger_incomplete (int): 帧有丢包或数据不完整时, 最多重新软触发几次. Defaults to 0.
+                metrics (bool): 记录各阶段耗时直方图 (trigger, sdk_wait, lock_wait, decode, reset, recovery ...)
+                    与计数, 见 get_metrics 与 hik_camera.metrics.to_prometheus. Defaults to True.
         """
         super().__init__()
         self.lock = (
-            Lock()
+            RLock()
         )  # Instantiate a lock used to prevent multiple threads from accessing the camera at the same time during critical operations
         self.TIMEOUT_MS = 40000
         self.is_open = False
         self.last_time_get_frame = 0
+        # KeepAliveGroup of continuous_adjust_exposure
+        self._keep_alive = None
+        # AutoExposureController fed by every decoded frame, see set_host_auto_exposure
+        self.auto_exposure = None
+        self.buffer_pool = None
+        self._pixel_type = self._decoder = None
+        self._link_mbps = None
+        self._node_accessors = {}
+        # key -> value of every node written, restored by restore_settings after reopen or reset
+        self.settings_snapshot = {}
+        # key -> value the device holds, as far as we know
+        self.node_cache = {}
+        # key -> value after DeviceReset, read once by restore_settings
+        self.device_defaults = {}
+        self._after_reset = False
+        # Nodes written while reconfiguring with fast_restore, None otherwise
+        self._restore_written = None
+        self._image_callback = None
+        # (event loop, asyncio.Lock) serializing aget_frame of this camera, see _get_async_lock
+        self._async_lock = (None, None)
+        self._recovery = None
+        # Published by the health monitor, see config["health_monitor"]
+        self.health = None
+        self.health_state = HEALTHY
+        # Keys of the action command trigger, None means software trigger
+        self.action_keys = None
+        self.clock_offset = None
+        # Frame accounting from stFrameInfo, see get_frame_stats
+        self.frame_stats = dict(
+            frames=0, dropped=0, lost_packets=0, incomplete=0, retriggered=0
+        )
+        self._last_frame_num = None
+        self.frame_host_time = None
+        self.frame_complete = True
         self.setting_items = setting_items
         self.config = config
+        # Seconds spent in each phase of the last bring-up: route, create_handle, open, configure, start
+        self.bringup_timing = {}
+        begin = time.perf_counter()
         if ip is None:
             # Get all camera IP addresses
             ip = self.get_all_ips()[0]
@@ -140,7 +457,12 @@ class HikCamera(hik.MvCamera):
             host_ip = get_host_ip_by_target_ip(ip)
         self._ip = ip
         self.host_ip = host_ip
+        self.metrics = get_metrics(ip, (config or {}).get("metrics", True))
+        self.metrics.add_collector("camera", self._collect_metrics)
+        self.bringup_timing["route"] = time.perf_counter() - begin
+        begin = time.perf_counter()
         self._init()
+        self.bringup_timing["create_handle"] = time.perf_counter() - begin
 
     def _init(self) -> None:
         self._init_by_spec_ip()
@@ -162,138 +484,696 @@ class HikCamera(hik.MvCamera):
         # 每隔 120s 拍一次照片来调整自动曝光, 以防止太久没调整自动曝光, 导致曝光失效
         # self.continuous_adjust_exposure(120)
 
-        # 初始化时候, 花两秒来调整自动曝光
+        # 初始化时候, 最多花两秒来调整自动曝光, 收敛后立即结束, 收敛值会用于下次启动
         # self.adjust_auto_exposure(2)
         # self.setitem("GevSCPD", 200)  # 包延时, 单位 ns, 防止多相机同时拍摄丢包, 6 个百万像素相机推荐 15000
+        # 多相机时推荐用 `cams.plan_bandwidth()` 按网口带宽自动计算包大小和包延时
 
-    def _get_one_frame_to_buf(self) -> None:
+    def _get_one_frame_to_buf(self, buf: np.ndarray = None, timeout_ms: int = None) -> None:
         """
         Store camera frame and frame information in the corresponding buffers by reference.
+
+        Args:
+            buf (np.ndarray, optional): C-contiguous array the SDK writes the frame into.
+                Defaults to None, which means self.data_buf.
+            timeout_ms (int, optional): Defaults to self.TIMEOUT_MS.
         """
+        timeout_ms = timeout_ms or self.TIMEOUT_MS
+        if self._image_callback is not None:
+            self._get_one_frame_by_callback(self.data_arr if buf is None else buf, timeout_ms)
+            self._frame_refreshed()
+            self._account_frame()
+            return
+        if buf is None:
+            pData, nDataSize = byref(self.data_buf), self.nPayloadSize
+        else:
+            pData = buf.ctypes.data_as(POINTER(ctypes.c_ubyte))
+            nDataSize = buf.nbytes
         # Thread-safe (atomic) camera triggering (single frame)
+        begin = time.perf_counter()
         with self.lock:
-            # Software camera trigger
-            assert not self.MV_CC_SetCommandValue("TriggerSoftware")
+            locked = time.perf_counter()
+            # Software camera trigger, action command is issued by MultiHikCamera.sync_get_frame
+            if self.action_keys is None:
+                assert not self.MV_CC_SetCommandValue("TriggerSoftware")
+            triggered = time.perf_counter()
             # Frame acquisition:
-            # SDK C API will save the frame data to the buffer by reference (byref(self.data_buf))
+            # SDK C API will save the frame data to the buffer by reference (pData)
             # and will save the frame information to the frame information structure by reference
             # (self.stFrameInfo, called by reference in the python wrapper for the C API)
             assert not self.MV_CC_GetOneFrameTimeout(
-                byref(self.data_buf),
-                self.nPayloadSize,
+                pData,
+                nDataSize,
                 self.stFrameInfo,
-                self.TIMEOUT_MS,
+                timeout_ms,
             ), self.ip
-        self.last_time_get_frame = time.time()
-
-    def get_frame_with_config(self) -> None:
+        # Recorded out of the camera lock
+        metrics = self.metrics
+        metrics.observe("camera_lock_wait", locked - begin)
+        metrics.observe("trigger", triggered - locked)
+        metrics.observe("sdk_wait", time.perf_counter() - triggered)
+        self._frame_refreshed()
+        self._account_frame()
+
+    def _get_transfer_lock(self, timeout_ms: int = None):
         """
-        Frame acquisition from the camera.
+        What a grab holds from the trigger to the frame: the lock of config["lock_name"],
+        or a transfer slot of the NIC with config["transfer_scheduler"].
         """
+        timeout_ms = timeout_ms or self.TIMEOUT_MS
         # Get user-defined configuration (if any)
         config = self.config if self.config else {}
+        if config.get("transfer_scheduler"):
+            # Share the bandwidth of the NIC with the other cameras behind it
+            scheduler = get_scheduler(self.host_ip, config.get("nic_mbps"))
+            # The NIC is held for the exposure (of the last frame) and the payload on the wire
+            return scheduler.transfer(
+                self.ip,
+                self.get_link_mbps(),
+                self.nPayloadSize,
+                timeout_ms / 1000,
+                lead=self.stFrameInfo.fExposureTime / 1e6,
+            )
         # Get lock name from user configuration
         lock_name = config.get("lock_name")
         # Get lock from lock name, otherwise create a new lock
-        lock = (
+        return (
             _lock_name_to_lock[lock_name]
             if lock_name in _lock_name_to_lock
             else _lock_name_to_lock.setdefault(lock_name, Lock())
         )
+
+    def _get_trigger_counts(self) -> tuple:
+        """
+        (repeat_trigger, retrigger_incomplete) of the configuration.
+        """
+        config = self.config if self.config else {}
         # Get number of times to trigger the camera from user configuration.
         # Default is 1.
         repeat_trigger = config.get("repeat_trigger", 1)
+        if self.action_keys is not None:
+            # One action command, one frame
+            # An action command is issued for all cameras at once, a single camera cannot be retriggered
+            return 1, 0
+        return repeat_trigger, config.get("retrigger_incomplete", 0)
+
+    def get_frame_with_config(self, buf: np.ndarray = None, timeout_ms: int = None) -> None:
+        """
+        Frame acquisition from the camera.
+
+        Args:
+            buf (np.ndarray, optional): where the SDK writes the frame. Defaults to self.data_buf.
+            timeout_ms (int, optional): Defaults to self.TIMEOUT_MS.
+        """
+        if self.health_state != HEALTHY:
+            self._raise_unhealthy()
+        lock = self._get_transfer_lock(timeout_ms)
+        repeat_trigger, retrigger = self._get_trigger_counts()
         # Thread-safe (atomic) camera triggering for the given number of times
+        begin = time.perf_counter()
         with lock:
+            locked = time.perf_counter()
+            # Waiting for the other cameras of lock_name, or for a transfer slot of the NIC
+            self.metrics.observe("lock_wait", locked - begin)
             for i in range(repeat_trigger):
-                self._get_one_frame_to_buf()
-
-    def get_frame(self) -> np.ndarray:
+                self._get_one_frame_to_buf(buf, timeout_ms)
+            for i in range(retrigger):
+                if self.frame_complete:
+                    break
+                self.frame_stats["retriggered"] += 1
+                self._get_one_frame_to_buf(buf, timeout_ms)
+        self.metrics.observe("grab", time.perf_counter() - locked)
+
+    def get_frame(self, out: np.ndarray = None, timeout_ms: int = None) -> np.ndarray:
         """
         Get a frame from the camera.
+
+        Args:
+            out (np.ndarray, optional): 调用方预分配的数组, 帧会被写入其中.
+                若 out 是 C 连续的且大小恰为 PayloadSize, SDK 会直接写入 out, 没有任何拷贝;
+                否则 out 的 shape 和 dtype 须与解码结果一致. Defaults to None.
+            timeout_ms (int, optional): 等待帧的毫秒数. Defaults to self.TIMEOUT_MS.
+
+        Returns:
+            A numpy array of the frame. With config["buffer_pool"], it is a view on a pooled
+            buffer that stays valid until `self.release_frame(img)`.
+        """
+        begin = time.perf_counter()
+        pool = self.buffer_pool
+        slot = None
+        direct = (
+            out is not None
+            and out.flags.c_contiguous
+            and out.nbytes == self.nPayloadSize
+        )
+        if direct:
+            # SDK writes the frame straight into the caller's array
+            buf = out.reshape(-1).view(np.uint8)
+        elif out is None and pool is not None:
+            slot = pool.acquire((timeout_ms or self.TIMEOUT_MS) / 1000)
+            buf = pool.buffer(slot)
+        else:
+            buf = self.data_arr
+        try:
+            # Get frame from the camera
+            self.get_frame_with_config(buf, timeout_ms)
+            # Frame is stored in buf
+            # Frame information is stored in stFrameInfo
+            decoder = self.get_decoder()
+            h, w = self.stFrameInfo.nHeight, self.stFrameInfo.nWidth
+            shape = decoder.get_shape(h, w)
+            if not direct and out is not None:
+                # np.copyto would broadcast a wrong shape and cast a wrong dtype silently
+                assert out.shape == shape and out.dtype == decoder.dtype, (
+                    f"out of {self.ip} must be {shape} {decoder.dtype} or PayloadSize bytes, "
+                    f"got {out.shape} {out.dtype}"
+                )
+            elif not direct:
+                if slot is not None and not decoder.view:
+                    # Decode into the output owned by the slot, no allocation per frame
+                    out = pool.out(slot, shape, decoder.dtype)
+                elif slot is None and decoder.view:
+                    # self.data_buf will be overwritten by the next frame, copy it out
+                    out = np.empty(shape, decoder.dtype)
+            img = self._decode_frame(buf, None if direct else out)
+        except BaseException:
+            self.metrics.inc("get_frame_errors")
+            if slot is not None:
+                pool.release_slot(slot)
+            raise
+        self.metrics.observe("get_frame", time.perf_counter() - begin)
+        return img
+
+    def get_preview(self, scale: int = 4, poww: float = 0.5) -> np.ndarray:
+        """
+        A small uint8 frame for live view, decoded straight from the frame buffer.
+
+        Only the sampled pixels are unpacked, Bayer frames are developed by 2x2 superpixel
+        instead of demosaicing, so it costs a fraction of get_frame + raw_to_uint8_rgb.
+
+        Args:
+            scale (int, optional): 宽高缩小倍数, Bayer 格式会向上取偶数. Defaults to 4.
+            poww (float, optional): raw 转 uint8 时的 gamma, 8bit 的 Mono 和彩色格式已由相机处理, 不再调整. Defaults to 0.5.
+
+        Returns:
+            uint8 (h // scale, w // scale, 3) RGB, or (h // scale, w // scale) for Mono.
+        """
+        self.get_frame_with_config(self.data_arr)
+        h, w = self.stFrameInfo.nHeight, self.stFrameInfo.nWidth
+        return decode_preview(self.data_arr, h, w, self.get_decoder(), scale, poww)
+
+    def get_decoder(self) -> Decoder:
+        """
+        Decoder of the current pixel format, resolved from stFrameInfo.enPixelType.
+        It is only looked up again when the pixel type changes.
         """
-        # Retrieve the frame information generated at camera initialization
-        stFrameInfo = self.stFrameInfo
-
-        # Get frame from the camera
-        self.get_frame_with_config()
-        # Frame is stored in data_buf
-        # Frame information is stored in stFrameInfo
-
-        # Get the frame width and height from the frame information
-        h, w = stFrameInfo.nHeight, stFrameInfo.nWidth
-        # Get the frame bit depth from the frame information
-        self.bit = bit = self.nPayloadSize * 8 // h // w
-        self.shape = h, w
-        if bit == 8:
-            # BW image
-            img = np.array(self.data_buf).copy().reshape(*self.shape)
-        elif bit == 24:
-            # RGB image
-            self.shape = (h, w, 3)
-            img = np.array(self.data_buf).copy().reshape(*self.shape)
-        elif bit == 16:
-            # TODO is this a 16bit raw image?
-            raw = np.array(self.data_buf).copy().reshape(h, w, 2)
-            img = raw[..., 1].astype(np.uint16) * 256 + raw[..., 0]
-        elif bit == 12:
-            # TODO is this 12bit raw image?
-            self.shape = h, w
-            arr = np.array(self.data_buf).copy().astype(np.uint16)
-            arr2 = arr[1::3]
-            arrl = (arr[::3] << 4) + ((arr2 & ~np.uint16(15)) >> 4)
-            arrr = (arr[2::3] << 4) + (arr2 & np.uint16(15))
-            img = np.concatenate([arrl[..., None], arrr[..., None]], 1).reshape(
-                self.shape
+        pixel_type = self.stFrameInfo.enPixelType
+        if pixel_type != self._pixel_type:
+            decoder = get_decoder(pixel_type)
+            self._decoder, self._pixel_type = decoder, pixel_type
+            self.bit = decoder.bit
+            self.pixel_format = decoder.name
+        return self._decoder
+
+    def _decode_frame(self, buf: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Decode the frame in `buf` according to self.stFrameInfo, returning a view on `buf` if possible.
+        """
+        h, w = self.stFrameInfo.nHeight, self.stFrameInfo.nWidth
+        begin = time.perf_counter()
+        img = self.get_decoder().decode(buf, h, w, out)
+        self.metrics.observe("decode", time.perf_counter() - begin)
+        self.shape = img.shape
+        if self.auto_exposure is not None:
+            # Exposure and gain the frame was taken with, frames in flight may predate the last update
+            info = self.stFrameInfo
+            self.auto_exposure.update(
+                img, info.fExposureTime or None, getattr(info, "fGain", None)
+            )
+        if self.config and self.config.get("return_frame"):
+            return Frame(
+                img, self.ip, self.stFrameInfo, self.frame_host_time, self.frame_complete
             )
         return img
 
-    def reset(self) -> None:
+    def release_frame(self, img: np.ndarray) -> None:
+        """
+        Hand a frame returned by get_frame back to the buffer pool (config["buffer_pool"]).
+        The frame must not be used afterwards. No-op for frames not from the pool.
+        """
+        if self.buffer_pool is not None:
+            self.buffer_pool.release(img.img if isinstance(img, Frame) else img)
+
+    def stream(
+        self, fps: float = None, node_num: int = 8, backpressure: str = "drop_oldest"
+    ):
+        """
+        Free-running acquisition at the camera's frame rate, without per-frame software trigger.
+
+        Usage:
+            with cam, contextlib.closing(cam.stream(fps=30)) as frames:
+                for img in frames:
+                    ...  # break to stop streaming, the camera goes back to software trigger
+
+        The trigger mode and the SDK image buffers are restored when the generator is closed.
+        A generator that is kept unclosed leaves the camera free-running until it is garbage collected,
+        use contextlib.closing, or close() it, when it may outlive the loop.
+
+        Args:
+            fps (float, optional): AcquisitionFrameRate. Defaults to None, the full sensor frame rate.
+            node_num (int, optional): SDK image buffer node count (MV_CC_SetImageNodeNum). Defaults to 8.
+            backpressure (str, optional): what happens when the consumer is slower than the camera.
+                - "drop_oldest": SDK keeps the newest node_num frames and drops older ones,
+                    each yielded frame is as fresh as possible (MV_GrabStrategy_LatestImages)
+                - "block": frames are yielded one by one in arrival order, at the consumer's pace,
+                    new frames are dropped by the SDK once all nodes are full (MV_GrabStrategy_OneByOne)
+
+        Yields:
+            Frames like get_frame. With config["buffer_pool"], release them by `self.release_frame(img)`.
+        """
+        strategies = dict(
+            drop_oldest=hik.MV_GrabStrategy_LatestImages,
+            block=hik.MV_GrabStrategy_OneByOne,
+        )
+        assert backpressure in strategies, backpressure
+        assert self.is_open, "Use stream() in `with cam:`"
+        assert self._image_callback is None, "Image callback is on, use astream()"
+        previous = dict(self.grab_buffers)
+        assert not self.MV_CC_StopGrabbing()
+        try:
+            self._set_free_run(fps)
+            self._set_grab_buffers(
+                node_num,
+                strategies[backpressure],
+                node_num if backpressure == "drop_oldest" else None,
+            )
+            assert not self.MV_CC_StartGrabbing()
+            stOutFrame = hik.MV_FRAME_OUT()
+            memset(byref(stOutFrame), 0, sizeof(stOutFrame))
+            while True:
+                with self.lock:
+                    assert not self.MV_CC_GetImageBuffer(
+                        stOutFrame, self.TIMEOUT_MS
+                    ), self.ip
+                self._frame_refreshed()
+                try:
+                    img = self._decode_detached(
+                        stOutFrame.pBufAddr, stOutFrame.stFrameInfo
+                    )
+                finally:
+                    self.MV_CC_FreeImageBuffer(stOutFrame)
+                yield img
+        finally:
+            self.MV_CC_StopGrabbing()
+            # get_frame expects one frame per trigger, in order
+            self._set_grab_buffers(**previous)
+            self._set_trigger()
+            assert not self.MV_CC_StartGrabbing()
+
+    def _set_grab_buffers(
+        self, node_num: int, strategy: int, output_queue_size: int = None
+    ) -> None:
         """
-        Reset the camera.
+        SDK image buffer count and grab strategy, set while not grabbing. Recorded in self.grab_buffers,
+        the SDK has no getter for them.
+        """
+        assert not self.MV_CC_SetImageNodeNum(node_num)
+        assert not self.MV_CC_SetGrabStrategy(strategy)
+        if output_queue_size is not None:
+            # Only used by MV_GrabStrategy_LatestImages
+            assert not self.MV_CC_SetOutputQueueSize(output_queue_size)
+        self.grab_buffers = dict(
+            node_num=node_num,
+            strategy=strategy,
+            output_queue_size=output_queue_size or self.grab_buffers["output_queue_size"],
+        )
+
+    def _set_free_run(self, fps: float = None) -> None:
+        self.setitem("TriggerMode", hik.MV_TRIGGER_MODE_OFF)
+        if fps:
+            self.setitem("AcquisitionFrameRateEnable", True)
+            self.setitem("AcquisitionFrameRate", float(fps))
+        else:
+            self.setitem("AcquisitionFrameRateEnable", False)
+
+    def _decode_detached(self, pData, frame_info) -> np.ndarray:
+        """
+        Decode a frame held in SDK memory (image buffer or callback) into memory we own:
+        a new array, or a buffer pool slot with config["buffer_pool"].
+        """
+        ctypes.memmove(
+            ctypes.addressof(self.stFrameInfo),
+            ctypes.addressof(frame_info),
+            sizeof(self.stFrameInfo),
+        )
+        self._account_frame()
+        info = self.stFrameInfo
+        buf = np.ctypeslib.as_array(pData, (info.nFrameLen,))
+        decoder = self.get_decoder()
+        shape = decoder.get_shape(info.nHeight, info.nWidth)
+        if self.buffer_pool is None:
+            return self._decode_frame(buf, np.empty(shape, decoder.dtype))
+        slot = self.buffer_pool.acquire(self.TIMEOUT_MS / 1000)
+        try:
+            return self._decode_frame(buf, self.buffer_pool.out(slot, shape, decoder.dtype))
+        except BaseException:
+            self.buffer_pool.release_slot(slot)
+            raise
+
+    def _enable_image_callback(self) -> "ImageCallback":
+        """
+        Switch frame delivery to MV_CC_RegisterImageCallBackEx, which needs grabbing to restart.
         """
-        # Thread-safe (atomic) camera reset.
+        with self.lock:
+            if self._image_callback is None:
+                callback = ImageCallback(self)
+                assert not self.MV_CC_StopGrabbing()
+                assert not self.MV_CC_RegisterImageCallBackEx(callback.c_callback, None)
+                assert not self.MV_CC_StartGrabbing()
+                self._image_callback = callback
+        return self._image_callback
+
+    def _get_one_frame_by_callback(self, buf: np.ndarray, timeout_ms: int) -> None:
+        """
+        _get_one_frame_to_buf once the image callback is on, MV_CC_GetOneFrameTimeout is unusable then.
+        """
+        done = Event()
+
+        def on_frame(pData, frame_info):
+            assert frame_info.nFrameLen <= buf.nbytes, (frame_info.nFrameLen, buf.nbytes)
+            begin = time.perf_counter()
+            ctypes.memmove(buf.ctypes.data, pData, frame_info.nFrameLen)
+            ctypes.memmove(
+                ctypes.addressof(self.stFrameInfo),
+                ctypes.addressof(frame_info),
+                sizeof(self.stFrameInfo),
+            )
+            self.metrics.observe("memcpy", time.perf_counter() - begin)
+            done.set()
+
+        begin = time.perf_counter()
+        self._trigger_for_callback(on_frame)
+        triggered = time.perf_counter()
+        if not done.wait(timeout_ms / 1000):
+            self._image_callback.remove_waiter(on_frame)
+            raise TimeoutError(f"No frame from {self.ip} in {timeout_ms}ms")
+        self.metrics.observe("trigger", triggered - begin)
+        self.metrics.observe("sdk_wait", time.perf_counter() - triggered)
+
+    def _trigger_for_callback(self, on_frame, repeat_trigger: int = 1) -> None:
+        """
+        Software trigger `repeat_trigger` times, `on_frame(pData, frame_info)` receives the last frame.
+        """
+        assert self.action_keys is None, "Needs software trigger, call set_software_trigger()"
+        callback = self._enable_image_callback()
+        for i in range(repeat_trigger):
+            waiter = on_frame if i == repeat_trigger - 1 else None
+            callback.add_waiter(waiter)
+            try:
+                with self.lock:
+                    assert not self.MV_CC_SetCommandValue("TriggerSoftware")
+            except BaseException:
+                callback.remove_waiter(waiter)
+                raise
+
+    async def aget_frame(self) -> np.ndarray:
+        """
+        Coroutine version of get_frame, with the same configuration: lock_name or
+        transfer_scheduler, repeat_trigger and retrigger_incomplete.
+
+        Frames are delivered by the SDK image callback (MV_CC_RegisterImageCallBackEx), so no thread
+        is blocked while waiting for the frame. Taking the lock and the software trigger run in the
+        default executor. Concurrent calls on one camera queue up in the event loop, only one at
+        a time waits for the lock in an executor thread.
+        """
+        if self.health_state != HEALTHY:
+            self._raise_unhealthy()
+        loop = asyncio.get_running_loop()
+        repeat_trigger, retrigger = self._get_trigger_counts()
+        begin = time.perf_counter()
+        async with self._get_async_lock(loop):
+            lock = self._get_transfer_lock()
+            with contextlib.ExitStack() as stack:
+                await _run_in_executor(loop, stack.enter_context, lock)
+                locked = time.perf_counter()
+                self.metrics.observe("lock_wait", locked - begin)
+                img = await self._atrigger(loop, repeat_trigger)
+                for i in range(retrigger):
+                    if self.frame_complete:
+                        break
+                    self.frame_stats["retriggered"] += 1
+                    self.release_frame(img)
+                    img = await self._atrigger(loop, 1)
+        self.metrics.observe("grab", time.perf_counter() - locked)
+        return img
+
+    def _get_async_lock(self, loop) -> "asyncio.Lock":
+        """
+        The asyncio.Lock of this camera in `loop`, a new one for each event loop (e.g. asyncio.run).
+        """
+        lock_loop, lock = self._async_lock
+        if lock_loop is not loop:
+            lock = asyncio.Lock()
+            self._async_lock = (loop, lock)
+        return lock
+
+    async def _atrigger(self, loop, repeat_trigger: int = 1) -> np.ndarray:
+        """
+        Software trigger `repeat_trigger` times and wait for the decoded last frame.
+        """
+        future = loop.create_future()
+
+        def deliver(img):
+            if future.done():
+                # Timed out or cancelled meanwhile
+                self.release_frame(img)
+            else:
+                future.set_result(img)
+
+        def on_frame(pData, frame_info):
+            try:
+                img = self._decode_detached(pData, frame_info)
+            except Exception as e:
+                loop.call_soon_threadsafe(_set_future, future, None, e)
+            else:
+                loop.call_soon_threadsafe(deliver, img)
+
+        try:
+            await _run_in_executor(
+                loop, self._trigger_for_callback, on_frame, repeat_trigger
+            )
+            return await asyncio.wait_for(future, self.TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No frame from {self.ip} in {self.TIMEOUT_MS}ms")
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._image_callback is not None:
+                # Otherwise the next trigger's frame goes to this dead waiter
+                self._image_callback.remove_waiter(on_frame)
+
+    async def arobust_get_frame(self) -> np.ndarray:
+        """
+        Coroutine version of robust_get_frame.
+        """
+        try:
+            return await self.aget_frame()
+        except CameraUnhealthyError:
+            raise
+        except Exception as e:
+            boxx.pred(type(e).__name__, e)
+            recover = functools.partial(self.recovery.run, self.get_frame, error=e)
+            return await asyncio.get_running_loop().run_in_executor(None, recover)
+
+    async def astream(self, fps: float = None, maxsize: int = 8):
+        """
+        Free-running acquisition as an async generator, frames are delivered by the SDK image callback.
+
+        Usage:
+            async with contextlib.aclosing(cam.astream(fps=30)) as frames:
+                async for img in frames:
+                    ...
+
+        The camera is back in software trigger mode once the generator is closed,
+        a plain `async for` + `break` only closes it later when it is garbage collected.
+
+        Args:
+            fps (float, optional): AcquisitionFrameRate. Defaults to None, the full sensor frame rate.
+            maxsize (int, optional): frames queued for the consumer, the oldest is dropped when full.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize)
+
+        def put(img):
+            if queue.full():
+                self.release_frame(queue.get_nowait())
+            queue.put_nowait(img)
+
+        def on_frame(pData, frame_info):
+            img = self._decode_detached(pData, frame_info)
+            loop.call_soon_threadsafe(put, img)
+
+        def start():
+            callback = self._enable_image_callback()
+            self._set_free_run(fps)
+            callback.subscribers.append(on_frame)
+
+        def stop():
+            self._image_callback.subscribers.remove(on_frame)
+            self._set_trigger()
+
+        await loop.run_in_executor(None, start)
+        try:
+            while True:
+                yield await asyncio.wait_for(queue.get(), self.TIMEOUT_MS / 1000)
+        finally:
+            await loop.run_in_executor(None, stop)
+
+    # Seconds to wait for the camera to go down after DeviceReset, before waiting for it to come back
+    RESET_DOWN_TIMEOUT = 2
+
+    def reset(self, timeout: float = 20) -> None:
+        """
+        Reset the camera, then open and configure it again.
+
+        The lock is not held while the camera reboots.
+        """
+        self.metrics.inc("resets")
+        reset_begin = time.perf_counter()
         with self.lock:
             try:
                 self.MV_CC_SetCommandValue("DeviceReset")
             except Exception as e:
                 print(e)
-            time.sleep(5)  # reset 后需要等一等
-            self.waite()
+            self.is_open = False
+        begin = time.time()
+        # reset 后需要等相机重启: 先等它掉线, 再等它上线
+        while self._ping() and time.time() - begin < self.RESET_DOWN_TIMEOUT:
+            time.sleep(0.05)
+        self.waite(timeout)
+        while True:
+            try:
+                with self.lock:
+                    self._on_device_reset()
+                    self._init()
+                    self.__enter__()
+                self.metrics.observe("reset", time.perf_counter() - reset_begin)
+                return
+            except Exception:
+                # 刚上线的相机可能还不能打开
+                if time.time() - begin > timeout:
+                    raise
+                self.MV_CC_DestroyHandle()
+                time.sleep(0.2)
+
+    def _on_device_reset(self) -> None:
+        # The device is back to its defaults, learnt by restore_settings after the first reset
+        self.node_cache = dict(self.device_defaults)
+        self._after_reset = True
+        # The device clock restarts
+        self.clock_offset = None
+
+    @property
+    def recovery(self) -> RecoveryEngine:
+        if self._recovery is None:
+            self._recovery = RecoveryEngine(self, **(self.config or {}).get("recovery", {}))
+        return self._recovery
+
+    def get_recovery_stats(self) -> dict:
+        """
+        Counters and timing of robust_get_frame recoveries, see RecoveryEngine.get_stats.
+        """
+        return self.recovery.get_stats()
+
+    # Remedies of the recovery levels, from cheap to expensive
+    def _recover_retry(self) -> None:
+        pass
+
+    def _recover_clear_buffer(self) -> None:
+        with self.lock:
+            assert not self.MV_CC_ClearImageBuffer()
+
+    def _recover_restart_grabbing(self) -> None:
+        with self.lock:
+            self.MV_CC_StopGrabbing()
+            assert not self.MV_CC_StartGrabbing()
+
+    def _recover_reopen(self) -> None:
+        with self.lock:
+            self.MV_CC_StopGrabbing()
+            self.MV_CC_CloseDevice()
+            self.MV_CC_DestroyHandle()
+            self.is_open = False
             self._init()
             self.__enter__()
 
+    def _recover_device_reset(self) -> None:
+        self.reset()
+
     def robust_get_frame(self) -> np.ndarray:
         """
         Returns a frame from the camera.
-        If an error occurs, the camera is reset and the frame is reacquired.
+        If an error occurs, the camera is recovered level by level and the frame is reacquired:
+        retry, clear buffer, restart grabbing, reopen, and DeviceReset as the last resort.
 
         - Returns:
             A numpy array of the frame.
 
-        遇到错误, 会自动 reset device 并 retry 的 get frame
+        遇到错误, 会逐级恢复相机 (最后才 reset device) 并 retry 的 get frame
         - 支持断网重连后继续工作
+        - 恢复次数和耗时见 `cam.get_recovery_stats()`, 参数见 config["recovery"]
         """
         try:
             return self.get_frame()
+        except CameraUnhealthyError:
+            # The health monitor is already reconnecting it
+            raise
         except Exception as e:
             print(boxx.prettyFrameLocation())
             boxx.pred(type(e).__name__, e)
-            self.reset()
-            return self.get_frame()
+            return self.recovery.run(self.get_frame, error=e)
+
+    def _heartbeat(self) -> tuple:
+        """
+        Cheap liveness check for the health monitor.
+
+        Returns:
+            (ok, error): A register read when the lock is free,
+                otherwise a frame is being grabbed and a GVCP probe is used.
+        """
+        if self.lock.acquire(blocking=False):
+            try:
+                self._get_accessors("GevSCPSPacketSize")[0]()
+                return True, None
+            except Exception as e:
+                return False, f"{type(e).__name__}: {e}"
+            finally:
+                self.lock.release()
+        if self._ping():
+            return True, None
+        return False, "GVCP probe timeout"
+
+    def _raise_unhealthy(self) -> None:
+        health = self.health or {}
+        raise CameraUnhealthyError(
+            f"{self.ip} is {self.health_state} since {time.ctime(health.get('since'))}: "
+            f"{health.get('last_error')}"
+        )
+
+    def get_health(self) -> dict:
+        """
+        Health published by the monitor, None without config["health_monitor"].
+
+        Returns:
+            dict(state="healthy"/"unhealthy"/"reconnecting", since, failures, last_check, last_error, reconnects)
+        """
+        return None if self.health is None else dict(self.health)
 
     def _ping(self) -> bool:
         """
-        Returns True if the camera is connected to the network.
+        Returns True if the camera answers on the network (GigE Vision discovery, in process).
         """
-        if sys.platform.startswith("win"):
-            return not os.system("ping -n 1 " + self.ip + " > nul")
-        else:
-            if os.system("which ping>/dev/null"):
-                print("Not found ping in os.system")
-                boxx.sleep(18)
-                return True
-            return not os.system("ping -c 1 -w 1 " + self.ip + " > /dev/null")
+        return gvcp_probe(self.ip)
 
     def waite(self, timeout: int = 20) -> None:
         """
@@ -319,12 +1199,15 @@ class HikCamera(hik.MvCamera):
         return list(filter(None, ips))
 
     @classmethod
-    def get_cams(cls, ips=None) -> dict[str, "HikCamera"]:
+    def get_cams(cls, ips=None, max_workers: int = 16, **kwargs) -> "MultiHikCamera":
         """
         Class method that returns a dictionary of all connected cameras.
+        The cameras are constructed in parallel, each on its own worker thread of MultiHikCamera.
 
         args:
             ips (list[str], optional): List of IP addresses of the cameras to connect to. Defaults to None.
+            max_workers (int, optional): 同时初始化 (及 `with cams:` 打开) 的相机数上限. Defaults to 16.
+            **kwargs: 传给每个相机的构造函数, 如 host_ip, setting_items, config.
 
         Returns:
             Dictionary of all connected Hik cameras.
@@ -333,7 +1216,14 @@ class HikCamera(hik.MvCamera):
             ips = cls.get_all_ips()
         else:
             ips = sorted(ips)
-        cams = MultiHikCamera({ip: cls(ip) for ip in ips})
+        cams = MultiHikCamera()
+        cams.max_workers = max_workers
+        futures = {
+            ip: cams._get_worker(ip).submit(cams._bounded, cls, ip, **kwargs)
+            for ip in ips
+        }
+        for ip in ips:
+            cams[ip] = futures[ip].result()
         return cams
 
     get_all_cams = get_cams
@@ -373,8 +1263,7 @@ class HikCamera(hik.MvCamera):
         """
         Exposure time setter.
         """
-        assert not self.MV_CC_SetEnumValueByString("ExposureAuto", "Off")
-        assert not self.MV_CC_SetFloatValue("ExposureTime", t)
+        self._set_items(dict(ExposureAuto="Off", ExposureTime=float(t)))
 
     def get_exposure_by_second(self) -> float:
         """
@@ -388,61 +1277,195 @@ class HikCamera(hik.MvCamera):
         """
         self.set_exposure(int(t / 1e-6))
 
-    def adjust_auto_exposure(self, t=2):
-        boxx.sleep(0.1)
+    def set_host_auto_exposure(self, **kwargs) -> AutoExposureController:
+        """
+        Auto exposure computed on the host from every decoded frame, converges in 2~3 frames.
+        Replaces the camera's ExposureAuto, which adjusts slowly and only while frames are flowing.
+
+        Args:
+            **kwargs: 传给 AutoExposureController, 如 target=0.45, roi=(0.25, 0.25, 0.75, 0.75), max_exposure=100000.
+
+        Returns:
+            The controller, also `self.auto_exposure`. Set `self.auto_exposure = None` to stop.
+        """
+        self.auto_exposure = AutoExposureController(self, **kwargs)
+        self.auto_exposure.start()
+        return self.auto_exposure
+
+    def adjust_auto_exposure(
+        self, t=2, tolerance=0.02, interval=0.05, stable=3
+    ) -> dict:
+        """
+        Run the camera's auto exposure on free-running frames until ExposureTime and Gain
+        stay within `tolerance` for `stable` polls in a row, or at most `t` seconds.
+        The converged values are stored in config["exposure_cache"] (if set) to seed the next __enter__.
+        Gain is only polled on cameras that have it.
+
+        Args:
+            t (float, optional): 最长调整秒数. Defaults to 2.
+            tolerance (float, optional): 相邻两次读取 ExposureTime 的相对变化 (Gain 为 dB 变化) 小于该值视为稳定. Defaults to 0.02.
+            interval (float, optional): 读取间隔秒数. Defaults to 0.05.
+            stable (int, optional): 连续稳定几次视为收敛. Defaults to 3.
+
+        Returns:
+            dict(ExposureTime, Gain (if any), converged, polls, spend)
+        """
+        begin = time.time()
+        keys = ["ExposureTime"] + (["Gain"] if self._has_node("Gain") else [])
+        grabbing = self.is_open
+        if grabbing:
+            self.MV_CC_StopGrabbing()
+        self._set_free_run()
+        stOutFrame = hik.MV_FRAME_OUT()
+        memset(byref(stOutFrame), 0, sizeof(stOutFrame))
+        last, n_stable, polls = None, 0, 0
         try:
-            self.MV_CC_StartGrabbing()
+            assert not self.MV_CC_StartGrabbing()
             print("before_exposure", self.get_exposure())
-            boxx.sleep(t)
-            print("after_exposure", self.get_exposure())
+            while True:
+                # The camera adjusts on the frames it sends, drain one
+                if not self.MV_CC_GetImageBuffer(stOutFrame, int(interval * 1000) + 1):
+                    self.MV_CC_FreeImageBuffer(stOutFrame)
+                values = self.get_items(keys)
+                polls += 1
+                if last is not None and (
+                    abs(values["ExposureTime"] - last["ExposureTime"])
+                    <= tolerance * last["ExposureTime"]
+                    and abs(values.get("Gain", 0) - last.get("Gain", 0)) <= tolerance
+                ):
+                    n_stable += 1
+                else:
+                    n_stable = 0
+                last = values
+                if n_stable >= stable or time.time() - begin >= t:
+                    break
+                time.sleep(interval)
         finally:
             self.MV_CC_StopGrabbing()
+            self._set_trigger()
+            if grabbing:
+                assert not self.MV_CC_StartGrabbing()
+        converged = n_stable >= stable
+        spend = time.time() - begin
+        print("after_exposure", last["ExposureTime"], f"converged={converged} in {spend:.2f}s")
+        cache_path = self._get_exposure_cache_path()
+        if converged and cache_path:
+            save_exposure(self.ip, last, cache_path)
+        return dict(last, converged=converged, polls=polls, spend=spend)
+
+    def _get_exposure_cache_path(self):
+        path = (self.config or {}).get("exposure_cache")
+        return DEFAULT_EXPOSURE_CACHE if path is True else path
+
+    def _has_node(self, key: str) -> bool:
+        """
+        Whether the camera implements node `key`, e.g. some models have no Gain.
+        """
+        try:
+            self.getitem(key)
+            return True
+        except AssertionError:
+            return False
+
+    def _seed_exposure(self) -> None:
+        """
+        Start from the last converged exposure of adjust_auto_exposure, if any.
+        ExposureTime is only writable with ExposureAuto off, the auto modes are restored afterwards.
+        """
+        cache_path = self._get_exposure_cache_path()
+        seed = cache_path and load_exposure_cache(cache_path).get(self.ip)
+        if not seed:
+            return
+        try:
+            modes = self.get_items(
+                ["ExposureAuto"] + (["GainAuto"] if "Gain" in seed else [])
+            )
+            off = {key: "Off" for key in modes}
+            self._set_items(dict(off, **seed), record=False)
+            self._set_items(modes, record=False)
+        except (AssertionError, NotImplementedError) as e:
+            boxx.pred("Seed exposure", type(e).__name__, e)
 
     def continuous_adjust_exposure(self, interval=60):
         """
         Set camera to continuous exposure mode.
 
-        触发模式下, 会额外起一条全局守护线程, 对每个注册的相机每隔大致 interval 秒, 拍一次照
-        以调整自动曝光.
-        如果某个相机正常拍照了, 守护线程也会得知那个相机更新过曝光
+        触发模式下, 会对每个注册的相机每隔大致 interval 秒, 拍一次照以调整自动曝光.
+        同一 lock_name (未设置则同一网口 host_ip) 的相机共用一条守护线程, 按下次到期时间排队.
+        如果某个相机正常拍照了, 守护线程也会得知那个相机更新过曝光, 推迟它的下次拍照
         该功能会避免任意两次拍照的时间间隔过小, 而导致网络堵塞
-        # TODO 考虑分 lock_name 来起 n 个全局线程分开管理设备?
         """
         self.setitem("ExposureAuto", "Continuous")
-        self.interval = interval
-        HikCamera.continuous_adjust_exposure_cams[self.ip] = self
-        if not HikCamera._continuous_adjust_exposure_thread_on:
-            HikCamera._continuous_adjust_exposure_thread_on = True
-            boxx.setTimeout(self._continuous_adjust_exposure_thread, interval)
+        _HikCamera.continuous_adjust_exposure_cams[self.ip] = self
+        self._keep_alive = get_keep_alive_group(self._get_keep_alive_group_name())
+        self._keep_alive.add(self, interval)
 
-    @classmethod
-    def _continuous_adjust_exposure_thread(cls):
-        cams = [
-            cam for cam in cls.continuous_adjust_exposure_cams.values() if cam.is_open
-        ]
-        if not len(cams):
-            cls._continuous_adjust_exposure_thread_on = False
-            return
-        now = time.time()
-        last_get_frame = max([cam.last_time_get_frame for cam in cams])
-
-        # 选择最需要拍照的相机
-        cam = sorted(
-            cams, key=lambda cam: now - cam.last_time_get_frame - cam.interval
-        )[-1]
-        # 避免任意两次拍照的时间间隔过小, 而导致网络堵塞
-        min_get_frame_gap = max(cam.interval / len(cams) / 4, 1)
-        # 表示当前相机距离上次拍照的时间是否大于等于用户设置的拍照时间间隔（cam.interval）。
-        sufficient_time_since_last_frame = now - cam.last_time_get_frame >= cam.interval
-        # 表示距离所有相机中最近一次拍照的时间是否大于等于计算出的最小拍照间隔
-        sufficient_gap_between_frames = now - last_get_frame >= min_get_frame_gap
-        if sufficient_time_since_last_frame and sufficient_gap_between_frames:
-            # boxx.pred("adjust", cam.ip, time.time())
-            try:
-                cam.get_frame_with_config()
-            except Exception as e:
-                boxx.pred(type(e).__name__, e)
-        boxx.setTimeout(cls._continuous_adjust_exposure_thread, 1)
+    def _get_keep_alive_group_name(self) -> str:
+        lock_name = (self.config or {}).get("lock_name")
+        return f"lock_name={lock_name}" if lock_name is not None else self.host_ip
+
+    def _frame_refreshed(self) -> None:
+        self.last_time_get_frame = time.time()
+        if self._keep_alive is not None:
+            self._keep_alive.touch(self)
+
+    def _account_frame(self) -> None:
+        """
+        Count the frame in self.stFrameInfo: frame number gaps, lost packets and short frames.
+        """
+        info = self.stFrameInfo
+        stats = self.frame_stats
+        self.frame_host_time = time.time()
+        stats["frames"] += 1
+        last, self._last_frame_num = self._last_frame_num, info.nFrameNum
+        if last is not None and info.nFrameNum > last + 1:
+            # Frames the camera sent but never reached us, the counter restarts on reopen
+            stats["dropped"] += info.nFrameNum - last - 1
+        lost = getattr(info, "nLostPacket", 0)
+        stats["lost_packets"] += lost
+        self.frame_complete = not lost and info.nFrameLen >= get_frame_nbytes(
+            info.enPixelType, info.nHeight, info.nWidth
+        )
+        if not self.frame_complete:
+            stats["incomplete"] += 1
+
+    def get_frame_stats(self) -> dict:
+        """
+        Returns:
+            dict(frames, dropped, lost_packets, incomplete, retriggered) counted since the camera was created
+        """
+        return dict(self.frame_stats)
+
+    def _collect_metrics(self) -> dict:
+        # State kept elsewhere, read when the metrics are exported
+        counters = dict(
+            frames=self.frame_stats["frames"],
+            dropped_frames=self.frame_stats["dropped"],
+            lost_packets=self.frame_stats["lost_packets"],
+            incomplete_frames=self.frame_stats["incomplete"],
+            retriggers=self.frame_stats["retriggered"],
+        )
+        if self._recovery is not None:
+            counters.update(
+                recovery_incidents=self._recovery.incidents,
+                recovery_unrecovered=self._recovery.unrecovered,
+            )
+        gauges = dict(
+            healthy=self.health_state == HEALTHY,
+            last_frame_timestamp_seconds=self.last_time_get_frame,
+        )
+        if self.buffer_pool is not None:
+            gauges["buffer_pool_free"] = self.buffer_pool.n_free
+        return dict(counters=counters, gauges=gauges)
+
+    def get_metrics(self) -> dict:
+        """
+        Snapshot of the latency histograms (count, mean, p50, p99, max in seconds), counters and gauges.
+
+        Histograms: camera_lock_wait, trigger, sdk_wait, memcpy (image callback), lock_wait (lock_name
+        or transfer_scheduler), grab, decode, get_frame, reset, recovery.
+        """
+        return self.metrics.snapshot()
 
     def get_shape(self) -> tuple[int, int]:
         """
@@ -462,15 +1485,20 @@ class HikCamera(hik.MvCamera):
             self._ip = self.getitem("GevCurrentIPAddress")
         return self._ip
 
-    def raw_to_uint8_rgb(self, raw, poww=1, demosaicing_method="Malvar2004"):
-        from process_raw import RawToRgbUint8
+    def raw_to_uint8_rgb(self, raw, poww=1, demosaicing_method="Malvar2004", out=None):
+        """
+        Develop a raw frame to uint8 RGB, the converter is cached per (bit, poww, pattern, method).
 
-        transfer_func = RawToRgbUint8(
-            bit=self.bit,
-            poww=poww,
-            demosaicing_method=demosaicing_method,
-            pattern=self.get_bayer_pattern(),
+        Args:
+            demosaicing_method (str, optional): "fast" 为 LUT + bilinear, 适合实时预览;
+                其他为 process_raw 的方法, 质量更好但更慢. Defaults to "Malvar2004".
+            out (np.ndarray, optional): 预分配的 (h, w, 3) uint8 输出, 仅 "fast" 支持. Defaults to None.
+        """
+        transfer_func = get_raw_converter(
+            self.bit, poww, self.get_bayer_pattern(), demosaicing_method
         )
+        if out is not None:
+            return transfer_func(raw, out)
         rgb = transfer_func(raw)
         return rgb
 
@@ -481,6 +1509,28 @@ class HikCamera(hik.MvCamera):
         DngFile.save(dng_path, raw, bit=self.bit, pattern=pattern, compress=compress)
         return dng_path
 
+    def open_raw_writer(self, path: str = "") -> RawWriter:
+        """
+        A .hikraw file recording frames as the camera sends them, 1.5 bytes per pixel for 12bit packed.
+
+        Usage:
+            with cam, cam.open_raw_writer("/tmp/a.hikraw") as writer:
+                for i in range(100):
+                    cam.get_frame_with_config()  # no decode
+                    writer.write(cam.data_arr, cam.stFrameInfo)
+            raw = hik_camera.raw_container.RawReader("/tmp/a.hikraw")[0]
+        """
+        pixel_type = self.getitem("PixelFormat")
+        pattern = self.get_bayer_pattern() if self.is_raw else None
+        return RawWriter(
+            path or f"/tmp/{self.ip}.hikraw",
+            pixel_type,
+            self.getitem("Height"),
+            self.getitem("Width"),
+            pattern,
+            ip=self.ip,
+        )
+
     def save(self, img: np.ndarray, path: str = "") -> None:
         """
         Save an image to the specified path.
@@ -491,6 +1541,26 @@ class HikCamera(hik.MvCamera):
         boxx.imsave(path, img)
         return path
 
+    def save_async(self, img: np.ndarray, path: str = "", release=None, **kwargs) -> Future:
+        """
+        Like save, but encoded and written by the background writer (get_image_writer),
+        the acquisition thread only queues the frame.
+
+        Args:
+            release (callable, optional): 写完后调用 release(img), 如 `self.release_frame`. Defaults to None.
+            **kwargs: 传给编码器, 如 JPEG 的 quality
+
+        Returns:
+            Future of the written path, see AsyncImageWriter for the backpressure when the queue is full.
+        """
+        if self.is_raw:
+            path = path or f"/tmp/{self.ip}.dng"
+            if path.lower().endswith(".dng"):
+                kwargs.setdefault("bit", self.bit)
+                kwargs.setdefault("pattern", self.get_bayer_pattern())
+        path = path or f"/tmp/{self.ip}.jpg"
+        return get_image_writer().submit(img, path, release=release, **kwargs)
+
     def get_bayer_pattern(self):
         assert self.is_raw
         if "BayerGB" in self.pixel_format:
@@ -508,23 +1578,67 @@ class HikCamera(hik.MvCamera):
         Camera initialization : open, setup, and start grabbing frames from the device.
         """
 
+        for phase, func in [
+            ("open", self._open),
+            ("configure", self._configure),
+            ("start", self._start),
+        ]:
+            begin = time.perf_counter()
+            func()
+            self.bringup_timing[phase] = time.perf_counter() - begin
+        return self
+
+    def _open(self) -> None:
         # Open the camera with MVS SDK with exclusive access
         assert not self.MV_CC_OpenDevice(hik.MV_ACCESS_Exclusive, 0)
+        self._image_callback = None
 
-        # Initialize the camera with a fixes set of settings
-        # TODO rember setting
-        self.setitem("TriggerMode", hik.MV_TRIGGER_MODE_ON)
-        self.setitem("TriggerSource", hik.MV_TRIGGER_SOURCE_SOFTWARE)
-        self.setitem("AcquisitionFrameRateEnable", False)
-        self.setting()
+    def _configure(self) -> None:
+        """
+        Apply the settings.
 
-        # Set the camera settings to the user-defined settings
-        if self.setting_items is not None:
-            if isinstance(self.setting_items, dict):
-                self.setting_items = self.setting_items.values()
-            for key, value in self.setting_items:
-                self.setitem(key, value)
+        After reopen or reset, setting() runs again (so its direct SDK calls and side effects
+        are redone), but with config["fast_restore"] the nodes the device already holds are not written,
+        then the rest of settings_snapshot is restored, see restore_settings.
+        On reopen the recorded nodes are read back first, after reset they are the device defaults.
+        """
+        restore = bool(self.settings_snapshot) and (self.config or {}).get(
+            "fast_restore", True
+        )
+        if restore:
+            begin = time.time()
+            if not self._after_reset:
+                # The device may have changed while it was closed or unreachable
+                # (power loss, another process), read it back instead of trusting the cache
+                self.node_cache = {}
+            read = self._read_unknown_settings()
+            self._restore_written = []
+        try:
+            # Initialize the camera with a fixes set of settings
+            self._set_trigger()
+            self._seed_exposure()
+            self.setting()
+
+            # Set the camera settings to the user-defined settings
+            if self.setting_items is not None:
+                if isinstance(self.setting_items, dict):
+                    self.setting_items = self.setting_items.items()
+                for key, value in self.setting_items:
+                    self.setitem(key, value)
+            if restore:
+                # e.g. setitem calls after __enter__
+                self._restore_snapshot()
+        finally:
+            written, self._restore_written = self._restore_written, None
+        if restore:
+            self.last_restore_info = dict(
+                n=len(self.settings_snapshot),
+                read=read,
+                written=written,
+                spend=time.time() - begin,
+            )
 
+    def _start(self) -> None:
         # Instantiate a structure to hold the payload size
         stParam = hik.MVCC_INTVALUE()
         # Initialize the payload size structure to zero
@@ -536,6 +1650,18 @@ class HikCamera(hik.MvCamera):
         # Allocate a buffer to store the frame data.
         # You'll need memory for self.nPayloadSize unsigned 8-bit integers (0-255)
         self.data_buf = (ctypes.c_ubyte * self.nPayloadSize)()
+        # numpy view on data_buf, no copy
+        self.data_arr = np.frombuffer(self.data_buf, np.uint8)
+        # Ring of preallocated buffers for zero-copy get_frame
+        n_buffer = (self.config or {}).get("buffer_pool", 0)
+        if not n_buffer:
+            self.buffer_pool = None
+        elif (
+            self.buffer_pool is None
+            or self.buffer_pool.nbytes != self.nPayloadSize
+            or len(self.buffer_pool) != n_buffer
+        ):
+            self.buffer_pool = FrameBufferPool(self.nPayloadSize, n_buffer)
 
         # Instantiate a structure to hold the frame information
         self.stFrameInfo = hik.MV_FRAME_OUT_INFO_EX()
@@ -546,107 +1672,332 @@ class HikCamera(hik.MvCamera):
         assert not self.MV_CC_StartGrabbing()
 
         self.is_open = True  # Mark the camera as open
-        return self
+        health_config = (self.config or {}).get("health_monitor")
+        if health_config:
+            health_config = health_config if isinstance(health_config, dict) else {}
+            get_health_monitor(**health_config).register(self)
+
+    def get_link_mbps(self) -> int:
+        """
+        Link speed of the camera in Mbps (GevLinkSpeed), cached.
+        """
+        if self._link_mbps is None:
+            self._link_mbps = self["GevLinkSpeed"] or 1000
+        return self._link_mbps
+
+    def get_transfer_stats(self) -> dict:
+        """
+        Queue-wait metrics of the transfer scheduler of this camera's NIC, see config["transfer_scheduler"].
+        """
+        return get_scheduler(self.host_ip, (self.config or {}).get("nic_mbps")).get_stats()
+
+    def get_bandwidth_info(self) -> dict:
+        return dict(
+            payload=self.nPayloadSize,
+            link_mbps=self.get_link_mbps(),
+            packet_size=self["GevSCPSPacketSize"],
+        )
+
+    def _set_software_trigger(self) -> None:
+        self.setitem("TriggerMode", hik.MV_TRIGGER_MODE_ON)
+        self.setitem("TriggerSource", hik.MV_TRIGGER_SOURCE_SOFTWARE)
+        self.setitem("AcquisitionFrameRateEnable", False)
+
+    def _set_trigger(self) -> None:
+        self._set_software_trigger()
+        if self.action_keys is not None:
+            self._set_action_trigger()
+
+    def set_software_trigger(self) -> None:
+        """
+        Back to TriggerSoftware per frame after set_action_trigger.
+        """
+        self.action_keys = None
+        self._set_software_trigger()
+
+    def set_action_trigger(
+        self, device_key: int = 1, group_key: int = 1, group_mask: int = 1
+    ) -> None:
+        """
+        Trigger by GigE Vision action command (MV_GIGE_IssueActionCommand) instead of TriggerSoftware,
+        so that one broadcast packet makes a group of cameras expose at the same time.
+        get_frame then waits for the frame without triggering, see MultiHikCamera.sync_get_frame.
+
+        Args:
+            device_key (int, optional): ActionDeviceKey. Defaults to 1.
+            group_key (int, optional): ActionGroupKey. Defaults to 1.
+            group_mask (int, optional): ActionGroupMask. Defaults to 1.
+        """
+        self.action_keys = dict(
+            device_key=device_key, group_key=group_key, group_mask=group_mask
+        )
+        self._set_action_trigger()
+
+    def _set_action_trigger(self) -> None:
+        keys = self.action_keys
+        self.setitem("TriggerMode", hik.MV_TRIGGER_MODE_ON)
+        self.setitem("TriggerSource", "Action1")
+        self.setitem("ActionSelector", 0)
+        self.setitem("ActionDeviceKey", keys["device_key"])
+        self.setitem("ActionGroupKey", keys["group_key"])
+        self.setitem("ActionGroupMask", keys["group_mask"])
+        if self.clock_offset is None:
+            # The offset holds while the device runs, switching back and forth does not measure it again
+            self.sync_clock()
+
+    def sync_clock(self, repeat: int = 5) -> float:
+        """
+        Measure the offset between the camera's timestamp clock and host time.perf_counter(),
+        so that device timestamps of different cameras are comparable.
+        The latch with the shortest round trip is used, its error is half of that round trip.
+
+        Returns:
+            The offset in seconds, also stored in self.clock_offset.
+        """
+        self.tick_frequency = self["GevTimestampTickFrequency"]
+        latch = self._get_accessors("GevTimestampControlLatch")[1]
+        read = self._get_accessors("GevTimestampValue")[0]
+        best = None
+        for i in range(repeat):
+            with self.lock:
+                begin = time.perf_counter()
+                latch(None)
+                end = time.perf_counter()
+                ticks = read()
+            if best is None or end - begin < best[1] - best[0]:
+                best = begin, end, ticks
+        begin, end, ticks = best
+        self.clock_offset = (begin + end) / 2 - ticks / self.tick_frequency
+        return self.clock_offset
+
+    def get_frame_timestamp(self) -> float:
+        """
+        Device timestamp (start of exposure) of the last frame in seconds,
+        on the host time.perf_counter() clock once sync_clock has been called.
+        """
+        info = self.stFrameInfo
+        ticks = (info.nDevTimeStampHigh << 32) | info.nDevTimeStampLow
+        return ticks / self.tick_frequency + (self.clock_offset or 0)
+
+    def _get_frame_and_timestamp(self) -> tuple:
+        img = self.get_frame()
+        return img, self.get_frame_timestamp()
 
     def set_OptimalPacketSize(self):
         # ch:探测网络最佳包大小(只对GigE相机有效) | en:Detection network optimal package size(It only works for the GigE camera)
         # print("GevSCPSPacketSize", self["GevSCPSPacketSize"])
-        with self.high_speed_lock:
+        # 探测时相机会发测试包, 同一网口的相机依次探测, 不同网口的相机并行
+        with _host_ip_to_packet_size_lock[self.host_ip]:
             nPacketSize = self.MV_CC_GetOptimalPacketSize()
         assert nPacketSize
-        assert not self.MV_CC_SetIntValue("GevSCPSPacketSize", nPacketSize)
+        self.setitem("GevSCPSPacketSize", nPacketSize)
 
     def __exit__(self, *l) -> None:
         """
         Run camera termination code: stop grabbing frames and close the device.
         """
-        self.setitem("TriggerMode", hik.MV_TRIGGER_MODE_OFF)
-        self.setitem("AcquisitionFrameRateEnable", True)
+        # Not recorded in settings_snapshot, the next __enter__ restores the trigger settings
+        self._set_items(
+            dict(TriggerMode=hik.MV_TRIGGER_MODE_OFF, AcquisitionFrameRateEnable=True),
+            record=False,
+        )
+        if self.health is not None:
+            get_health_monitor().unregister(self)
         assert not self.MV_CC_StopGrabbing()
         self.MV_CC_CloseDevice()
+        self._image_callback = None
         self.is_open = False
+        if self._keep_alive is not None:
+            self._keep_alive.remove(self)
+            self._keep_alive = None
 
     def __del__(self) -> None:
         self.MV_CC_DestroyHandle()
 
-    def MV_CC_CreateHandle(self, mvcc_dev_info: hik.MV_CC_DEVICE_INFO) -> None:
+    def MV_CC_CreateHandle(self, mvcc_dev_info: "hik.MV_CC_DEVICE_INFO") -> None:
         """
         Create a handle to a GigE camera given its device info.
         """
         self.mvcc_dev_info = mvcc_dev_info
         self._ip = int_to_ip(mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp)
         assert not super().MV_CC_CreateHandle(mvcc_dev_info)
+        self.grab_buffers = dict(GRAB_BUFFER_DEFAULTS)
 
+    # 旧版本中所有相机探测包大小时共用的锁, 保留给外部代码使用(如 `with HikCamera.high_speed_lock:`)
+    # 现在探测按网口加锁, 同一网口的相机依次探测, set_OptimalPacketSize 不再使用这个锁
     high_speed_lock = Lock()
-    setting_df = get_setting_df()
+    setting_df = _SettingDf()
+    node_table = {
+        key: dict(dtype=dtype, depend=depend) for key, (dtype, depend) in nodes.items()
+    }
+
+    def _get_accessors(self, key: str) -> tuple:
+        """
+        (getter, setter) of a node, compiled on first use. Call them with self.lock held.
+        """
+        accessors = self._node_accessors.get(key)
+        if accessors is None:
+            accessors = self._node_accessors[key] = self._compile_accessors(key)
+        return accessors
+
+    def _compile_accessors(self, key: str) -> tuple:
+        node = self.node_table.get(key)
+        if node is None:
+            raise KeyError(f"{key} is not a node of MvCameraNode-CH.csv")
+        dtype = node["dtype"]
+
+        if dtype in _node_getters:
+            func_name, new_holder, attr = _node_getters[dtype]
+            get_func = getattr(self, func_name)
+            # Preallocated holder, reused by every call
+            holder = new_holder()
+
+            def getter():
+                assert not get_func(key, holder), f"{func_name}('{key}') not return 0"
+                return getattr(holder, attr)
+
+        else:
+
+            def getter():
+                raise NotImplementedError(f"Can't get {key} of type {dtype}")
+
+        if dtype == "ienumeration":
+            set_enum = self.MV_CC_SetEnumValue
+            set_enum_by_string = self.MV_CC_SetEnumValueByString
+
+            def set_func(key, value):
+                if isinstance(value, str):
+                    return set_enum_by_string(key, value)
+                return set_enum(key, value)
+
+        elif dtype == "icommand":
+            set_command = self.MV_CC_SetCommandValue
+
+            def set_func(key, value=None):
+                return set_command(key)
+
+        else:
+            set_func = getattr(self, _node_setters[dtype])
+
+        def setter(value):
+            assert not set_func(key, value), f"set('{key}', {value}) not return 0"
+
+        return getter, setter
 
     def getitem(self, key: str) -> Any:
         """
         Get a camera setting value given its key.
         """
-        # Get setting dataframe
-        df = self.setting_df
-        # Get key setting data type
-        dtype = df[df.key == key]["dtype"].iloc[0]
-        # Retrieve parameter getter from MVS SDK for the given data type
-        if dtype == "iboolean":
-            get_func = self.MV_CC_GetBoolValue
-            value = ctypes.c_bool()
-        if dtype == "icommand":
-            get_func = self.MV_CC_GetCommandValue
-        if dtype == "ienumeration":
-            get_func = self.MV_CC_GetEnumValue
-            value = ctypes.c_uint32()
-        if dtype == "ifloat":
-            get_func = self.MV_CC_GetFloatValue
-            value = ctypes.c_float()
-        if dtype == "iinteger":
-            get_func = self.MV_CC_GetIntValue
-            value = ctypes.c_int()
-        if dtype == "istring":
-            get_func = self.MV_CC_GetStringValue
-            value = (ctypes.c_char * 50)()
-        if dtype == "register":
-            get_func = self.MV_CC_RegisterEventCallBackEx
-        # print(get_func, value)
+        getter = self._get_accessors(key)[0]
         # Thread-safe (atomic) parameter reading from the camera.
         with self.lock:
-            assert not get_func(
-                key, value
-            ), f"{get_func.__name__}('{key}', {value}) not return 0"
-        return value.value
+            return getter()
 
     def setitem(self, key: str, value: Any) -> None:
         """
         Set a camera setting to a given value.
         """
-        # Get setting dataframe
-        df = self.setting_df
-        # Get key setting data type
-        dtype = df[df.key == key]["dtype"].iloc[0]
-        # Retrieve parameter setter from MVS SDK for the given data type
-        if dtype == "iboolean":
-            set_func = self.MV_CC_SetBoolValue
-        if dtype == "icommand":
-            set_func = self.MV_CC_SetCommandValue
-        if dtype == "ienumeration":
-            if isinstance(value, str):
-                set_func = self.MV_CC_SetEnumValueByString
-            else:
-                set_func = self.MV_CC_SetEnumValue
-        if dtype == "ifloat":
-            set_func = self.MV_CC_SetFloatValue
-        if dtype == "iinteger":
-            set_func = self.MV_CC_SetIntValue
-        if dtype == "istring":
-            set_func = self.MV_CC_SetStringValue
-        if dtype == "register":
-            set_func = self.MV_CC_RegisterEventCallBackEx
+        self._set_items({key: value})
+
+    def get_items(self, keys: list) -> dict:
+        """
+        Read several settings while holding the camera lock once.
+        """
+        getters = [self._get_accessors(key)[0] for key in keys]
+        with self.lock:
+            return {key: getter() for key, getter in zip(keys, getters)}
+
+    def set_items(self, items: dict) -> None:
+        """
+        Set several settings in order while holding the camera lock once.
+        """
+        self._set_items(items)
+
+    def _set_items(self, items: dict, record: bool = True) -> None:
+        values = {}
+        for key, value in items.items():
+            dtype = self.node_table[key]["dtype"]
+            if dtype in ("icommand", "register"):
+                continue
+            if dtype == "istring" and isinstance(value, str):
+                value = value.encode()
+            values[key] = value
+        writes = items
+        if self._restore_written is not None:
+            # Reconfiguring with fast_restore: skip the nodes the device already holds
+            writes = {
+                key: value
+                for key, value in items.items()
+                if key not in values
+                or key not in self.node_cache
+                or not _same_setting(self.node_cache[key], values[key])
+            }
+            self._restore_written.extend(writes)
+        setters = [(key, self._get_accessors(key)[1], value) for key, value in writes.items()]
         # Thread-safe (atomic) parameter setting of the camera.
         with self.lock:
-            assert not set_func(
-                key, value
-            ), f"{set_func.__name__}('{key}', {value}) not return 0"
+            for key, setter, value in setters:
+                setter(value)
+        if "PixelFormat" in items:
+            # Resolve the decoder again on the next frame
+            self._pixel_type = None
+        for key, value in values.items():
+            self.node_cache[key] = value
+            if key in _auto_nodes and value not in ("Off", 0):
+                # The camera changes it by itself, the cached value is stale
+                self.node_cache.pop(_auto_nodes[key], None)
+            if record:
+                # Keep the order of the writes, e.g. ExposureAuto off before ExposureTime
+                self.settings_snapshot.pop(key, None)
+                self.settings_snapshot[key] = value
+
+    def restore_settings(self) -> dict:
+        """
+        Bring the camera back to self.settings_snapshot, writing only the nodes whose value differs,
+        in the original order. __enter__ does this after setting() on reopen or reset.
+
+        The device values are known from self.node_cache (values written in this session).
+        After reset it holds the device defaults, which are read in bulk after the first reset only.
+
+        Returns:
+            The nodes that were written. self.last_restore_info has the counts and timing.
+        """
+        begin = time.time()
+        read = self._read_unknown_settings()
+        changed = self._restore_snapshot()
+        if self.action_keys is not None:
+            # The device clock restarts after reset
+            self.sync_clock()
+        self.last_restore_info = dict(
+            n=len(self.settings_snapshot),
+            read=read,
+            written=list(changed),
+            spend=time.time() - begin,
+        )
+        return changed
+
+    def _read_unknown_settings(self) -> list:
+        unknown = [key for key in self.settings_snapshot if key not in self.node_cache]
+        with self.lock:
+            for key in unknown:
+                try:
+                    self.node_cache[key] = self._get_accessors(key)[0]()
+                except (AssertionError, NotImplementedError):
+                    continue
+                if self._after_reset:
+                    self.device_defaults[key] = self.node_cache[key]
+        self._after_reset = False
+        return unknown
+
+    def _restore_snapshot(self) -> dict:
+        changed = {
+            key: value
+            for key, value in self.settings_snapshot.items()
+            if key not in self.node_cache
+            or not _same_setting(self.node_cache[key], value)
+        }
+        self._set_items(changed, record=False)
+        return changed
 
     __getitem__ = getitem
     __setitem__ = setitem
@@ -678,7 +2029,7 @@ class HikCamera(hik.MvCamera):
         assert not self.MV_CC_CreateHandle(stDevInfo)
 
     @classmethod
-    def _get_dev_info(cls, ip: str = None) -> dict[str, hik.MV_CC_DEVICE_INFO]:
+    def _get_dev_info(cls, ip: str = None) -> "dict[str, hik.MV_CC_DEVICE_INFO]":
         """
         Class method that returns a list of all connected camera IP addresses
         and their corresponding device info.
@@ -724,38 +2075,347 @@ class HikCamera(hik.MvCamera):
         return cam
 
 
+_build_lock = Lock()
+
+
+def _build_hik_camera() -> type:
+    """
+    HikCamera = _HikCamera + hik.MvCamera, built on first access so that `import hik_camera` does not
+    load the SDK. It is a plain subclass: isinstance(cam, hik.MvCamera), cam.handle
+    and super().MV_CC_* in subclasses work as with a base in the class statement.
+    """
+    with _build_lock:
+        if "HikCamera" not in globals():
+            globals()["HikCamera"] = type(
+                "HikCamera",
+                (_HikCamera, hik.MvCamera),
+                dict(__module__=__name__, __qualname__="HikCamera", __doc__=_HikCamera.__doc__),
+            )
+    return globals()["HikCamera"]
+
+
+def __getattr__(name):
+    if name == "HikCamera":
+        return _build_hik_camera()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CameraWorker:
+    """
+    Long-lived thread that runs the calls of one camera in order.
+
+    Fan-out calls of MultiHikCamera reuse it instead of creating a thread per call,
+    and every SDK call of the camera stays on the same thread.
+    """
+
+    def __init__(self, name: str = None) -> None:
+        self.queue = queue.Queue()
+        self.thread = Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            task = self.queue.get()
+            if task is None:
+                break
+            future, func, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            begin = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.spend = time.perf_counter() - begin
+                future.set_result(result)
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        future = Future()
+        future.spend = 0.0
+        self.queue.put((future, func, args, kwargs))
+        return future
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        if self.thread is not current_thread():
+            self.thread.join()
+
+
 class MultiHikCamera(dict):
+    # Fan-out overhead of the last calls: wall time minus the slowest camera's own time
+    OVERHEAD_HISTORY = 1000
+    # Max cameras constructed or opened at once, None for no limit
+    max_workers = None
+
+    def _bounded(self, func, *args, **kwargs):
+        """
+        Run func while holding one of the `max_workers` slots of bring-up.
+        """
+        if self.max_workers is None:
+            return func(*args, **kwargs)
+        slots = self.__dict__.setdefault("_bringup_slots", Semaphore(self.max_workers))
+        with slots:
+            return func(*args, **kwargs)
+
+    def _get_worker(self, ip) -> CameraWorker:
+        workers = self.__dict__.setdefault("_workers", {})
+        if ip not in workers:
+            workers[ip] = CameraWorker(name=f"HikCamera-{ip}")
+        return workers[ip]
+
+    def stop_workers(self) -> None:
+        for worker in self.__dict__.pop("_workers", {}).values():
+            worker.stop()
+
+    @property
+    def fanout_overheads(self) -> deque:
+        return self.__dict__.setdefault("_overheads", deque(maxlen=self.OVERHEAD_HISTORY))
+
+    def get_fanout_stats(self) -> dict:
+        """
+        Per call overhead of the fan-out (queueing, wake-up and gathering) in seconds.
+        """
+        overheads = np.array(self.fanout_overheads)
+        if not len(overheads):
+            return dict(n=0)
+        return dict(
+            n=len(overheads),
+            last=float(overheads[-1]),
+            mean=float(overheads.mean()),
+            p99=float(np.percentile(overheads, 99)),
+            max=float(overheads.max()),
+        )
+
     def __getattr__(self, attr):
         if not callable(getattr(next(iter(self.values())), attr)):
-            return {k: getattr(cam, attr) for k, v in self.items()}
+            return {ip: getattr(cam, attr) for ip, cam in self.items()}
 
         def func(*args, **kwargs):
-            threads = []
-            res = {}
-
-            def _func(ip, cam):
-                res[ip] = getattr(cam, attr)(*args, **kwargs)
-
-            for ip, cam in self.items():
-                thread = Thread(target=_func, args=(ip, cam))
-                thread.start()
-                threads.append(thread)
-                # thread.join()
-            [thread.join() for thread in threads]
-            res = {ip: res[ip] for ip in sorted(res)}
+            begin = time.perf_counter()
+            futures = {
+                ip: self._get_worker(ip).submit(getattr(cam, attr), *args, **kwargs)
+                for ip, cam in self.items()
+            }
+            res = {ip: futures[ip].result() for ip in sorted(futures)}
+            spend = time.perf_counter() - begin
+            self.fanout_overheads.append(
+                spend - max(future.spend for future in futures.values())
+            )
             return res
 
         return func
 
+    def sync_get_frame(
+        self,
+        device_key: int = 1,
+        group_key: int = 1,
+        group_mask: int = 1,
+        broadcast_address: str = None,
+    ) -> dict:
+        """
+        Simultaneous capture: one GigE Vision action command triggers every camera,
+        then the frames are gathered in parallel.
+        The skew of the cameras' exposure starts is measured from device timestamps
+        and stored in self.last_sync_info.
+
+        Cameras in software trigger mode are switched back once the frames are gathered,
+        so that get_frame still triggers them. Call `cams.set_action_trigger()` first to keep
+        the cameras in action trigger mode between calls, which saves the switching writes.
+
+        Args:
+            broadcast_address (str, optional): Defaults to None, the x.x.x.255 of each camera subnet.
+
+        Returns:
+            dict of ip to frame, like get_frame
+        """
+        keys = dict(device_key=device_key, group_key=group_key, group_mask=group_mask)
+        previous = {
+            ip: cam.action_keys for ip, cam in self.items() if cam.action_keys != keys
+        }
+        try:
+            if previous:
+                self._fan_out(
+                    {ip: functools.partial(self[ip].set_action_trigger, **keys) for ip in previous}
+                )
+            return self._sync_get_frame(keys, broadcast_address)
+        finally:
+            # Back to the trigger mode of before, TriggerSoftware is ignored in action mode
+            self._fan_out(
+                {
+                    ip: self[ip].set_software_trigger
+                    if action_keys is None
+                    else functools.partial(self[ip].set_action_trigger, **action_keys)
+                    for ip, action_keys in previous.items()
+                }
+            )
+
+    def _fan_out(self, funcs: dict) -> dict:
+        """
+        Run {ip: func} on the workers of the cameras, returns {ip: result}.
+        """
+        futures = {ip: self._get_worker(ip).submit(func) for ip, func in funcs.items()}
+        return {ip: futures[ip].result() for ip in sorted(futures)}
+
+    def _sync_get_frame(self, keys: dict, broadcast_address: str = None) -> dict:
+        if broadcast_address is None:
+            broadcast_addresses = sorted({ip.rsplit(".", 1)[0] + ".255" for ip in self})
+        else:
+            broadcast_addresses = [broadcast_address]
+        begin = time.perf_counter()
+        acked = []
+        for address in broadcast_addresses:
+            acked += issue_action_command(**keys, broadcast_address=address)
+        issue_spend = time.perf_counter() - begin
+        missing = sorted(set(self) - set(acked))
+        if missing:
+            boxx.pred("No action command ack from", missing)
+        res = self._get_frame_and_timestamp()
+        imgs = {ip: img for ip, (img, _) in res.items()}
+        timestamps = {ip: timestamp for ip, (_, timestamp) in res.items()}
+        first = min(timestamps.values())
+        skew = {ip: timestamp - first for ip, timestamp in timestamps.items()}
+        self.last_sync_info = dict(
+            skew=skew,
+            max_skew=max(skew.values()),
+            acked=sorted(acked),
+            issue_spend=issue_spend,
+        )
+        return imgs
+
+    def plan_bandwidth(
+        self,
+        apply: bool = True,
+        nic_mbps: float = None,
+        concurrent: int = None,
+        optimal_packet_size: bool = True,
+    ) -> dict:
+        """
+        Plan GevSCPSPacketSize and GevSCPD of all cameras, so that the cameras behind each NIC
+        don't overflow it, and print the predicted worst-case multi-camera frame latency.
+        Redo it after adding a camera. Needs opened cameras (`with cams:`).
+
+        Args:
+            apply (bool, optional): set GevSCPD on the cameras. Defaults to True.
+            nic_mbps (float, optional): 网口速率. Defaults to None, from psutil, or the fastest camera link.
+            concurrent (int, optional): 同一网口同时传输的相机数.
+                Defaults to None, all cameras, or the slots of config["transfer_scheduler"].
+            optimal_packet_size (bool, optional): detect and set GevSCPSPacketSize first. Defaults to True.
+
+        Returns:
+            dict of host_ip to plan, see bandwidth_planner.plan_nic
+        """
+        if optimal_packet_size:
+            self.set_OptimalPacketSize()
+        infos = self.get_bandwidth_info()
+        host_ip_to_ips = defaultdict(list)
+        for ip, cam in self.items():
+            host_ip_to_ips[cam.host_ip].append(ip)
+        plans = {}
+        for host_ip, ips in sorted(host_ip_to_ips.items()):
+            cams = {ip: infos[ip] for ip in ips}
+            link_mbps = max(info["link_mbps"] for info in cams.values())
+            nic = nic_mbps or get_nic_speed_mbps(host_ip) or link_mbps
+            n = concurrent
+            if n is None and (self[ips[0]].config or {}).get("transfer_scheduler"):
+                n = compute_slots(nic, link_mbps)
+            plans[host_ip] = plan_nic(cams, nic, n)
+            print(format_plan(host_ip, plans[host_ip]))
+        if apply:
+            ip_to_scpd = {
+                ip: cam["scpd"] for plan in plans.values() for ip, cam in plan["cams"].items()
+            }
+            futures = [
+                self._get_worker(ip).submit(self[ip].setitem, "GevSCPD", scpd)
+                for ip, scpd in ip_to_scpd.items()
+            ]
+            [future.result() for future in futures]
+        return plans
+
+    async def _agather(self, attr, *args, **kwargs):
+        ips = sorted(self)
+        imgs = await asyncio.gather(
+            *[getattr(self[ip], attr)(*args, **kwargs) for ip in ips]
+        )
+        return dict(zip(ips, imgs))
+
+    async def aget_frame(self) -> dict:
+        """
+        Coroutine version of get_frame, all cameras are triggered concurrently.
+        """
+        return await self._agather("aget_frame")
+
+    async def arobust_get_frame(self) -> dict:
+        return await self._agather("arobust_get_frame")
+
+    async def astream(self, fps: float = None, maxsize: int = 8):
+        """
+        Merge the astream of every camera, yields (ip, img) in arrival order.
+        """
+        queue = asyncio.Queue()
+
+        async def pump(ip, cam):
+            async for img in cam.astream(fps=fps, maxsize=maxsize):
+                await queue.put((ip, img))
+
+        tasks = [asyncio.ensure_future(pump(ip, cam)) for ip, cam in self.items()]
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    [getter, *tasks], return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter not in done:
+                    getter.cancel()
+                    # A pump ended, re-raise its exception
+                    [task.result() for task in done]
+                    continue
+                yield getter.result()
+        finally:
+            [task.cancel() for task in tasks]
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     def __enter__(self):
-        self.__getattr__("__enter__")()
+        begin = time.perf_counter()
+        futures = {
+            ip: self._get_worker(ip).submit(self._bounded, cam.__enter__)
+            for ip, cam in self.items()
+        }
+        [future.result() for future in futures.values()]
+        self.bringup_spend = time.perf_counter() - begin
         return self
 
+    def get_bringup_info(self) -> dict:
+        """
+        Per-phase timing of the last bring-up, in seconds.
+
+        Returns:
+            dict(total, phases={phase: dict(mean, max)}, per_camera={ip: {phase: spend}})
+                total: wall time of the last `with cams:` (open, configure, start)
+        """
+        per_camera = {ip: dict(cam.bringup_timing) for ip, cam in self.items()}
+        phases = {}
+        for timing in per_camera.values():
+            for phase, spend in timing.items():
+                phases.setdefault(phase, []).append(spend)
+        return dict(
+            total=self.__dict__.get("bringup_spend"),
+            phases={
+                phase: dict(mean=float(np.mean(spends)), max=max(spends))
+                for phase, spends in phases.items()
+            },
+            per_camera=per_camera,
+        )
+
     def __exit__(self, *l):
-        self.__getattr__("__exit__")(*l)
+        try:
+            self.__getattr__("__exit__")(*l)
+        finally:
+            self.stop_workers()
 
 
 if __name__ == "__main__":
+    HikCamera = _build_hik_camera()
 
     ips = HikCamera.get_all_ips()
     print("All camera IP adresses:", ips)
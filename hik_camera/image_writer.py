@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+
+"""
+Background image writer, see HikCamera.save_async.
+
+Encoding a 12 MP PNG or DNG takes hundreds of milliseconds. The writer takes it off the acquisition
+thread: frames go into a bounded queue, a pool of worker threads encodes and writes them,
+and every submit returns a Future of the written path.
+"""
+
+import io
+import itertools
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Lock, Thread
+
+import numpy as np
+
+BACKPRESSURES = ("block", "drop", "spill")
+
+# File extension -> Encoder
+ext_to_encoder = {}
+
+
+class Encoder:
+    """
+    Registry entry of a file format.
+
+    encode(img, **kwargs) returns the bytes of the file, the worker writes them,
+    so encode and write are timed apart. With to_file=True, encode(img, path, **kwargs) writes
+    the file itself (e.g. DngFile.save) and its time is all counted as encode.
+    """
+
+    def __init__(self, name: str, encode, to_file: bool = False) -> None:
+        self.name = name
+        self.encode = encode
+        self.to_file = to_file
+
+
+def register_encoder(exts, name: str = None, to_file: bool = False):
+    """
+    Decorator that registers an encoder for the file extensions in `exts`, e.g. [".jpg", ".jpeg"].
+    """
+
+    def register(encode):
+        for ext in exts:
+            ext_to_encoder[ext.lower()] = Encoder(name or ext[1:].upper(), encode, to_file)
+        return encode
+
+    return register
+
+
+def get_encoder(path: str) -> Encoder:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ext_to_encoder:
+        raise NotImplementedError(
+            f"No encoder for {ext!r} of {path}, registered: {sorted(ext_to_encoder)}"
+        )
+    return ext_to_encoder[ext]
+
+
+def _cv2_encode(img: np.ndarray, ext: str, params: list) -> bytes:
+    import cv2
+
+    if img.ndim == 3 and img.shape[-1] == 3:
+        # Frames are RGB, OpenCV expects BGR
+        img = img[..., ::-1]
+    ok, data = cv2.imencode(ext, img, params)
+    assert ok, f"cv2.imencode {ext} failed for {img.shape} {img.dtype}"
+    return data.tobytes()
+
+
+@register_encoder([".jpg", ".jpeg"], "JPEG")
+def encode_jpeg(img, quality=95):
+    import cv2
+
+    return _cv2_encode(img, ".jpg", [cv2.IMWRITE_JPEG_QUALITY, quality])
+
+
+@register_encoder([".png"], "PNG")
+def encode_png(img, compression=1):
+    """
+    compression: 0~9, the default 1 is several times faster than OpenCV's 3 for slightly larger files.
+    """
+    import cv2
+
+    return _cv2_encode(img, ".png", [cv2.IMWRITE_PNG_COMPRESSION, compression])
+
+
+@register_encoder([".dng"], "DNG", to_file=True)
+def encode_dng(raw, path, bit=12, pattern="RGGB", compress=False):
+    from process_raw import DngFile
+
+    DngFile.save(path, raw, bit=bit, pattern=pattern, compress=compress)
+
+
+@register_encoder([".npy"], "NPY")
+def encode_npy(img):
+    f = io.BytesIO()
+    np.save(f, img)
+    return f.getvalue()
+
+
+class _Job:
+    __slots__ = ("img", "path", "kwargs", "release", "future", "spill_path", "submitted")
+
+    def __init__(self, img, path, kwargs, release):
+        self.img = img
+        self.path = path
+        self.kwargs = kwargs
+        self.release = release
+        self.future = Future()
+        self.spill_path = None
+        self.submitted = time.time()
+
+
+class AsyncImageWriter:
+    """
+    A bounded queue of frames to save and a pool of worker threads that encode and write them.
+
+    Backpressure, what submit does when `max_queue` frames are waiting:
+        - "block": wait for a free place, the acquisition slows down to the disk's pace
+        - "drop": do not save the frame, the returned Future is cancelled
+        - "spill": dump the frame uncompressed to `spill_dir` (a memcpy-speed .npy write)
+            and encode it once the queue has room, nothing is lost and memory stays bounded
+
+    Usage:
+        writer = AsyncImageWriter(workers=2, max_queue=8, backpressure="spill")
+        future = writer.submit(img, "/tmp/a.png")
+        writer.close()  # waits for the queued frames
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 8,
+        backpressure: str = "block",
+        spill_dir: str = None,
+    ) -> None:
+        """
+        Args:
+            workers (int, optional): 编码/写盘线程数. Defaults to 2.
+            max_queue (int, optional): 队列中最多等待的帧数. Defaults to 8.
+            backpressure (str, optional): 队列满时的策略, "block", "drop" 或 "spill". Defaults to "block".
+            spill_dir (str, optional): "spill" 时临时存放未编码帧的目录. Defaults to a folder in the system temp dir.
+        """
+        assert backpressure in BACKPRESSURES, backpressure
+        assert workers >= 1 and max_queue >= 1, (workers, max_queue)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.backpressure = backpressure
+        self.spill_dir = spill_dir or os.path.join(
+            tempfile.gettempdir(), f"hik_camera_spill_{os.getpid()}"
+        )
+        self._queue = deque()
+        # Spilled jobs, encoded when the queue is empty
+        self._spilled = deque()
+        self._running = 0
+        self._cond = Condition()
+        self._closed = False
+        self._ids = itertools.count()
+        self._stats_lock = Lock()
+        self.stats = dict(
+            submitted=0,
+            written=0,
+            dropped=0,
+            spilled=0,
+            failed=0,
+            blocked_s=0.0,
+            max_queue_depth=0,
+            encode_s=0.0,
+            write_s=0.0,
+            last_encode_s=None,
+            last_write_s=None,
+            last_latency_s=None,
+        )
+        self._threads = [
+            Thread(target=self._run, name=f"HikCamera-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        [thread.start() for thread in self._threads]
+
+    def submit(self, img: np.ndarray, path: str, release=None, **kwargs) -> Future:
+        """
+        Queue a frame to be saved to `path`, the encoder is chosen by the file extension.
+
+        Args:
+            img (np.ndarray): the frame, it must not be modified until the Future is done.
+            release (callable, optional): release(img) after the frame is written (or dropped),
+                e.g. `cam.release_frame` for frames of config["buffer_pool"]. Defaults to None.
+            **kwargs: passed to the encoder, e.g. quality=90 for JPEG, bit and pattern for DNG.
+
+        Returns:
+            Future of the written path.
+        """
+        get_encoder(path)
+        job = _Job(img, path, kwargs, release)
+        with self._cond:
+            assert not self._closed, "AsyncImageWriter is closed"
+            self.stats["submitted"] += 1
+            if len(self._queue) >= self.max_queue:
+                if self.backpressure == "drop":
+                    self.stats["dropped"] += 1
+                    job.future.cancel()
+                    self._release(job)
+                    return job.future
+                if self.backpressure == "spill":
+                    job.spill_path = os.path.join(
+                        self.spill_dir, f"{next(self._ids)}.npy"
+                    )
+                else:
+                    begin = time.time()
+                    while len(self._queue) >= self.max_queue:
+                        self._cond.wait()
+                    self.stats["blocked_s"] += time.time() - begin
+            if job.spill_path is None:
+                self._queue.append(job)
+                self.stats["max_queue_depth"] = max(
+                    self.stats["max_queue_depth"], len(self._queue)
+                )
+                self._cond.notify_all()
+                return job.future
+        # Spill outside of the lock, the other submits and the workers go on
+        os.makedirs(self.spill_dir, exist_ok=True)
+        np.save(job.spill_path, job.img)
+        self._release(job)
+        job.img = None
+        with self._cond:
+            self.stats["spilled"] += 1
+            self._spilled.append(job)
+            self._cond.notify_all()
+        return job.future
+
+    def _release(self, job) -> None:
+        if job.release is not None:
+            job.release(job.img)
+            job.release = None
+
+    def _next_job(self):
+        with self._cond:
+            while not self._queue and not self._spilled:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            job = self._queue.popleft() if self._queue else self._spilled.popleft()
+            self._running += 1
+            # A place is free for the blocked submits
+            self._cond.notify_all()
+            return job
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self._write(job)
+                except BaseException as e:
+                    with self._stats_lock:
+                        self.stats["failed"] += 1
+                    job.future.set_exception(e)
+                else:
+                    job.future.set_result(job.path)
+            finally:
+                self._release(job)
+                job.img = None
+                with self._cond:
+                    self._running -= 1
+                    self._cond.notify_all()
+
+    def _write(self, job) -> None:
+        img = job.img
+        if job.spill_path is not None:
+            img = np.load(job.spill_path)
+        encoder = get_encoder(job.path)
+        begin = time.time()
+        if encoder.to_file:
+            encoder.encode(img, job.path, **job.kwargs)
+            data = None
+        else:
+            data = encoder.encode(img, **job.kwargs)
+        encoded = time.time()
+        if data is not None:
+            # Write to a temporary file first, a crash never leaves a truncated image.
+            # One temporary file per job, the jobs of a path (e.g. /tmp/{ip}.jpg) run side by side
+            dirname, basename = os.path.split(job.path)
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", prefix=basename + ".", dir=dirname or ".")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, job.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        written = time.time()
+        if job.spill_path is not None:
+            os.remove(job.spill_path)
+        with self._stats_lock:
+            stats = self.stats
+            stats["written"] += 1
+            stats["encode_s"] += encoded - begin
+            stats["write_s"] += written - encoded
+            stats["last_encode_s"] = encoded - begin
+            stats["last_write_s"] = written - encoded
+            stats["last_latency_s"] = written - job.submitted
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Frames waiting in the queue, spilled frames excluded.
+        """
+        return len(self._queue)
+
+    def get_stats(self) -> dict:
+        """
+        Returns:
+            dict of counters (submitted, written, dropped, spilled, failed), queue_depth, spilled_pending,
+            running, blocked_s (total seconds submit waited), mean_encode_s, mean_write_s and the last_* timings
+        """
+        with self._cond, self._stats_lock:
+            stats = dict(self.stats)
+            stats.update(
+                queue_depth=len(self._queue),
+                spilled_pending=len(self._spilled),
+                running=self._running,
+            )
+        written = max(stats["written"], 1)
+        stats["mean_encode_s"] = stats["encode_s"] / written
+        stats["mean_write_s"] = stats["write_s"] / written
+        return stats
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until every submitted frame is written, returns False on timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._queue or self._spilled or self._running:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stop the workers once the queued frames are written. With wait=False, queued frames are cancelled.
+        """
+        with self._cond:
+            self._closed = True
+            if not wait:
+                for jobs in (self._queue, self._spilled):
+                    while jobs:
+                        job = jobs.popleft()
+                        job.future.cancel()
+                        self._release(job)
+            self._cond.notify_all()
+        if wait:
+            [thread.join() for thread in self._threads]
+
+    def __enter__(self) -> "AsyncImageWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+_writer = None
+_writer_kwargs = None
+_writer_lock = Lock()
+
+
+def get_image_writer(**kwargs) -> AsyncImageWriter:
+    """
+    The process wide writer of HikCamera.save_async, created with `kwargs` on the first call.
+
+    Later calls return the same writer, without kwargs or with the same ones.
+    Other kwargs raise ValueError, close() the writer first to create it again.
+    """
+    global _writer, _writer_kwargs
+    with _writer_lock:
+        if _writer is None or _writer._closed:
+            _writer = AsyncImageWriter(**kwargs)
+            _writer_kwargs = kwargs
+        elif kwargs and kwargs != _writer_kwargs:
+            raise ValueError(
+                f"The image writer is already created with {_writer_kwargs}, not {kwargs}"
+            )
+        return _writer
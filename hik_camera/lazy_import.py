@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+"""
+Defer heavy imports (boxx, pandas, the MVS SDK) to their first use, to keep `import hik_camera` fast.
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Usage:
+        boxx = LazyModule("boxx")
+        boxx.pred("hi")  # imports boxx here
+    """
+
+    def __init__(self, name: str, importer=None) -> None:
+        """
+        Args:
+            name (str): module name.
+            importer (callable, optional): returns the module. Defaults to importlib.import_module(name).
+        """
+        self.__dict__.update(
+            _name=name,
+            _importer=importer or (lambda: importlib.import_module(name)),
+            _module=None,
+            _lock=threading.Lock(),
+        )
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self.__dict__["_module"] = self._importer()
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+"""
+Per-camera latency histograms, counters and gauges, on by default (config["metrics"]=False turns them off).
+
+Timings are recorded into fixed log-spaced buckets: an observation is one bisect and a few increments,
+so it stays well under 1% of a frame time. Snapshots give count, mean, p50, p99 and max per histogram,
+and the whole registry can be exported in the Prometheus text format, to a file for node_exporter's
+textfile collector (write_prometheus) or over HTTP (serve_prometheus).
+"""
+
+import bisect
+import os
+import threading
+import types
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds of the buckets in seconds, 10us to ~4 minutes, a factor of sqrt(2) apart
+BUCKETS = [1e-5 * 2 ** (i / 2) for i in range(50)]
+# Every other bound, a factor of 2 apart, keeps the Prometheus output compact
+PROMETHEUS_BUCKETS = BUCKETS[::2]
+
+
+class Histogram:
+    """
+    Streaming histogram of durations in seconds, quantiles are interpolated inside a bucket.
+    """
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self) -> None:
+        # The last bucket counts the values above BUCKETS[-1]
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def get_stats(self) -> dict:
+        return dict(
+            count=self.count,
+            mean=self.sum / self.count if self.count else None,
+            p50=self.quantile(0.5),
+            p99=self.quantile(0.99),
+            max=self.max if self.count else None,
+        )
+
+
+class Metrics:
+    """
+    Histograms, counters and gauges of one camera.
+
+    Names of histograms are of durations in seconds without unit, e.g. "sdk_wait".
+    Collectors (see add_collector) are functions returning dict(counters={...}, gauges={...}),
+    read at snapshot time, for the state kept elsewhere (frame_stats, recovery stats, health).
+    """
+
+    def __init__(self, ip: str, enabled: bool = True) -> None:
+        self.ip = ip
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.collectors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name: str, value: float) -> None:
+        if self.enabled:
+            self.gauges[name] = value
+
+    def add_collector(self, name: str, collect) -> None:
+        """
+        Register `collect` under `name`, replacing the previous one of that name.
+
+        Bound methods are held by a weak reference: the registry is process-wide,
+        it must not keep the camera (and its SDK handle) alive.
+        """
+        if isinstance(collect, types.MethodType):
+            ref = weakref.WeakMethod(collect)
+        else:
+            ref = lambda: collect
+        self.collectors[name] = ref
+
+    def _collect(self) -> tuple:
+        with self._lock:
+            histograms = {
+                name: (list(h.counts), h.count, h.sum, h.max)
+                for name, h in self.histograms.items()
+            }
+            counters = dict(self.counters)
+        gauges = dict(self.gauges)
+        for ref in list(self.collectors.values()):
+            collect = ref()
+            if collect is None:
+                # The camera was garbage collected
+                continue
+            collected = collect()
+            counters.update(collected.get("counters", {}))
+            gauges.update(collected.get("gauges", {}))
+        return histograms, counters, gauges
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict(ip, histograms={name: dict(count, mean, p50, p99, max)}, counters, gauges)
+        """
+        with self._lock:
+            histograms = {name: h.get_stats() for name, h in self.histograms.items()}
+        _, counters, gauges = self._collect()
+        return dict(ip=self.ip, histograms=histograms, counters=counters, gauges=gauges)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_metrics(ip: str, enabled: bool = True) -> Metrics:
+    """
+    The Metrics of a camera ip, shared by the HikCamera objects of that camera (e.g. after reconnect).
+    """
+    with _metrics_lock:
+        if ip not in _metrics:
+            _metrics[ip] = Metrics(ip, enabled)
+        metrics = _metrics[ip]
+        metrics.enabled = enabled
+        return metrics
+
+
+def snapshot() -> dict:
+    """
+    ip -> Metrics.snapshot() of every camera.
+    """
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    return {m.ip: m.snapshot() for m in metrics if m.enabled}
+
+
+def to_prometheus(prefix: str = "hik_camera") -> str:
+    """
+    All cameras in the Prometheus text exposition format, labeled by ip.
+    """
+    with _metrics_lock:
+        metrics = [m for m in _metrics.values() if m.enabled]
+    families = {}
+    for m in metrics:
+        label = f'ip="{m.ip}"'
+        histograms, counters, gauges = m._collect()
+        for name, (counts, count, total, _) in histograms.items():
+            lines = families.setdefault((f"{prefix}_{name}_seconds", "histogram"), [])
+            cumulative, i = 0, 0
+            for bound in PROMETHEUS_BUCKETS:
+                while i < len(BUCKETS) and BUCKETS[i] <= bound:
+                    cumulative += counts[i]
+                    i += 1
+                lines.append(
+                    f'{prefix}_{name}_seconds_bucket{{{label},le="{bound:.6g}"}} {cumulative}'
+                )
+            lines.append(f'{prefix}_{name}_seconds_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{prefix}_{name}_seconds_sum{{{label}}} {float(total)!r}")
+            lines.append(f"{prefix}_{name}_seconds_count{{{label}}} {count}")
+        for name, value in counters.items():
+            families.setdefault((f"{prefix}_{name}_total", "counter"), []).append(
+                f"{prefix}_{name}_total{{{label}}} {float(value)!r}"
+            )
+        for name, value in gauges.items():
+            families.setdefault((f"{prefix}_{name}", "gauge"), []).append(
+                f"{prefix}_{name}{{{label}}} {float(value)!r}"
+            )
+    out = []
+    for (name, kind), lines in sorted(families.items()):
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+def write_prometheus(path: str, prefix: str = "hik_camera") -> str:
+    """
+    Write to_prometheus() atomically, e.g. to the directory of node_exporter --collector.textfile.directory.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(to_prometheus(prefix))
+    os.replace(tmp, path)
+    return path
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_prometheus(port: int = 9310, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve to_prometheus() at http://host:port/metrics from a daemon thread, `server.shutdown()` stops it.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(
+        target=server.serve_forever, name="HikCamera-metrics", daemon=True
+    ).start()
+    return server
+
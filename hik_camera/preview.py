@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Decimated preview straight from the frame buffer, see HikCamera.get_preview.
+
+Only the bytes of the sampled pixels are read. Bayer frames are developed by superpixel
+(one RGB pixel per 2x2 quad, greens averaged), so there is no demosaicing and no full-resolution array.
+"""
+
+import numpy as np
+
+from .decoders import Decoder
+from .raw_pipeline import get_lut
+
+
+# 2x2 CFA of the Bayer pixel format names
+_name_to_pattern = dict(BayerGB="GBRG", BayerGR="GRBG", BayerRG="RGGB", BayerBG="BGGR")
+
+
+def _sample_quads(buf: np.ndarray, h: int, w: int, decoder: Decoder, q: int) -> dict:
+    """
+    Every q-th 2x2 quad of a Bayer frame.
+
+    Returns:
+        (y, x) site of the quad -> (h // 2q, w // 2q) raw samples
+    """
+    name = decoder.name
+    qh, qw = h // 2 // q, w // 2 // q
+    if decoder.view:
+        # Bayer8 and 16bit containers
+        raw = decoder.decode(buf, h, w)
+        quads = raw.reshape(h // 2, 2, w // 2, 2)[: qh * q : q, :, : qw * q : q]
+        return {(y, x): quads[:, y, :, x] for y in (0, 1) for x in (0, 1)}
+    if name.endswith("Packed") or name.endswith("12p"):
+        # A 3 byte group (B0, B1, B2) is the pixel pair of one quad row. Strided uint16 views of
+        # (B0, B1) and (B1, B2) of the sampled groups read only their bytes, without a full unpack
+        row = w * 3 // 2
+        shape, strides = (qh, 2, qw), (2 * q * row, row, 3 * q)
+        if name.endswith("12p"):
+            # PFNC lsb-first: B0 = p0[7:0], B1 = p1[3:0] << 4 | p0[11:8], B2 = p1[11:4]
+            p0 = np.ndarray(shape, "<u2", buf, 0, strides) & 0xFFF
+            p1 = np.ndarray(shape, "<u2", buf, 1, strides) >> 4
+        else:
+            b0b1 = np.ndarray(shape, ">u2", buf, 0, strides)
+            b2b1 = np.ndarray(shape, "<u2", buf, 1, strides)
+            if decoder.bit == 10:
+                # B1 = p0[1:0] << 4 | p1[1:0]
+                p0 = b0b1 >> 8 << 2 | b0b1 >> 4 & 3
+                p1 = b2b1 >> 8 << 2 | b2b1 & 3
+            else:
+                # GigE Vision packed: B0 = p0[11:4], B1 = p0[3:0] << 4 | p1[3:0], B2 = p1[11:4]
+                p0 = b0b1 >> 4
+                p1 = b2b1 >> 4 & 0xFF0 | b2b1 & 15
+        return {(y, x): (p0, p1)[x][:, y] for y in (0, 1) for x in (0, 1)}
+    raise NotImplementedError(f"Preview of {name}")
+
+
+def decode_preview(
+    buf: np.ndarray,
+    h: int,
+    w: int,
+    decoder: Decoder,
+    scale: int = 4,
+    poww: float = 1,
+) -> np.ndarray:
+    """
+    Decode a frame at 1/scale of its width and height.
+
+    Args:
+        buf (np.ndarray): uint8 frame buffer
+        decoder (Decoder): decoder of the frame's pixel type
+        scale (int, optional): 缩小倍数, Bayer 格式会向上取偶数. Defaults to 4.
+        poww (float, optional): raw 转 uint8 时的 gamma, 只用于 Bayer 和 Mono10/12/16, 8bit 的 Mono 和彩色格式不变. Defaults to 1.
+
+    Returns:
+        uint8 (h // scale, w // scale, 3) RGB, or (h // scale, w // scale) for Mono.
+    """
+    name = decoder.name
+    if name.startswith("Bayer"):
+        q = max((scale + 1) // 2, 1)
+        sites = _sample_quads(buf, h, w, decoder, q)
+        pattern = _name_to_pattern[name[:7]]
+        r, g0, g1, b = [
+            sites[divmod(pattern.index(c, i), 2)] for c, i in zip("RGGB", (0, 0, 2, 0))
+        ]
+        # uint16 sums of two greens overflow only for 16bit samples
+        acc = np.uint16 if decoder.bit < 16 else np.uint32
+        green = np.add(g0, g1, dtype=acc)
+        green += 1
+        green >>= 1
+        lut = get_lut(decoder.bit, poww)
+        out = np.empty(r.shape + (3,), np.uint8)
+        for c, raw in enumerate([r, green, b]):
+            out[..., c] = np.take(lut, raw, mode="clip")
+        return out
+    # Mono and color formats: a view for most of them, otherwise a full decode
+    img = decoder.decode(buf, h, w)[::scale, ::scale]
+    if img.dtype != np.uint8:
+        img = np.take(get_lut(decoder.bit, poww), img, mode="clip")
+    # 8bit Mono and color frames are developed (gamma encoded) by the camera ISP already
+    return np.ascontiguousarray(img)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+"""
+Recording format of the camera's frames as they come over the wire, see HikCamera.open_raw_writer.
+
+A 12bit frame stays 1.5 bytes per pixel (Bayer12Packed), where PNG/npz/pickle of the decoded uint16
+take 14~47 MB for 12 MP (doc/dev.md). Layout of a .hikraw file:
+    - b"HIKRAW01", uint32 length of the JSON header, JSON header (pixel type, Bayer pattern, shape, ...),
+        zero padded to HEADER_SIZE
+    - fixed size records: FRAME_INFO (48 bytes) followed by the frame bytes of the SDK buffer, unchanged
+
+Frames are appended with one writev per frame (two writes on Windows) and nothing decoded. RawReader maps the file with np.memmap,
+so a recording opens instantly and any frame is decoded only when it is read.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from .decoders import get_decoder
+
+MAGIC = b"HIKRAW01"
+HEADER_SIZE = 4096
+# No newline translation on Windows
+O_BINARY = getattr(os, "O_BINARY", 0)
+
+# Per frame info of MV_FRAME_OUT_INFO_EX, 8 byte fields first so every record keeps its alignment
+FRAME_INFO = np.dtype(
+    [
+        ("dev_timestamp", "<u8"),
+        ("host_timestamp", "<i8"),  # nHostTimeStamp, ms
+        ("host_time", "<f8"),  # time.time() when written
+        ("frame_num", "<u4"),
+        ("lost_packet", "<u4"),
+        ("frame_len", "<u4"),
+        ("exposure", "<f4"),
+        ("gain", "<f4"),
+        ("reserved", "<u4"),
+    ]
+)
+
+
+def get_frame_nbytes(pixel_type: int, h: int, w: int) -> int:
+    # Bits per pixel on the wire are in the pixel type, e.g. 12 for Bayer12Packed, 16 for Bayer12
+    return h * w * ((pixel_type >> 16) & 0xFF) // 8
+
+
+def frame_info_to_record(frame_info) -> np.ndarray:
+    """
+    FRAME_INFO of an MV_FRAME_OUT_INFO_EX, or of a dict with FRAME_INFO's keys.
+    """
+    record = np.zeros((), FRAME_INFO)
+    if frame_info is None:
+        pass
+    elif isinstance(frame_info, dict):
+        for key, value in frame_info.items():
+            record[key] = value
+    else:
+        record["dev_timestamp"] = (
+            frame_info.nDevTimeStampHigh << 32 | frame_info.nDevTimeStampLow
+        )
+        record["host_timestamp"] = frame_info.nHostTimeStamp
+        record["frame_num"] = frame_info.nFrameNum
+        record["lost_packet"] = getattr(frame_info, "nLostPacket", 0)
+        record["frame_len"] = frame_info.nFrameLen
+        record["exposure"] = frame_info.fExposureTime
+        record["gain"] = getattr(frame_info, "fGain", 0)
+    record["host_time"] = time.time()
+    return record
+
+
+class RawWriter:
+    """
+    Appends frames of one pixel type and shape to a .hikraw file.
+
+    Usage:
+        with cam.open_raw_writer("/tmp/a.hikraw") as writer:
+            for i in range(100):
+                cam.get_frame_with_config()
+                writer.write(cam.data_arr, cam.stFrameInfo)
+    """
+
+    def __init__(
+        self, path: str, pixel_type: int, h: int, w: int, pattern: str = None, **meta
+    ) -> None:
+        """
+        Args:
+            pixel_type (int): MV_FRAME_OUT_INFO_EX.enPixelType
+            pattern (str, optional): Bayer 排列, 如 "RGGB". Defaults to None.
+            **meta: 写入 JSON 头的其他信息, 如 ip, bit
+        """
+        decoder = get_decoder(pixel_type)
+        self.path = path
+        self.header = dict(
+            meta,
+            pixel_type=pixel_type,
+            pixel_format=decoder.name,
+            h=h,
+            w=w,
+            bit=meta.get("bit", decoder.bit),
+            pattern=pattern,
+            frame_nbytes=get_frame_nbytes(pixel_type, h, w),
+            frame_info_dtype=FRAME_INFO.descr,
+        )
+        data = json.dumps(self.header).encode()
+        assert len(data) + 12 <= HEADER_SIZE, "Header too large"
+        self.frame_nbytes = self.header["frame_nbytes"]
+        self.n = 0
+        self.fd = os.open(
+            path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | O_BINARY, 0o644
+        )
+        header = MAGIC + np.uint32(len(data)).tobytes() + data
+        os.write(self.fd, header.ljust(HEADER_SIZE, b"\0"))
+
+    def write(self, buf: np.ndarray, frame_info=None) -> int:
+        """
+        Append a frame, buf is the SDK frame buffer (e.g. cam.data_arr), written as it is.
+
+        Args:
+            frame_info (MV_FRAME_OUT_INFO_EX or dict, optional): e.g. cam.stFrameInfo. Defaults to None.
+
+        Returns:
+            Index of the frame in the file.
+        """
+        assert buf.nbytes >= self.frame_nbytes, (buf.nbytes, self.frame_nbytes)
+        if frame_info is not None and not isinstance(frame_info, dict):
+            assert (
+                frame_info.enPixelType == self.header["pixel_type"]
+                and frame_info.nHeight == self.header["h"]
+                and frame_info.nWidth == self.header["w"]
+            ), "Frames of a .hikraw file share one pixel type and shape"
+        record = frame_info_to_record(frame_info)
+        data = memoryview(buf.reshape(-1).view(np.uint8)[: self.frame_nbytes])
+        if hasattr(os, "writev"):
+            # One syscall for the record, no copy of the frame
+            written = os.writev(self.fd, [record.tobytes(), data])
+        else:
+            # Windows has no writev
+            written = os.write(self.fd, record.tobytes()) + os.write(self.fd, data)
+        assert written == FRAME_INFO.itemsize + self.frame_nbytes, written
+        self.n += 1
+        return self.n - 1
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self) -> "RawWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class RawReader:
+    """
+    Memory-mapped .hikraw file: opening reads only the header, frames are decoded on access.
+
+    Usage:
+        reader = RawReader("/tmp/a.hikraw")
+        raw = reader[10]  # decoded frame, e.g. (h, w) uint16 for Bayer12Packed
+        reader.infos["dev_timestamp"]  # FRAME_INFO of every frame, without reading the frames
+        reader.to_dng(10, "/tmp/10.dng")
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(12)
+            assert head[:8] == MAGIC, f"{path} is not a .hikraw file"
+            self.header = json.loads(f.read(int(np.frombuffer(head[8:], "<u4")[0])))
+        self.h, self.w = self.header["h"], self.header["w"]
+        self.pattern = self.header["pattern"]
+        self.bit = self.header["bit"]
+        self.decoder = get_decoder(self.header["pixel_type"])
+        self.record_dtype = np.dtype(
+            [("info", FRAME_INFO), ("data", np.uint8, (self.header["frame_nbytes"],))]
+        )
+        # A record cut by a crash is left out
+        n = (os.path.getsize(path) - HEADER_SIZE) // self.record_dtype.itemsize
+        self.records = (
+            np.memmap(path, self.record_dtype, "r", HEADER_SIZE, (n,))
+            if n
+            else np.zeros(0, self.record_dtype)
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def infos(self) -> np.ndarray:
+        """
+        FRAME_INFO structured array of all frames.
+        """
+        return self.records["info"]
+
+    def get_info(self, idx: int) -> dict:
+        info = self.records[idx]["info"]
+        return {key: info[key].item() for key in FRAME_INFO.names if key != "reserved"}
+
+    def get_raw(self, idx: int) -> np.ndarray:
+        """
+        Frame bytes as sent by the camera, a view on the memmap.
+        """
+        return self.records[idx]["data"]
+
+    def decode(self, idx: int, out: np.ndarray = None) -> np.ndarray:
+        img = self.decoder(self.get_raw(idx), self.h, self.w, out)
+        if out is None and self.decoder.view:
+            # Do not hand out views of the read-only memmap
+            img = img.copy()
+        return img
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.decode(i) for i in range(*idx.indices(len(self)))]
+        return self.decode(int(idx))
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.decode(idx)
+
+    def to_dng(self, idx: int, dng_path: str, compress: bool = False) -> str:
+        """
+        Save a Bayer frame as .dng, like HikCamera.save_raw.
+        """
+        from process_raw import DngFile
+
+        assert self.pattern, f"{self.header['pixel_format']} is not a Bayer format"
+        DngFile.save(
+            dng_path, self.decode(idx), bit=self.bit, pattern=self.pattern, compress=compress
+        )
+        return dng_path
+
+
+def convert_to_dng(path: str, dirr: str = None, compress: bool = False) -> list:
+    """
+    Convert every frame of a .hikraw file to `dirr/<frame_num>.dng`.
+
+    Args:
+        dirr (str, optional): 输出目录. Defaults to the .hikraw path without extension.
+    """
+    reader = RawReader(path)
+    dirr = dirr or os.path.splitext(path)[0]
+    os.makedirs(dirr, exist_ok=True)
+    return [
+        reader.to_dng(idx, os.path.join(dirr, f"{info['frame_num']}.dng"), compress)
+        for idx, info in enumerate(reader.infos)
+    ]
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        print(path, "->", len(convert_to_dng(path)), "dng")
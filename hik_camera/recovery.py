@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+"""
+Tiered recovery of a camera after a failed get_frame.
+
+Cheap remedies are tried first, DeviceReset (tens of seconds of downtime) only when all of them fail:
+    retry -> clear_buffer -> restart_grabbing -> reopen -> device_reset
+
+After each remedy the frame is grabbed with a short timeout (probe_timeout_ms), not the 40s TIMEOUT_MS,
+so a hung camera reaches DeviceReset in seconds.
+"""
+
+import random
+import socket
+import struct
+import time
+from threading import Lock
+
+LEVELS = ("retry", "clear_buffer", "restart_grabbing", "reopen", "device_reset")
+# Attempts of each level in one incident
+DEFAULT_BUDGETS = dict(
+    retry=1, clear_buffer=1, restart_grabbing=1, reopen=1, device_reset=1
+)
+# Levels that work on the open connection, useless when the camera does not answer on the network
+SESSION_LEVELS = ("retry", "clear_buffer", "restart_grabbing")
+
+GVCP_PORT = 3956
+GVCP_DISCOVERY_CMD = 0x0002
+GVCP_DISCOVERY_ACK = 0x0003
+
+
+def gvcp_probe(ip: str, timeout: float = 0.2, port: int = GVCP_PORT) -> bool:
+    """
+    Returns True if the camera answers a GigE Vision discovery command.
+
+    In process, unlike spawning `ping`. A camera opened by another application still answers.
+
+    Args:
+        ip (str): 相机 IP
+        timeout (float, optional): 等待回复的秒数. Defaults to 0.2.
+    """
+    req_id = random.randrange(1, 0x10000)
+    # key 0x42, flags: acknowledge required, command, length, req_id
+    packet = struct.pack(">BBHHH", 0x42, 0x01, GVCP_DISCOVERY_CMD, 0, req_id)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(packet, (ip, port))
+            deadline = time.monotonic() + timeout
+            while True:
+                sock.settimeout(max(deadline - time.monotonic(), 1e-3))
+                data, _ = sock.recvfrom(1024)
+                if len(data) >= 8:
+                    status, answer, _, ack_id = struct.unpack(">HHHH", data[:8])
+                    if answer == GVCP_DISCOVERY_ACK and ack_id == req_id:
+                        return status == 0
+        except OSError:  # timeout, unreachable network
+            return False
+
+
+class RecoveryEngine:
+    """
+    Runs a get_frame function, on failure escalates through the recovery levels of one camera.
+
+    The camera lock is only held inside each remedy, never across the backoff sleeps,
+    so other threads using the camera are not blocked for the whole incident.
+    """
+
+    def __init__(
+        self,
+        cam,
+        budgets: dict = None,
+        backoff: float = 0.05,
+        backoff_factor: float = 2.0,
+        max_backoff: float = 2.0,
+        probe_timeout_ms: int = 3000,
+        level_timeout: float = 10.0,
+    ) -> None:
+        """
+        Args:
+            cam (HikCamera): 相机
+            budgets (dict, optional): level -> 每次故障该级别最多尝试次数, 0 表示跳过该级别. Defaults to DEFAULT_BUDGETS.
+            backoff (float, optional): 第一次尝试前等待的秒数, 之后每次乘以 backoff_factor. Defaults to 0.05.
+            backoff_factor (float, optional): Defaults to 2.0.
+            max_backoff (float, optional): 等待秒数上限. Defaults to 2.0.
+            probe_timeout_ms (int, optional): 每次恢复后取帧的超时毫秒数, 应大于曝光加传输时间. Defaults to 3000.
+            level_timeout (float, optional): 每个级别最多花的秒数, 超过后不再重试该级别, 直接升级. Defaults to 10.0.
+        """
+        unknown = set(budgets or {}) - set(LEVELS)
+        assert not unknown, f"Unknown recovery levels {unknown}, should be in {LEVELS}"
+        self.cam = cam
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.probe_timeout_ms = probe_timeout_ms
+        self.level_timeout = level_timeout
+        self._stats_lock = Lock()
+        self.incidents = 0
+        self.unrecovered = 0
+        self.levels = {
+            level: dict(attempts=0, successes=0, spend=0.0) for level in LEVELS
+        }
+        self.last_incident = None
+
+    def run(self, func, error: Exception = None):
+        """
+        Returns func(), recovering the camera and calling func(timeout_ms=probe_timeout_ms) again when it raises.
+        Raises the last exception when every level has used up its budget.
+
+        Args:
+            func (callable): e.g. HikCamera.get_frame, takes a timeout_ms keyword.
+            error (Exception, optional): func already failed with it, start recovering directly.
+        """
+        if error is None:
+            try:
+                return func()
+            except Exception as e:
+                error = e
+        begin = time.time()
+        attempt = 0
+        errors = []
+        for level in LEVELS:
+            level_deadline = time.time() + self.level_timeout
+            for _ in range(self.budgets[level]):
+                if time.time() > level_deadline:
+                    break
+                if level in SESSION_LEVELS and not self.cam._ping():
+                    # Unreachable, escalate to reopen and DeviceReset which wait for the camera
+                    break
+                errors.append(f"{type(error).__name__}: {error}")
+                time.sleep(
+                    min(self.backoff * self.backoff_factor**attempt, self.max_backoff)
+                )
+                attempt += 1
+                level_begin = time.time()
+                try:
+                    getattr(self.cam, "_recover_" + level)()
+                    result = func(timeout_ms=self.probe_timeout_ms)
+                except Exception as e:
+                    error = e
+                    self._record(level, False, time.time() - level_begin)
+                    continue
+                self._record(level, True, time.time() - level_begin)
+                self._record_incident(level, attempt, begin, errors)
+                return result
+        self._record_incident(None, attempt, begin, errors)
+        raise error
+
+    def _record(self, level, success, spend) -> None:
+        with self._stats_lock:
+            stats = self.levels[level]
+            stats["attempts"] += 1
+            stats["successes"] += success
+            stats["spend"] += spend
+
+    def _record_incident(self, level, attempts, begin, errors) -> None:
+        metrics = getattr(self.cam, "metrics", None)
+        if metrics is not None:
+            metrics.observe("recovery", time.time() - begin)
+        with self._stats_lock:
+            self.incidents += 1
+            self.unrecovered += level is None
+            self.last_incident = dict(
+                recovered_by=level,
+                attempts=attempts,
+                spend=time.time() - begin,
+                errors=errors,
+            )
+
+    def get_stats(self) -> dict:
+        """
+        Returns:
+            dict(incidents, unrecovered, levels={level: dict(attempts, successes, spend)}, last_incident)
+                last_incident: dict(recovered_by=level or None, attempts, spend, errors)
+        """
+        with self._stats_lock:
+            return dict(
+                incidents=self.incidents,
+                unrecovered=self.unrecovered,
+                levels={level: dict(stats) for level, stats in self.levels.items()},
+                last_incident=self.last_incident and dict(self.last_incident),
+            )
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+"""
+Hours-long recording of many cameras, see SequenceRecorder and SequenceReader.
+
+Frames of every camera are appended as their wire bytes (no decode) into preallocated segment files,
+and each segment has an index of fixed size records (camera, frame number, device timestamp,
+host timestamp, offset, ...). Segments rotate at `segment_bytes`, the oldest are deleted to stay
+within `disk_budget`. SequenceReader finds the frames of all cameras nearest to a time.
+
+Layout of a recording directory:
+    cameras.json: list of camera ips, the camera id of the index is the position in it
+    00000001.seg: frame bytes, back to back
+    00000001.idx: SEQUENCE_INDEX records of the frames in 00000001.seg
+"""
+
+import glob
+import json
+import os
+import time
+from threading import Lock
+
+import numpy as np
+
+from .decoders import get_decoder
+from .raw_container import O_BINARY, get_frame_nbytes
+
+SEQUENCE_INDEX = np.dtype(
+    [
+        ("dev_timestamp", "<u8"),
+        ("host_time", "<f8"),  # time.time() when the frame was taken from the SDK
+        ("offset", "<u8"),
+        ("frame_num", "<u4"),
+        ("pixel_type", "<u4"),
+        ("lost_packet", "<u4"),
+        ("nbytes", "<u4"),
+        ("h", "<u2"),
+        ("w", "<u2"),
+        ("cam", "<u2"),
+        ("reserved", "<u2"),
+    ]
+)
+
+
+def _fallocate(fd: int, nbytes: int) -> None:
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, nbytes)
+            return
+        except OSError:
+            # e.g. not supported by the file system
+            pass
+    os.ftruncate(fd, nbytes)
+
+
+def _pwrite(segment, data, offset: int) -> int:
+    if hasattr(os, "pwrite"):
+        return os.pwrite(segment.fd, data, offset)
+    # Windows has no pwrite, the seek and write of concurrent frames must not interleave
+    with segment.seek_lock:
+        os.lseek(segment.fd, offset, os.SEEK_SET)
+        return os.write(segment.fd, data)
+
+
+class _Segment:
+    def __init__(self, dirr: str, sid: int, nbytes: int) -> None:
+        self.sid = sid
+        self.path = os.path.join(dirr, f"{sid:08d}.seg")
+        self.idx_path = os.path.join(dirr, f"{sid:08d}.idx")
+        self.fd = os.open(
+            self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | O_BINARY, 0o644
+        )
+        _fallocate(self.fd, nbytes)
+        self.idx_fd = os.open(
+            self.idx_path,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND | O_BINARY,
+            0o644,
+        )
+        self.seek_lock = Lock()
+        self.size = nbytes
+        self.used = 0
+        # Frames being written outside of the recorder lock
+        self.pending = 0
+        self.sealed = False
+
+    def close(self) -> None:
+        # Give back the preallocated tail
+        os.ftruncate(self.fd, self.used)
+        self.size = self.used
+        os.close(self.fd)
+        os.close(self.idx_fd)
+        self.fd = self.idx_fd = None
+
+
+class SequenceRecorder:
+    """
+    Appends the frames of many cameras to segment files in `dirr`.
+
+    Usage:
+        with cams, SequenceRecorder("/data/rec", disk_budget=500e9) as recorder:
+            while True:
+                recorder.capture(cams)  # one frame of every camera, grabbed in parallel
+
+    Cameras grabbing in their own threads can call `recorder.write(cam.ip, cam.data_arr, cam.stFrameInfo)`
+    after `cam.get_frame_with_config()`, writes of different cameras run concurrently.
+    """
+
+    def __init__(
+        self, dirr: str, segment_bytes: int = 1 << 30, disk_budget: float = None
+    ) -> None:
+        """
+        Args:
+            segment_bytes (int, optional): 每个分段文件预分配的大小. Defaults to 1 GiB.
+            disk_budget (float, optional): 录制占用的磁盘上限 (bytes), 超出时删除最旧的分段. Defaults to None, 不限.
+        """
+        assert disk_budget is None or disk_budget >= 2 * segment_bytes, (
+            "disk_budget should hold at least 2 segments"
+        )
+        os.makedirs(dirr, exist_ok=True)
+        self.dirr = dirr
+        self.segment_bytes = int(segment_bytes)
+        self.disk_budget = disk_budget
+        self.cameras = SequenceReader.load_cameras(dirr)
+        self._cam_ids = {ip: i for i, ip in enumerate(self.cameras)}
+        sids = SequenceReader.list_segments(dirr)
+        # Ids of the segments on disk, older recordings of the directory count in the budget
+        self.segments = list(sids)
+        self._lock = Lock()
+        self.segment = None
+        self.stats = dict(frames=0, bytes=0, segments=0, evicted=0)
+        self._rotate(sids[-1] + 1 if sids else 1)
+
+    def _get_cam_id(self, ip: str) -> int:
+        if ip not in self._cam_ids:
+            self._cam_ids[ip] = len(self.cameras)
+            self.cameras.append(ip)
+            path = os.path.join(self.dirr, "cameras.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.cameras, f)
+            os.replace(path + ".tmp", path)
+        return self._cam_ids[ip]
+
+    def _rotate(self, sid: int = None) -> None:
+        old = self.segment
+        if old is not None:
+            old.sealed = True
+            if not old.pending:
+                old.close()
+            sid = old.sid + 1
+        self.segment = _Segment(self.dirr, sid, self.segment_bytes)
+        self.segments.append(sid)
+        self.stats["segments"] += 1
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.disk_budget is None:
+            return
+        # The segments in use are preallocated, the closed ones were truncated to their content
+        sizes = {
+            sid: os.path.getsize(os.path.join(self.dirr, f"{sid:08d}.seg"))
+            for sid in self.segments
+        }
+        while sum(sizes.values()) > self.disk_budget and len(self.segments) > 2:
+            sid = self.segments.pop(0)
+            del sizes[sid]
+            for ext in (".seg", ".idx"):
+                os.remove(os.path.join(self.dirr, f"{sid:08d}{ext}"))
+            self.stats["evicted"] += 1
+
+    def write(self, ip: str, buf: np.ndarray, frame_info) -> int:
+        """
+        Append a frame as its wire bytes, buf is the SDK frame buffer and frame_info its MV_FRAME_OUT_INFO_EX.
+
+        Returns:
+            Id of the segment the frame is in.
+        """
+        host_time = time.time()
+        h, w, pixel_type = frame_info.nHeight, frame_info.nWidth, frame_info.enPixelType
+        nbytes = get_frame_nbytes(pixel_type, h, w)
+        assert nbytes <= self.segment_bytes, (nbytes, self.segment_bytes)
+        record = np.zeros((), SEQUENCE_INDEX)
+        record["dev_timestamp"] = (
+            frame_info.nDevTimeStampHigh << 32 | frame_info.nDevTimeStampLow
+        )
+        record["host_time"] = host_time
+        record["frame_num"] = frame_info.nFrameNum
+        record["pixel_type"] = pixel_type
+        record["lost_packet"] = getattr(frame_info, "nLostPacket", 0)
+        record["nbytes"] = nbytes
+        record["h"], record["w"] = h, w
+        with self._lock:
+            record["cam"] = self._get_cam_id(ip)
+            if self.segment.used + nbytes > self.segment.size:
+                self._rotate()
+            segment = self.segment
+            record["offset"] = segment.used
+            segment.used += nbytes
+            segment.pending += 1
+        written = False
+        try:
+            data = memoryview(buf.reshape(-1).view(np.uint8)[:nbytes])
+            assert _pwrite(segment, data, int(record["offset"])) == nbytes
+            written = True
+        finally:
+            with self._lock:
+                if written:
+                    # The index only refers to frames fully written
+                    os.write(segment.idx_fd, record.tobytes())
+                    self.stats["frames"] += 1
+                    self.stats["bytes"] += nbytes
+                segment.pending -= 1
+                if segment.sealed and not segment.pending:
+                    segment.close()
+        return segment.sid
+
+    def record_frame(self, cam) -> int:
+        """
+        Grab a frame of cam without decoding it and append it.
+        """
+        cam.get_frame_with_config()
+        return self.write(cam.ip, cam.data_arr, cam.stFrameInfo)
+
+    def capture(self, cams) -> dict:
+        """
+        One frame of every camera of a MultiHikCamera, grabbed and written in the per-camera workers.
+        """
+        futures = {
+            ip: cams._get_worker(ip).submit(self.record_frame, cam)
+            for ip, cam in cams.items()
+        }
+        return {ip: future.result() for ip, future in futures.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            if self.segment is not None:
+                self.segment.sealed = True
+                if not self.segment.pending:
+                    self.segment.close()
+                self.segment = None
+
+    def __enter__(self) -> "SequenceRecorder":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class SequenceReader:
+    """
+    Index and frames of a SequenceRecorder directory, segments are memory-mapped on first access.
+
+    Usage:
+        reader = SequenceReader("/data/rec")
+        frames = reader.get_synced(t)  # ip -> decoded frame nearest to time t of every camera
+    """
+
+    def __init__(self, dirr: str) -> None:
+        self.dirr = dirr
+        self.cameras = self.load_cameras(dirr)
+        indexes, sids = [], []
+        for sid in self.list_segments(dirr):
+            with open(os.path.join(dirr, f"{sid:08d}.idx"), "rb") as f:
+                data = f.read()
+            # A record being appended is left out
+            n = len(data) // SEQUENCE_INDEX.itemsize
+            idx = np.frombuffer(data[: n * SEQUENCE_INDEX.itemsize], SEQUENCE_INDEX)
+            indexes.append(idx)
+            sids.append(np.full(len(idx), sid, np.uint32))
+        index = np.concatenate(indexes) if indexes else np.zeros(0, SEQUENCE_INDEX)
+        self.segment_ids = np.concatenate(sids) if sids else np.zeros(0, np.uint32)
+        self.index = index
+        # ip -> positions in self.index sorted by host_time
+        self._positions = {}
+        for cam, ip in enumerate(self.cameras):
+            positions = np.flatnonzero(index["cam"] == cam)
+            order = np.argsort(index["host_time"][positions], kind="stable")
+            self._positions[ip] = positions[order]
+        self._segments = {}
+
+    @staticmethod
+    def load_cameras(dirr: str) -> list:
+        path = os.path.join(dirr, "cameras.json")
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def list_segments(dirr: str) -> list:
+        return sorted(
+            int(os.path.basename(path)[:-4])
+            for path in glob.glob(os.path.join(dirr, "*.seg"))
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get_time_range(self) -> tuple:
+        return float(self.index["host_time"].min()), float(self.index["host_time"].max())
+
+    def get_entry(self, position: int) -> dict:
+        record = self.index[position]
+        entry = {key: record[key].item() for key in SEQUENCE_INDEX.names if key != "reserved"}
+        entry.update(
+            ip=self.cameras[entry.pop("cam")],
+            segment=int(self.segment_ids[position]),
+            position=int(position),
+        )
+        return entry
+
+    def get_frame(self, position: int) -> np.ndarray:
+        """
+        Decoded frame at a position of self.index.
+        """
+        record = self.index[position]
+        sid = int(self.segment_ids[position])
+        if sid not in self._segments:
+            self._segments[sid] = np.memmap(
+                os.path.join(self.dirr, f"{sid:08d}.seg"), np.uint8, "r"
+            )
+        offset = int(record["offset"])
+        buf = self._segments[sid][offset : offset + int(record["nbytes"])]
+        decoder = get_decoder(int(record["pixel_type"]))
+        img = decoder(buf, int(record["h"]), int(record["w"]))
+        return img.copy() if decoder.view else img
+
+    def query(self, t: float, max_skew: float = None) -> dict:
+        """
+        The frame of every camera nearest to host time t.
+
+        Args:
+            t (float): time.time() 形式的时间
+            max_skew (float, optional): 与 t 相差超过该秒数的相机不返回. Defaults to None.
+
+        Returns:
+            ip -> entry dict(ip, frame_num, dev_timestamp, host_time, segment, offset, position, ...)
+        """
+        res = {}
+        times = self.index["host_time"]
+        for ip, positions in self._positions.items():
+            if not len(positions):
+                continue
+            cam_times = times[positions]
+            i = int(np.searchsorted(cam_times, t))
+            candidates = [j for j in (i - 1, i) if 0 <= j < len(positions)]
+            j = min(candidates, key=lambda j: abs(cam_times[j] - t))
+            if max_skew is not None and abs(cam_times[j] - t) > max_skew:
+                continue
+            res[ip] = self.get_entry(positions[j])
+        return res
+
+    def get_synced(self, t: float, max_skew: float = None) -> dict:
+        """
+        ip -> decoded frame of query(t, max_skew).
+        """
+        return {
+            ip: self.get_frame(entry["position"])
+            for ip, entry in self.query(t, max_skew).items()
+        }
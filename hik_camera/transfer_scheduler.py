@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+"""
+Per network interface scheduler of frame transfers.
+
+Cameras behind the same host NIC share its bandwidth. Instead of all-at-once (packet loss)
+or one-at-a-time (`config["lock_name"]`, latency grows with N), the scheduler lets as many
+transfers run at once as the NIC can carry, and serves waiting cameras round-robin.
+"""
+
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Fraction of the NIC bandwidth the scheduler hands out, the rest absorbs bursts
+UTILIZATION = 0.9
+
+
+def get_nic_speed_mbps(host_ip: str) -> int:
+    """
+    Link speed in Mbps of the network interface that owns `host_ip`, None if unknown.
+    Needs the optional dependency psutil (`pip install hik_camera[nic]`).
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    for nic, addrs in psutil.net_if_addrs().items():
+        if any(a.family == socket.AF_INET and a.address == host_ip for a in addrs):
+            stats = psutil.net_if_stats().get(nic)
+            if stats is not None and stats.speed > 0:
+                return stats.speed
+    return None
+
+
+def compute_slots(nic_mbps: float, camera_mbps: float) -> int:
+    """
+    How many cameras of `camera_mbps` link speed can send at full rate into a `nic_mbps` NIC.
+    e.g. 10 GbE NIC and 5 GigE cameras: 1, 10 GbE NIC and 2.5 GigE cameras: 3
+    """
+    return max(1, int(nic_mbps * UTILIZATION // camera_mbps))
+
+
+class TransferScheduler:
+    """
+    Bandwidth budget of one host NIC, shared by the cameras behind it.
+
+    Each transfer reserves the link speed of its camera. A transfer starts when the reserved
+    sum stays below the budget (or nothing else is on the wire). Waiting cameras are served
+    round-robin, so one camera calling get_frame in a loop can't starve the others.
+
+    With the payload `nbytes`, the reservation only lasts the wire time of the frame:
+    `lead` seconds (exposure, the camera sends nothing yet) plus nbytes * 8 / link speed.
+    Past that the transfer still runs (SDK wait) but no longer holds the NIC, so small frames
+    free the bandwidth early. Without nbytes the reservation lasts until release.
+
+    Usage:
+        with scheduler.transfer(cam.ip, cam_mbps, nbytes, lead=exposure_s):
+            trigger and receive one frame
+    """
+
+    def __init__(self, host_ip: str, nic_mbps: float, history: int = 1000) -> None:
+        """
+        Args:
+            host_ip (str): IP of the NIC, only for logging.
+            nic_mbps (float): NIC link speed in Mbps.
+            history (int, optional): number of recent waits kept per camera for metrics.
+        """
+        self.host_ip = host_ip
+        self.nic_mbps = nic_mbps
+        self.capacity = nic_mbps * UTILIZATION
+        self.history = history
+        self._cond = threading.Condition()
+        self._pending = defaultdict(deque)  # camera -> tickets waiting
+        self._ring = deque()  # cameras with pending tickets, round-robin order
+        self._active = []  # granted tickets not released yet
+        self.reserved = 0.0  # Mbps of the tickets still on the wire
+        self.active = 0
+        self.peak_active = 0
+        self.waits = defaultdict(lambda: deque(maxlen=history))
+        # Measured throughput of finished transfers, bytes / second
+        self.throughputs = deque(maxlen=history)
+
+    def _on_wire(self, now: float) -> list:
+        # Called with self._cond held
+        return [ticket for ticket in self._active if ticket["until"] > now]
+
+    def _dispatch(self) -> None:
+        # Called with self._cond held
+        granted = False
+        now = time.perf_counter()
+        on_wire = self._on_wire(now)
+        self.reserved = sum(ticket["mbps"] for ticket in on_wire)
+        while self._ring:
+            key = self._ring[0]
+            ticket = self._pending[key][0]
+            if on_wire and self.reserved + ticket["mbps"] > self.capacity:
+                # Head-of-line waits, so later cameras can't overtake it
+                break
+            self._pending[key].popleft()
+            self._ring.popleft()
+            if self._pending[key]:
+                self._ring.append(key)
+            ticket["granted"] = True
+            ticket["until"] = now + ticket["wire"]
+            self._active.append(ticket)
+            on_wire.append(ticket)
+            self.reserved += ticket["mbps"]
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _wait(self, ticket: dict, timeout: float = None) -> bool:
+        # Called with self._cond held, wakes up when a reservation leaves the wire
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not ticket["granted"]:
+            now = time.perf_counter()
+            wake = min((t["until"] for t in self._on_wire(now)), default=float("inf"))
+            wait = None if wake == float("inf") else wake - now
+            if deadline is not None:
+                if now >= deadline:
+                    return False
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+            self._cond.wait(wait)
+            self._dispatch()
+        return True
+
+    def acquire(
+        self, key, mbps: float, timeout: float = None, nbytes: int = None, lead: float = 0.0
+    ) -> dict:
+        """
+        Wait for a transfer slot of `mbps` for camera `key`.
+
+        Args:
+            nbytes (int, optional): payload of the frame, the reservation then only lasts
+                `lead` + nbytes * 8 / mbps seconds. Defaults to None, until `release`.
+            lead (float, optional): seconds before the camera starts sending, e.g. exposure.
+
+        Returns:
+            ticket, hand it back with `release`.
+        """
+        mbps = min(mbps, self.capacity)
+        wire = lead + nbytes * 8 / (mbps * 1e6) if nbytes else float("inf")
+        ticket = dict(key=key, mbps=mbps, wire=wire, granted=False, begin=time.perf_counter())
+        with self._cond:
+            if not self._pending[key]:
+                self._ring.append(key)
+            self._pending[key].append(ticket)
+            self._dispatch()
+            if not self._wait(ticket, timeout):
+                self._pending[key].remove(ticket)
+                if not self._pending[key]:
+                    self._ring.remove(key)
+                self._dispatch()
+                raise TimeoutError(
+                    f"No transfer slot on {self.host_ip} for {key} in {timeout}s"
+                )
+        ticket["start"] = time.perf_counter()
+        self.waits[key].append(ticket["start"] - ticket["begin"])
+        return ticket
+
+    def release(self, ticket: dict, nbytes: int = None) -> None:
+        if nbytes:
+            spend = time.perf_counter() - ticket["start"]
+            self.throughputs.append(nbytes / max(spend, 1e-9))
+        with self._cond:
+            self._active.remove(ticket)
+            self.active -= 1
+            self._dispatch()
+
+    @contextmanager
+    def transfer(
+        self, key, mbps: float, nbytes: int = None, timeout: float = None, lead: float = 0.0
+    ):
+        ticket = self.acquire(key, mbps, timeout, nbytes, lead)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket, nbytes)
+
+    def get_stats(self) -> dict:
+        """
+        Queue-wait metrics in seconds, per camera and over all cameras.
+        """
+        per_camera = {}
+        for key, waits in list(self.waits.items()):
+            waits = np.array(waits)
+            per_camera[key] = dict(
+                n=len(waits),
+                mean=float(waits.mean()),
+                p99=float(np.percentile(waits, 99)),
+                max=float(waits.max()),
+            )
+        all_waits = np.concatenate([list(w) for w in self.waits.values()] or [[]])
+        throughputs = np.array(self.throughputs)
+        return dict(
+            host_ip=self.host_ip,
+            nic_mbps=self.nic_mbps,
+            active=self.active,
+            peak_active=self.peak_active,
+            queued=sum(len(tickets) for tickets in self._pending.values()),
+            wait_mean=float(all_waits.mean()) if len(all_waits) else 0.0,
+            wait_max=float(all_waits.max()) if len(all_waits) else 0.0,
+            throughput_mbps=float(np.median(throughputs) * 8 / 1e6)
+            if len(throughputs)
+            else None,
+            per_camera=per_camera,
+        )
+
+
+_host_ip_to_scheduler = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(host_ip: str, nic_mbps: float = None) -> TransferScheduler:
+    """
+    The shared TransferScheduler of `host_ip`, created on first use.
+    `nic_mbps` defaults to the speed reported by the OS, 1000 if unknown.
+    A `nic_mbps` different from the one the scheduler was created with raises ValueError.
+    """
+    with _schedulers_lock:
+        if host_ip not in _host_ip_to_scheduler:
+            if nic_mbps is None:
+                nic_mbps = get_nic_speed_mbps(host_ip)
+                if nic_mbps is None:
+                    nic_mbps = 1000
+                    print(
+                        f"TransferScheduler: link speed of {host_ip} unknown (pip install psutil), "
+                        f"assume {nic_mbps}Mbps, set config['nic_mbps'] to override"
+                    )
+            _host_ip_to_scheduler[host_ip] = TransferScheduler(host_ip, nic_mbps)
+        scheduler = _host_ip_to_scheduler[host_ip]
+        if nic_mbps is not None and nic_mbps != scheduler.nic_mbps:
+            raise ValueError(
+                f"Scheduler of {host_ip} already runs with nic_mbps={scheduler.nic_mbps}, "
+                f"got {nic_mbps}"
+            )
+        return scheduler
+
+
+if __name__ == "__main__":
+    # 6 cameras of 2.5 GigE behind one 10 GbE port, 30ms per transfer
+    scheduler = TransferScheduler("10.0.0.1", 10000)
+    print("slots", compute_slots(10000, 2500))
+
+    def grab(cam):
+        for _ in range(5):
+            with scheduler.transfer(cam, 2500, 12e6):
+                time.sleep(0.03)
+
+    threads = [threading.Thread(target=grab, args=(i,)) for i in range(6)]
+    begin = time.time()
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    print("spend", time.time() - begin)
+    print(scheduler.get_stats())
@@ -22,6 +22,8 @@ setuptools.setup(
     packages=setuptools.find_packages(),
     python_requires=">=3.6",
     install_requires=requirements,
+    # NIC link speed for config["transfer_scheduler"] and plan_bandwidth
+    extras_require={"nic": ["psutil"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+
+"""
+Loaded by pytest before any test module: without the MVS SDK, the fake SDK is installed
+up front, so a test module is collected whatever it imports first (e.g. test_decoders).
+"""
+
+import os
+
+import fake_mvs
+import test_base
+
+from hik_camera.hik_camera import MvImportDir
+
+if not os.path.isfile(os.path.join(MvImportDir, "MvCameraControl_class.py")):
+    fake_mvs.install()
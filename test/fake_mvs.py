@@ -0,0 +1,805 @@
+#!/usr/bin/env python3
+
+"""
+Stand-in for the MVS SDK python wrapper (`MvCameraControl_class`).
+
+Simulates GigE cameras in-process so that the logic of `hik_camera` can be
+tested without hardware: node registers, software/action triggers, the
+`GetOneFrameTimeout`/`GetImageBuffer`/callback grab paths and a simple
+linear exposure model (`brightness = scene * ExposureTime * Gain`).
+
+Usage:
+    import fake_mvs
+    fake_mvs.install()  # before the first `import hik_camera`
+
+Test harness shared by every test module (plain functions, the tests also run as scripts):
+    new_camera(ip, cls, setting, scene, **config): a HikCamera of a fresh fake device
+    new_cameras(ips, ...): the same as a MultiHikCamera
+    fixed_exposure: a `setting` that turns off auto exposure, for reproducible frames
+    get_device(ip): the fake device behind a camera, to inject faults
+"""
+
+import ctypes
+import random
+import sys
+import threading
+import time
+from collections import deque
+from ctypes import (
+    POINTER,
+    Structure,
+    c_char,
+    c_char_p,
+    c_float,
+    c_int,
+    c_int64,
+    c_ubyte,
+    c_uint,
+    c_ushort,
+    c_void_p,
+)
+
+import numpy as np
+
+MV_OK = 0
+MV_E_HANDLE = 0x80000000
+MV_E_SUPPORT = 0x80000001
+MV_E_PARAMETER = 0x80000004
+MV_E_NODATA = 0x80000007
+MV_E_BUFOVER = 0x80000008
+MV_E_GC_TIMEOUT = 0x80000107
+
+MV_GIGE_DEVICE = 0x00000001
+MV_ACCESS_Exclusive = 1
+MV_TRIGGER_MODE_OFF = 0
+MV_TRIGGER_MODE_ON = 1
+MV_TRIGGER_SOURCE_SOFTWARE = 7
+MV_GrabStrategy_OneByOne = 0
+MV_GrabStrategy_LatestImagesOnly = 1
+MV_GrabStrategy_LatestImages = 2
+MV_GrabStrategy_UpcomingImage = 3
+
+PIXEL_FORMATS = {
+    "Mono8": 0x01080001,
+    "Mono10": 0x01100003,
+    "Mono10Packed": 0x010C0004,
+    "Mono12": 0x01100005,
+    "Mono12Packed": 0x010C0006,
+    "Mono16": 0x01100007,
+    "RGB8Packed": 0x02180014,
+    "BGR8Packed": 0x02180015,
+    "YUV422_8": 0x02100032,
+    "YUV422_8_UYVY": 0x0210001F,
+    "BayerRG8": 0x01080009,
+    "BayerRG12": 0x01100011,
+    "BayerRG12Packed": 0x010C002B,
+    "BayerRG16": 0x0110002F,
+}
+ENUM_SYMBOLS = {
+    "PixelFormat": PIXEL_FORMATS,
+    "ExposureAuto": {"Off": 0, "Once": 1, "Continuous": 2},
+    "GainAuto": {"Off": 0, "Once": 1, "Continuous": 2},
+    "TriggerMode": {"Off": 0, "On": 1},
+    "TriggerSource": {
+        "Line0": 0,
+        "Line1": 1,
+        "Software": 7,
+        "Action1": 9,
+    },
+    "ActionSelector": {"0": 0, "1": 1},
+}
+
+
+class MVCC_INTVALUE(Structure):
+    _fields_ = [
+        ("nCurValue", c_uint),
+        ("nMax", c_uint),
+        ("nMin", c_uint),
+        ("nInc", c_uint),
+        ("nReserved", c_uint * 4),
+    ]
+
+
+class MVCC_INTVALUE_EX(Structure):
+    _fields_ = [
+        ("nCurValue", c_int64),
+        ("nMax", c_int64),
+        ("nMin", c_int64),
+        ("nInc", c_int64),
+        ("nReserved", c_uint * 16),
+    ]
+
+
+class MVCC_FLOATVALUE(Structure):
+    _fields_ = [
+        ("fCurValue", c_float),
+        ("fMax", c_float),
+        ("fMin", c_float),
+        ("nReserved", c_uint * 4),
+    ]
+
+
+class MVCC_ENUMVALUE(Structure):
+    _fields_ = [
+        ("nCurValue", c_uint),
+        ("nSupportedNum", c_uint),
+        ("nSupportValue", c_uint * 64),
+        ("nReserved", c_uint * 4),
+    ]
+
+
+class MVCC_STRINGVALUE(Structure):
+    _fields_ = [
+        ("chCurValue", c_char * 256),
+        ("nMaxLength", c_int64),
+        ("nReserved", c_uint * 2),
+    ]
+
+
+class MV_GIGE_DEVICE_INFO(Structure):
+    _fields_ = [
+        ("nIpCfgOption", c_uint),
+        ("nIpCfgCurrent", c_uint),
+        ("nCurrentIp", c_uint),
+        ("nCurrentSubNetMask", c_uint),
+        ("nDefultGateWay", c_uint),
+        ("chManufacturerName", c_ubyte * 32),
+        ("chModelName", c_ubyte * 32),
+        ("chDeviceVersion", c_ubyte * 32),
+        ("chManufacturerSpecificInfo", c_ubyte * 48),
+        ("chSerialNumber", c_ubyte * 16),
+        ("chUserDefinedName", c_ubyte * 16),
+        ("nNetExport", c_uint),
+        ("nReserved", c_uint * 4),
+    ]
+
+
+class _SpecialInfo(ctypes.Union):
+    _fields_ = [("stGigEInfo", MV_GIGE_DEVICE_INFO)]
+
+
+class MV_CC_DEVICE_INFO(Structure):
+    _fields_ = [
+        ("nMajorVer", c_ushort),
+        ("nMinorVer", c_ushort),
+        ("nMacAddrHigh", c_uint),
+        ("nMacAddrLow", c_uint),
+        ("nTLayerType", c_uint),
+        ("nReserved", c_uint * 4),
+        ("SpecialInfo", _SpecialInfo),
+    ]
+
+
+class MV_CC_DEVICE_INFO_LIST(Structure):
+    _fields_ = [
+        ("nDeviceNum", c_uint),
+        ("pDeviceInfo", POINTER(MV_CC_DEVICE_INFO) * 256),
+    ]
+
+
+class MV_FRAME_OUT_INFO_EX(Structure):
+    _fields_ = [
+        ("nWidth", c_ushort),
+        ("nHeight", c_ushort),
+        ("enPixelType", c_int),
+        ("nFrameNum", c_uint),
+        ("nDevTimeStampHigh", c_uint),
+        ("nDevTimeStampLow", c_uint),
+        ("nReserved0", c_uint),
+        ("nHostTimeStamp", c_int64),
+        ("nFrameLen", c_uint),
+        ("nSecondCount", c_uint),
+        ("nCycleCount", c_uint),
+        ("nCycleOffset", c_uint),
+        ("fGain", c_float),
+        ("fExposureTime", c_float),
+        ("nAverageBrightness", c_uint),
+        ("nRed", c_uint),
+        ("nGreen", c_uint),
+        ("nBlue", c_uint),
+        ("nFrameCounter", c_uint),
+        ("nTriggerIndex", c_uint),
+        ("nInput", c_uint),
+        ("nOutput", c_uint),
+        ("nOffsetX", c_ushort),
+        ("nOffsetY", c_ushort),
+        ("nChunkWidth", c_ushort),
+        ("nChunkHeight", c_ushort),
+        ("nLostPacket", c_uint),
+        ("nUnparsedChunkNum", c_uint),
+        ("nReserved", c_uint * 36),
+    ]
+
+
+class MV_FRAME_OUT(Structure):
+    _fields_ = [
+        ("stFrameInfo", MV_FRAME_OUT_INFO_EX),
+        ("pBufAddr", POINTER(c_ubyte)),
+        ("nRes", c_uint * 16),
+    ]
+
+
+class MV_ACTION_CMD_INFO(Structure):
+    _fields_ = [
+        ("nDeviceKey", c_uint),
+        ("nGroupKey", c_uint),
+        ("nGroupMask", c_uint),
+        ("bActionTimeEnable", c_uint),
+        ("nActionTime", c_int64),
+        ("pBroadcastAddress", c_char_p),
+        ("nTimeOut", c_uint),
+        ("bSpecialNetEnable", c_uint),
+        ("nSpecialNetIP", c_uint),
+        ("nReserved", c_uint * 14),
+    ]
+
+
+class MV_ACTION_CMD_RESULT(Structure):
+    _fields_ = [
+        ("strDeviceAddress", c_ubyte * 16),
+        ("nStatus", c_int),
+        ("nReserved", c_uint * 4),
+    ]
+
+
+class MV_ACTION_CMD_RESULT_LIST(Structure):
+    _fields_ = [
+        ("nNumResults", c_uint),
+        ("pResults", POINTER(MV_ACTION_CMD_RESULT)),
+    ]
+
+
+if sys.platform.startswith("win"):
+    winfun_ctype = ctypes.WINFUNCTYPE
+else:
+    winfun_ctype = ctypes.CFUNCTYPE
+FrameInfoCallBack = winfun_ctype(
+    None, POINTER(c_ubyte), POINTER(MV_FRAME_OUT_INFO_EX), c_void_p
+)
+
+
+def _address(p):
+    if p is None:
+        return None
+    if isinstance(p, int):
+        return p
+    if hasattr(p, "_obj"):  # byref(...)
+        return ctypes.addressof(p._obj)
+    return ctypes.cast(p, c_void_p).value
+
+
+def _bits(pixel_type):
+    return (pixel_type >> 16) & 0xFF
+
+
+def pack_12bit(img):
+    """Pack uint16 pixels to the GigE Bayer12Packed layout used by `get_frame`."""
+    flat = img.reshape(-1, 2).astype(np.uint16)
+    p0, p1 = flat[:, 0], flat[:, 1]
+    out = np.empty((len(flat), 3), np.uint8)
+    out[:, 0] = p0 >> 4
+    out[:, 1] = ((p0 & 15) << 4) | (p1 & 15)
+    out[:, 2] = p1 >> 4
+    return out.reshape(-1)
+
+
+class FakeDevice:
+    """One simulated camera, shared by every handle that opens its IP."""
+
+    def __init__(self, ip, width=64, height=48, scene=1.0):
+        self.ip = ip
+        self.scene = scene
+        self.connected = True
+        # Nodes this model lacks (MV_E_SUPPORT), e.g. Gain of a camera without analog gain
+        self.unsupported = set()
+        self.lock = threading.Condition()
+        self.nodes = {
+            "Width": width,
+            "Height": height,
+            "PixelFormat": PIXEL_FORMATS["RGB8Packed"],
+            "ExposureTime": 10000.0,
+            "ExposureAuto": 0,
+            "Gain": 0.0,
+            "GainAuto": 0,
+            "TriggerMode": 0,
+            "TriggerSource": 7,
+            "AcquisitionFrameRateEnable": True,
+            "AcquisitionFrameRate": 30.0,
+            "GevSCPD": 0,
+            "GevSCPSPacketSize": 1500,
+            "GevLinkSpeed": 1000,
+            "GevTimestampTickFrequency": 1000000000,
+            "GevTimestampValue": 0,
+            "DeviceTemperature": 40.0,
+            "ActionDeviceKey": 0,
+            "ActionGroupKey": 0,
+            "ActionGroupMask": 0,
+            "ActionSelector": 0,
+            "DeviceUserID": b"",
+        }
+        # Device clock of each camera starts at a different time, like real ones
+        self.clock_offset_ns = random.randrange(1 << 40)
+        # Device timestamps of the triggers not yet turned into frames
+        self.triggers = deque()
+        self.defaults = dict(self.nodes)
+        self.frame_num = 0
+        self.write_count = 0
+        self.read_count = 0
+        # Seconds of one GVCP register round trip
+        self.register_latency = 0
+        # Seconds of the control channel handshake of MV_CC_OpenDevice
+        self.open_latency = 0
+        self.lost_packet_next = 0
+        # Injected faults, fixed by: retry (fail_frames), restart grabbing (stalled),
+        # reopen (MvCamera.broken), DeviceReset (hung)
+        self.fail_frames = 0
+        self.stalled = False
+        self.hung = False
+        # Seconds the device is unreachable after DeviceReset
+        self.reboot_s = 0
+
+    @property
+    def payload_size(self):
+        n = self.nodes
+        return n["Width"] * n["Height"] * _bits(n["PixelFormat"]) // 8
+
+    def brightness(self):
+        # 线性曝光模型, 1.0 表示满幅
+        gain = 10 ** (self.nodes["Gain"] / 20)
+        return self.scene * self.nodes["ExposureTime"] * gain / 40000.0
+
+    def render(self):
+        n = self.nodes
+        h, w, pixel_type = n["Height"], n["Width"], n["PixelFormat"]
+        ramp = np.linspace(0.25, 1.75, w)[None].repeat(h, 0) * self.brightness()
+        ramp = np.clip(ramp, 0, 1)
+        bits = _bits(pixel_type)
+        if bits == 24:
+            img = (ramp[..., None].repeat(3, -1) * 255).astype(np.uint8)
+            return img.reshape(-1)
+        if bits == 8:
+            return (ramp * 255).astype(np.uint8).reshape(-1)
+        if bits == 12:
+            return pack_12bit((ramp * 4095).astype(np.uint16))
+        if bits == 16:
+            if pixel_type in (0x02100032, 0x0210001F):
+                return np.full(h * w * 2, 128, np.uint8)
+            maxv = 4095 if pixel_type in (0x01100005, 0x01100011) else 65535
+            return (ramp * maxv).astype("<u2").view(np.uint8).reshape(-1)
+        raise NotImplementedError(hex(pixel_type))
+
+    def auto_exposure_step(self):
+        if self.nodes["ExposureAuto"] != 2:
+            return
+        # 模拟相机自带的慢速自动曝光, 每帧向目标亮度移动一小步
+        ratio = 0.5 / max(self.brightness(), 1e-6)
+        self.nodes["ExposureTime"] *= ratio**0.3
+
+    def clock(self):
+        return time.perf_counter_ns() + self.clock_offset_ns
+
+    def trigger(self):
+        with self.lock:
+            self.triggers.append(self.clock())
+            self.lock.notify_all()
+
+    def wait_frame(self, timeout_ms, free_run):
+        with self.lock:
+            if free_run:
+                dev_ts = self.clock()
+            else:
+                if not self.lock.wait_for(lambda: self.triggers, timeout_ms / 1000):
+                    return None
+                # Exposure starts when the trigger arrives, not when the frame is read
+                dev_ts = self.triggers.popleft()
+            data = self.render()
+            self.auto_exposure_step()
+            self.frame_num += 1
+            info = MV_FRAME_OUT_INFO_EX()
+            info.nWidth = self.nodes["Width"]
+            info.nHeight = self.nodes["Height"]
+            info.enPixelType = self.nodes["PixelFormat"]
+            info.nFrameNum = self.frame_num
+            info.nDevTimeStampHigh = dev_ts >> 32
+            info.nDevTimeStampLow = dev_ts & 0xFFFFFFFF
+            info.nHostTimeStamp = int(time.time() * 1000)
+            info.nFrameLen = len(data)
+            info.fExposureTime = self.nodes["ExposureTime"]
+            info.fGain = self.nodes["Gain"]
+            info.nLostPacket, self.lost_packet_next = self.lost_packet_next, 0
+            return data, info
+
+
+devices = {}
+
+
+def get_device(ip):
+    return devices.setdefault(ip, FakeDevice(ip))
+
+
+def _int_to_ip(i):
+    return ".".join(str((i >> s) & 0xFF) for s in (24, 16, 8, 0))
+
+
+class MvCamera:
+    def __init__(self):
+        self._handle = c_void_p()
+        self.handle = ctypes.pointer(self._handle)
+        self.device = None
+        self._opened = False
+        self._grabbing = False
+        self._callback = None
+        self._callback_thread = None
+        self._sdk_bufs = []
+        self.broken = False
+
+    @staticmethod
+    def MV_CC_GetSDKVersion():
+        return 0x03020201
+
+    @staticmethod
+    def MV_CC_EnumDevices(nTLayerType, stDevList):
+        stDevList.nDeviceNum = len(devices)
+        MvCamera._enum_infos = []
+        for i, ip in enumerate(sorted(devices)):
+            info = MV_CC_DEVICE_INFO()
+            info.nTLayerType = MV_GIGE_DEVICE
+            info.SpecialInfo.stGigEInfo.nCurrentIp = sum(
+                int(s) << sh for s, sh in zip(ip.split("."), [24, 16, 8, 0])
+            )
+            MvCamera._enum_infos.append(info)
+            stDevList.pDeviceInfo[i] = ctypes.pointer(info)
+        return MV_OK
+
+    @staticmethod
+    def MV_GIGE_IssueActionCommand(pstActionCmdInfo, pstActionCmdResults):
+        info = pstActionCmdInfo
+        hits = []
+        for ip, dev in sorted(devices.items()):
+            n = dev.nodes
+            if (
+                dev.connected
+                and n["TriggerMode"] == 1
+                and n["TriggerSource"] == ENUM_SYMBOLS["TriggerSource"]["Action1"]
+                and n["ActionDeviceKey"] == info.nDeviceKey
+                and n["ActionGroupKey"] == info.nGroupKey
+                and n["ActionGroupMask"] & info.nGroupMask
+            ):
+                dev.trigger()
+                hits.append(ip)
+        results = (MV_ACTION_CMD_RESULT * max(len(hits), 1))()
+        for i, ip in enumerate(hits):
+            raw = ip.encode()
+            ctypes.memmove(results[i].strDeviceAddress, raw, len(raw))
+            results[i].nStatus = MV_OK
+        MvCamera._action_results = results
+        pstActionCmdResults.nNumResults = len(hits)
+        pstActionCmdResults.pResults = ctypes.cast(results, POINTER(MV_ACTION_CMD_RESULT))
+        return MV_OK
+
+    def MV_CC_CreateHandle(self, stDevInfo):
+        ip = _int_to_ip(stDevInfo.SpecialInfo.stGigEInfo.nCurrentIp)
+        self.device = get_device(ip)
+        self.broken = False
+        return MV_OK
+
+    def MV_CC_DestroyHandle(self):
+        self.device = None
+        return MV_OK
+
+    def MV_CC_IsDeviceConnected(self):
+        return bool(self.device and self.device.connected and self._opened)
+
+    def MV_CC_OpenDevice(self, nAccessMode=MV_ACCESS_Exclusive, nSwitchoverKey=0):
+        if self.device is None or not self.device.connected:
+            return MV_E_HANDLE
+        if self.device.open_latency:
+            time.sleep(self.device.open_latency)
+        self._opened = True
+        return MV_OK
+
+    def MV_CC_CloseDevice(self):
+        self._opened = False
+        self._grabbing = False
+        return MV_OK
+
+    def _ok(self):
+        return self.device is not None and self.device.connected and self._opened
+
+    def _frame_fault(self):
+        device = self.device
+        if self.broken or device.stalled or device.hung:
+            return True
+        if device.fail_frames:
+            device.fail_frames -= 1
+            return True
+        return False
+
+    # Grabbing
+    def MV_CC_StartGrabbing(self):
+        if not self._ok():
+            return MV_E_HANDLE
+        self.device.stalled = False
+        self._grabbing = True
+        if self._callback is not None:
+            self._callback_thread = threading.Thread(
+                target=self._callback_loop, daemon=True
+            )
+            self._callback_thread.start()
+        return MV_OK
+
+    def MV_CC_StopGrabbing(self):
+        self._grabbing = False
+        if self._callback_thread is not None:
+            self.device.trigger()  # wake up
+            self._callback_thread.join()
+            self._callback_thread = None
+            self.device.triggers.clear()
+        return MV_OK
+
+    def MV_CC_RegisterImageCallBackEx(self, CallBackFun, pUser):
+        if self._grabbing:
+            return MV_E_SUPPORT
+        self._callback = (CallBackFun, pUser)
+        return MV_OK
+
+    def _free_run(self):
+        return self.device.nodes["TriggerMode"] == 0
+
+    def _callback_loop(self):
+        while self._grabbing:
+            got = self.device.wait_frame(50, self._free_run())
+            if got is None or not self._grabbing:
+                continue
+            data, info = got
+            buf = (c_ubyte * len(data)).from_buffer_copy(data.tobytes())
+            fun, pUser = self._callback
+            fun(ctypes.cast(buf, POINTER(c_ubyte)), ctypes.pointer(info), pUser)
+            if self._free_run():
+                time.sleep(0.001)
+
+    def MV_CC_GetOneFrameTimeout(self, pData, nDataSize, stFrameInfo, nMsec=1000):
+        if not self._ok() or not self._grabbing:
+            return MV_E_HANDLE
+        if self._callback is not None:
+            return MV_E_SUPPORT
+        if self._frame_fault():
+            return MV_E_NODATA
+        got = self.device.wait_frame(nMsec, self._free_run())
+        if got is None:
+            return MV_E_NODATA
+        data, info = got
+        if len(data) > nDataSize:
+            return MV_E_BUFOVER
+        ctypes.memmove(_address(pData), data.ctypes.data, len(data))
+        ctypes.memmove(ctypes.addressof(stFrameInfo), ctypes.addressof(info), ctypes.sizeof(info))
+        return MV_OK
+
+    def MV_CC_GetImageBuffer(self, stFrame, nMsec):
+        if not self._ok() or not self._grabbing:
+            return MV_E_HANDLE
+        if self._frame_fault():
+            return MV_E_NODATA
+        got = self.device.wait_frame(nMsec, self._free_run())
+        if got is None:
+            return MV_E_NODATA
+        data, info = got
+        buf = (c_ubyte * len(data)).from_buffer_copy(data.tobytes())
+        self._sdk_bufs.append(buf)
+        stFrame.stFrameInfo = info
+        stFrame.pBufAddr = ctypes.cast(buf, POINTER(c_ubyte))
+        return MV_OK
+
+    def MV_CC_FreeImageBuffer(self, stFrame):
+        addr = ctypes.cast(stFrame.pBufAddr, c_void_p).value
+        self._sdk_bufs = [b for b in self._sdk_bufs if ctypes.addressof(b) != addr]
+        return MV_OK
+
+    def MV_CC_ClearImageBuffer(self):
+        self.device.triggers.clear()
+        return MV_OK
+
+    def MV_CC_SetImageNodeNum(self, nNum):
+        self.image_node_num = nNum
+        return MV_OK
+
+    def MV_CC_SetGrabStrategy(self, enGrabStrategy):
+        self.grab_strategy = enGrabStrategy
+        return MV_OK
+
+    def MV_CC_SetOutputQueueSize(self, nOutputQueueSize):
+        self.output_queue_size = nOutputQueueSize
+        return MV_OK
+
+    def MV_CC_GetOptimalPacketSize(self):
+        return 8164
+
+    def MV_CC_FeatureSave(self, strFileName):
+        return MV_OK
+
+    def MV_CC_FeatureLoad(self, strFileName):
+        return MV_OK
+
+    # Nodes
+    def _get(self, key):
+        if not self._ok():
+            return MV_E_HANDLE, None
+        self.device.read_count += 1
+        if self.device.register_latency:
+            time.sleep(self.device.register_latency)
+        if key == "PayloadSize":
+            return MV_OK, self.device.payload_size
+        if key not in self.device.nodes or key in self.device.unsupported:
+            return MV_E_SUPPORT, None
+        return MV_OK, self.device.nodes[key]
+
+    def _set(self, key, value):
+        if not self._ok():
+            return MV_E_HANDLE
+        if key not in self.device.nodes or key in self.device.unsupported:
+            return MV_E_SUPPORT
+        if self.device.register_latency:
+            time.sleep(self.device.register_latency)
+        self.device.write_count += 1
+        self.device.nodes[key] = value
+        return MV_OK
+
+    def MV_CC_GetIntValue(self, strKey, stIntValue):
+        ret, value = self._get(strKey)
+        if not ret:
+            if isinstance(stIntValue, MVCC_INTVALUE):
+                stIntValue.nCurValue = int(value)
+            else:
+                stIntValue.value = int(value)
+        return ret
+
+    def MV_CC_GetIntValueEx(self, strKey, stIntValue):
+        ret, value = self._get(strKey)
+        if not ret:
+            stIntValue.nCurValue = int(value)
+        return ret
+
+    def MV_CC_SetIntValue(self, strKey, nValue):
+        return self._set(strKey, int(nValue))
+
+    def MV_CC_GetFloatValue(self, strKey, stFloatValue):
+        ret, value = self._get(strKey)
+        if not ret:
+            if isinstance(stFloatValue, MVCC_FLOATVALUE):
+                stFloatValue.fCurValue = float(value)
+            else:
+                stFloatValue.value = float(value)
+        return ret
+
+    def MV_CC_SetFloatValue(self, strKey, fValue):
+        if strKey == "ExposureTime" and self.device.nodes["ExposureAuto"] == 2:
+            return MV_E_SUPPORT  # 自动曝光时, ExposureTime 不可写
+        return self._set(strKey, float(fValue))
+
+    def MV_CC_GetEnumValue(self, strKey, stEnumValue):
+        ret, value = self._get(strKey)
+        if not ret:
+            if isinstance(stEnumValue, MVCC_ENUMVALUE):
+                stEnumValue.nCurValue = int(value)
+            else:
+                stEnumValue.value = int(value)
+        return ret
+
+    def MV_CC_SetEnumValue(self, strKey, nValue):
+        if strKey == "PixelFormat" and int(nValue) not in PIXEL_FORMATS.values():
+            return MV_E_PARAMETER
+        return self._set(strKey, int(nValue))
+
+    def MV_CC_SetEnumValueByString(self, strKey, sValue):
+        symbols = ENUM_SYMBOLS.get(strKey, {})
+        if sValue not in symbols:
+            return MV_E_PARAMETER
+        return self._set(strKey, symbols[sValue])
+
+    def MV_CC_GetBoolValue(self, strKey, BoolValue):
+        ret, value = self._get(strKey)
+        if not ret:
+            BoolValue.value = bool(value)
+        return ret
+
+    def MV_CC_SetBoolValue(self, strKey, bValue):
+        return self._set(strKey, bool(bValue))
+
+    def MV_CC_GetStringValue(self, strKey, StringValue):
+        ret, value = self._get(strKey)
+        if not ret:
+            if isinstance(StringValue, MVCC_STRINGVALUE):
+                StringValue.chCurValue = value
+            else:
+                StringValue.value = value
+        return ret
+
+    def MV_CC_SetStringValue(self, strKey, sValue):
+        return self._set(strKey, sValue if isinstance(sValue, bytes) else sValue.encode())
+
+    def MV_CC_SetCommandValue(self, strKey):
+        if not self._ok():
+            return MV_E_HANDLE
+        if strKey == "TriggerSoftware":
+            n = self.device.nodes
+            if n["TriggerMode"] != 1 or n["TriggerSource"] != 7:
+                return MV_E_SUPPORT
+            self.device.trigger()
+            return MV_OK
+        if strKey == "GevTimestampControlLatch":
+            self.device.nodes["GevTimestampValue"] = self.device.clock()
+            return MV_OK
+        if strKey == "DeviceReset":
+            device = self.device
+            device.nodes.update(device.defaults)
+            device.hung = device.stalled = False
+            if device.reboot_s:
+                device.connected = False
+                timer = threading.Timer(device.reboot_s, setattr, (device, "connected", True))
+                timer.daemon = True
+                timer.start()
+            self._opened = False
+            self._grabbing = False
+            return MV_OK
+        return MV_E_SUPPORT
+
+
+def install():
+    """Register this module as `MvCameraControl_class` in `sys.modules`."""
+    module = sys.modules[__name__]
+    sys.modules["MvCameraControl_class"] = module
+    return module
+
+
+def reset():
+    devices.clear()
+
+
+def get_host_ip(ip):
+    # The fake cameras are reached from the .1 of their subnet
+    return ip.rsplit(".", 1)[0] + ".1"
+
+
+def fixed_exposure(cam):
+    # Fake devices start in ExposureAuto Continuous, frames differ from grab to grab
+    cam.setitem("ExposureAuto", "Off")
+
+
+def new_camera(ip, cls=None, setting=None, scene=None, reset_devices=True, **config):
+    """
+    A HikCamera (or subclass `cls`) of a fake device, answering `_ping` while the device is connected.
+
+    Args:
+        setting (callable, optional): replaces cam.setting, called with the camera, e.g. fixed_exposure
+        scene (float, optional): brightness of the device's scene
+        reset_devices (bool): forget the fake devices of the previous tests first
+        **config: config of HikCamera
+    """
+    from hik_camera.hik_camera import HikCamera
+
+    if reset_devices:
+        reset()
+    if scene is not None:
+        get_device(ip).scene = scene
+    cam = (cls or HikCamera)(ip, host_ip=get_host_ip(ip), config=config or None)
+    # The fake cameras are not on the network
+    cam._ping = lambda: get_device(ip).connected
+    if setting is not None:
+        cam.setting = lambda: setting(cam)
+    return cam
+
+
+def new_cameras(ips, cls=None, setting=None, reset_devices=True, **config):
+    """
+    MultiHikCamera of new_camera(ip, ...) for each ip.
+    """
+    from hik_camera.hik_camera import MultiHikCamera
+
+    if reset_devices:
+        reset()
+    return MultiHikCamera(
+        {
+            ip: new_camera(ip, cls, setting, reset_devices=False, **config)
+            for ip in ips
+        }
+    )
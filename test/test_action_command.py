@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""
+Synchronized capture by action command, against the stand-in SDK in fake_mvs.py
+"""
+
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+ips = ["192.168.10.%d" % i for i in range(2, 6)]
+
+
+def get_cams():
+    return fake_mvs.new_cameras(ips)
+
+
+def test_sync_get_frame():
+    cams = get_cams()
+    with cams:
+        for _ in range(3):
+            imgs = cams.sync_get_frame()
+            info = cams.last_sync_info
+            assert list(imgs) == ips
+            assert info["acked"] == ips
+            assert set(info["skew"]) == set(ips) and min(info["skew"].values()) == 0
+            # 同一个广播包触发, 时钟偏移已被 sync_clock 校正
+            assert info["max_skew"] < 0.005, info
+        # Device clocks are offset by hours, sync_clock compensates them
+        offsets = cams.clock_offset
+        assert max(offsets.values()) - min(offsets.values()) > 1
+        # Software trigger still works after leaving action mode
+        cams.set_software_trigger()
+        assert list(cams.get_frame()) == ips
+
+
+def test_software_trigger_restored():
+    cams = get_cams()
+    with cams:
+        cams.sync_get_frame()
+        # get_frame triggers the cameras again, instead of waiting for an action command
+        assert cams.action_keys == {ip: None for ip in ips}
+        assert cams.getitem("TriggerSource") == {ip: 7 for ip in ips}
+        for cam in cams.values():
+            cam.TIMEOUT_MS = 500
+        begin = time.time()
+        assert list(cams.get_frame()) == ips
+        assert time.time() - begin < 0.5
+        offsets = cams.clock_offset
+        cams.sync_get_frame()
+        # The clock offsets are measured once
+        assert cams.clock_offset == offsets
+        # Kept in action mode when it was set by the caller
+        cams.set_action_trigger()
+        cams.sync_get_frame()
+        assert cams.action_keys == {ip: dict(device_key=1, group_key=1, group_mask=1) for ip in ips}
+
+
+def test_action_keys_mismatch():
+    cams = get_cams()
+    with cams:
+        cams.set_action_trigger(device_key=1)
+        cams[ips[0]].set_action_trigger(device_key=2)
+        # sync_get_frame reconfigures the cameras whose keys differ
+        imgs = cams.sync_get_frame(device_key=2)
+        assert cams.last_sync_info["acked"] == ips
+        assert len(imgs) == len(ips)
+        # and puts their keys back
+        assert [cam.action_keys["device_key"] for cam in cams.values()] == [2, 1, 1, 1]
+
+
+def benchmark(n=20):
+    """
+    Trigger skew of sync_get_frame against one TriggerSoftware per camera from worker threads.
+    """
+    cams = get_cams()
+    with cams:
+        cams.sync_clock()
+        skews = []
+        for _ in range(n):
+            res = cams._get_frame_and_timestamp()
+            timestamps = [timestamp for _, timestamp in res.values()]
+            skews.append(max(timestamps) - min(timestamps))
+        print("TriggerSoftware max skew: %.3fms" % (max(skews) * 1e3))
+        skews = []
+        begin = time.time()
+        for _ in range(n):
+            cams.sync_get_frame()
+            skews.append(cams.last_sync_info["max_skew"])
+        print(
+            "Action command max skew: %.3fms, %.1f fps"
+            % (max(skews) * 1e3, n / (time.time() - begin))
+        )
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
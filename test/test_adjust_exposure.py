@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera import hik_camera
+from hik_camera.hik_camera import HikCamera
+
+ip = "10.110.0.2"
+
+
+class AutoCamera(HikCamera):
+    adjust = True
+
+    def setting(self):
+        self.setitem("ExposureAuto", "Continuous")
+        if self.adjust:
+            self.result = self.adjust_auto_exposure(t=2, interval=0.005)
+
+
+def get_cam(cache_path, scene=3.0):
+    config = {} if cache_path is None else dict(exposure_cache=cache_path)
+    return fake_mvs.new_camera(ip, AutoCamera, scene=scene, **config)
+
+
+def test_stops_when_converged():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cam = get_cam(os.path.join(tmpdir, "exposure.json"))
+        with cam:
+            result = cam.result
+            assert result["converged"] and result["spend"] < 1
+            # Back to software trigger after adjusting
+            assert cam["TriggerMode"] == 1 and cam.get_frame().shape
+        device = fake_mvs.get_device(ip)
+        assert abs(device.brightness() - 0.5) < 0.05
+
+
+def test_seed_from_cache():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "exposure.json")
+        with get_cam(path) as cam:
+            cold = cam.result
+        with open(path) as f:
+            cache = json.load(f)
+        assert cache[ip]["ExposureTime"] == cold["ExposureTime"]
+        # Next start, the camera is back at its default exposure
+        cam = get_cam(path)
+        cam.adjust = False
+        with cam:
+            assert abs(cam["ExposureTime"] - cold["ExposureTime"]) < 1
+            # The auto mode set by setting() is kept
+            assert cam["ExposureAuto"] == 2
+            warm = cam.adjust_auto_exposure(interval=0.005)
+        assert warm["converged"] and warm["polls"] < cold["polls"]
+
+
+def test_no_cache():
+    calls = []
+    load_exposure_cache, save_exposure = hik_camera.load_exposure_cache, hik_camera.save_exposure
+    hik_camera.load_exposure_cache = lambda *args: calls.append("load") or {}
+    hik_camera.save_exposure = lambda *args: calls.append("save")
+    try:
+        # The cache is opt-in, by default nothing is read or written
+        for cache_path in [None, False]:
+            with get_cam(cache_path) as cam:
+                assert cam.result["converged"]
+    finally:
+        hik_camera.load_exposure_cache = load_exposure_cache
+        hik_camera.save_exposure = save_exposure
+    assert not calls
+
+
+def test_camera_without_gain():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "exposure.json")
+        cam = get_cam(path)
+        cam.adjust = False
+        fake_mvs.get_device(ip).unsupported.update(["Gain", "GainAuto"])
+        with cam:
+            assert not cam._has_node("Gain") and cam._has_node("ExposureTime")
+            result = cam.adjust_auto_exposure(interval=0.005)
+            assert result["converged"] and "Gain" not in result
+        with open(path) as f:
+            assert json.load(f)[ip] == dict(ExposureTime=result["ExposureTime"])
+        # Seeded without touching GainAuto
+        with cam:
+            assert abs(cam["ExposureTime"] - result["ExposureTime"]) < 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
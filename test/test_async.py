@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import asyncio
+import contextlib
+import threading
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.hik_camera import _lock_name_to_lock
+from hik_camera.transfer_scheduler import get_scheduler
+
+ip = "10.140.0.2"
+ips = ["10.140.0.2", "10.140.1.2"]
+
+
+def get_cam(**config):
+    return fake_mvs.new_camera(ip, setting=fake_mvs.fixed_exposure, **config)
+
+
+def test_aget_frame():
+    async def main(cam):
+        return [await cam.aget_frame() for _ in range(3)]
+
+    with get_cam() as cam:
+        imgs = asyncio.run(main(cam))
+        # Same frame as the blocking path, delivered by the image callback
+        assert cam._image_callback is not None and not cam._image_callback.waiters
+        assert (imgs[0] == cam.get_frame()).all()
+        stats = cam.get_frame_stats()
+    assert imgs[0].shape == (48, 64, 3) and imgs[0].dtype == np.uint8
+    assert stats["frames"] == 4 and stats["dropped"] == 0
+
+
+def test_aget_frame_cancel():
+    async def main(cam):
+        device = fake_mvs.get_device(ip)
+        trigger = device.trigger
+        # The trigger is lost on the way, no frame comes
+        device.trigger = lambda: None
+        task = asyncio.ensure_future(cam.aget_frame())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        assert not cam._image_callback.waiters
+        device.trigger = trigger
+        # A stale waiter would take this frame, and the next aget_frame would time out
+        frame = await cam.aget_frame()
+        return frame, device.frame_num
+
+    with get_cam(return_frame=True) as cam:
+        frame, frame_num = asyncio.run(main(cam))
+    assert frame.frame_num == frame_num
+
+
+def test_aget_frame_lock_name():
+    lock = _lock_name_to_lock.setdefault("test_async", threading.Lock())
+
+    async def main(cam):
+        lock.acquire()
+        task = asyncio.ensure_future(cam.aget_frame())
+        await asyncio.sleep(0.1)
+        # Waits for the other cameras of the lock_name
+        assert not task.done()
+        lock.release()
+        await task
+        # Cancelled while waiting for the lock, the lock is released anyway
+        lock.acquire()
+        task = asyncio.ensure_future(cam.aget_frame())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        lock.release()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        await cam.aget_frame()
+
+    with get_cam(lock_name="test_async") as cam:
+        asyncio.run(main(cam))
+        assert cam.get_metrics()["histograms"]["lock_wait"]["max"] >= 0.1
+    assert not lock.locked()
+
+
+def test_concurrent_aget_frame():
+    class CountingLock:
+        # Counts the executor threads blocked on the lock
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.waiting = 0
+
+        def __enter__(self):
+            self.waiting += 1
+            self.lock.acquire()
+            self.waiting -= 1
+
+        def __exit__(self, *l):
+            self.lock.release()
+
+    lock = _lock_name_to_lock.setdefault("test_async_concurrent", CountingLock())
+
+    async def main(cam):
+        lock.lock.acquire()
+        tasks = [asyncio.ensure_future(cam.aget_frame()) for _ in range(5)]
+        try:
+            await asyncio.sleep(0.1)
+            waiting = lock.waiting
+        finally:
+            lock.lock.release()
+        frames = await asyncio.gather(*tasks)
+        # The other calls waited in the event loop, not in executor threads
+        assert waiting == 1, waiting
+        return frames
+
+    with get_cam(lock_name="test_async_concurrent", return_frame=True) as cam:
+        frames = asyncio.run(main(cam))
+        # A new event loop gets its own asyncio.Lock
+        frames.append(asyncio.run(cam.aget_frame()))
+    nums = [frame.frame_num for frame in frames]
+    assert len(set(nums)) == 6 and lock.waiting == 0
+
+
+def test_aget_frame_transfer_scheduler():
+    with get_cam(transfer_scheduler=True, nic_mbps=1000) as cam:
+        scheduler = get_scheduler(cam.host_ip)
+        before = scheduler.get_stats()["per_camera"].get(ip, dict(n=0))["n"]
+        asyncio.run(cam.aget_frame())
+    stats = scheduler.get_stats()
+    assert stats["per_camera"][ip]["n"] == before + 1 and stats["active"] == 0
+
+
+def test_aget_frame_retrigger():
+    with get_cam(return_frame=True, retrigger_incomplete=2, buffer_pool=2) as cam:
+        fake_mvs.get_device(ip).lost_packet_next = 5
+        frame = asyncio.run(cam.aget_frame())
+        stats = cam.get_frame_stats()
+        assert frame.complete and frame.lost_packet == 0
+        # The incomplete frame went back to the pool
+        assert cam.buffer_pool.n_free == 1
+    assert stats["retriggered"] == 1 and stats["incomplete"] == 1 and stats["frames"] == 2
+
+
+def test_astream():
+    async def main(cam):
+        frames = []
+        async with contextlib.aclosing(cam.astream()) as stream:
+            async for frame in stream:
+                frames.append(frame)
+                if len(frames) == 5:
+                    break
+        return frames
+
+    with get_cam(return_frame=True) as cam:
+        frames = asyncio.run(main(cam))
+        # Back in software trigger mode
+        assert cam.getitem("TriggerMode") == 1
+        assert not cam._image_callback.subscribers
+        cam.get_frame()
+    nums = [frame.frame_num for frame in frames]
+    assert nums == sorted(nums) and len(set(nums)) == 5
+
+
+def test_multi_aget_frame():
+    with fake_mvs.new_cameras(ips, setting=fake_mvs.fixed_exposure) as cams:
+        imgs = asyncio.run(cams.aget_frame())
+    assert sorted(imgs) == ips
+
+
+def benchmark(n=100):
+    async def main(cam):
+        begin = time.perf_counter()
+        for _ in range(n):
+            await cam.aget_frame()
+        return time.perf_counter() - begin
+
+    with get_cam() as cam:
+        spend = asyncio.run(main(cam))
+        print(f"aget_frame: {spend / n * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.auto_exposure import get_roi_stats
+
+ip = "10.100.0.2"
+scenes = [0.02, 0.3, 1.0, 20.0]
+
+
+def get_cam(scene, pixel_format="RGB8Packed"):
+    return fake_mvs.new_camera(
+        ip, setting=lambda cam: cam.setitem("PixelFormat", pixel_format), scene=scene
+    )
+
+
+def frames_to_converge(cam, max_frames=20, **kwargs):
+    ae = cam.set_host_auto_exposure(**kwargs)
+    for i in range(1, max_frames + 1):
+        cam.get_frame()
+        if ae.converged:
+            return i
+    return None
+
+
+def test_roi_stats():
+    img = np.zeros((40, 40, 3), np.uint8)
+    img[:, 20:] = 255
+    assert get_roi_stats(img)["mean"] == 0.5
+    assert get_roi_stats(img, roi=(0, 0, 0.5, 1))["mean"] == 0
+    stats = get_roi_stats(img, roi=(0.5, 0, 1, 1))
+    assert stats["mean"] == 1 and stats["saturated"] == 1 and stats["hist"][-1] == 1
+    # Bayer: every sample averages a 2x2 quad, whatever the step
+    bayer = np.tile(np.array([[4095, 0], [0, 0]], np.uint16), (20, 20))
+    for step in [1, 2, 3, 4]:
+        assert get_roi_stats(bayer, step=step, max_value=4095, bayer=True)["mean"] == 0.25
+
+
+def test_converges_in_3_frames():
+    for pixel_format in ["RGB8Packed", "BayerRG12Packed"]:
+        for scene in scenes:
+            cam = get_cam(scene, pixel_format)
+            with cam:
+                n = frames_to_converge(cam)
+                assert n is not None and n <= 3, (pixel_format, scene, n)
+                mean = cam.auto_exposure.last_stats["mean"]
+                assert abs(mean - 0.45) < 0.45 * 0.08
+                if scene == 0.02:
+                    # ExposureTime maxed out, the rest from Gain
+                    assert cam["ExposureTime"] == 100000 and cam["Gain"] > 0
+                n = frames_to_converge(cam)
+                assert n == 1, "already converged"
+
+
+def test_roi():
+    # The fake scene is a horizontal ramp, the left quarter is darker than average
+    cam = get_cam(1.0)
+    with cam:
+        frames_to_converge(cam, roi=(0, 0, 0.25, 1))
+        left = cam["ExposureTime"]
+        frames_to_converge(cam)
+        assert left > cam["ExposureTime"] * 1.5
+
+
+def benchmark():
+    """
+    Frames until the brightness is within 8% of 0.45: camera ExposureAuto=Continuous against host-side AE.
+    """
+    for scene in scenes:
+        cam = get_cam(scene)
+        with cam:
+            cam.setitem("ExposureAuto", "Continuous")
+            camera_n = None
+            for i in range(1, 101):
+                img = cam.get_frame()
+                if abs(img.mean() / 255 - 0.45) < 0.45 * 0.08:
+                    camera_n = i
+                    break
+            cam.setitem("ExposureAuto", "Off")
+            cam.setitem("ExposureTime", 10000.0)
+            host_n = frames_to_converge(cam)
+        print(f"scene={scene:5}: camera AE {camera_n} frames, host AE {host_n} frames")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.bandwidth_planner import plan_nic
+
+
+def get_infos(n, payload=1280 * 1024, link_mbps=1000, packet_size=8164):
+    return {
+        f"192.168.1.{i + 2}": dict(
+            payload=payload, link_mbps=link_mbps, packet_size=packet_size
+        )
+        for i in range(n)
+    }
+
+
+def test_single_camera_needs_no_delay():
+    plan = plan_nic(get_infos(1), 10000)
+    assert plan["cams"]["192.168.1.2"]["scpd"] == 0
+
+
+def test_aggregate_burst_fits_nic():
+    for n, nic_mbps in [(6, 1000), (3, 1000), (6, 10000)]:
+        plan = plan_nic(get_infos(n), nic_mbps)
+        wire_bits = (8164 + 38) * 8
+        total_bps = 0
+        for cam in plan["cams"].values():
+            period_s = wire_bits / 1e9 + cam["scpd"] / 1e9
+            total_bps += wire_bits / period_s
+        assert total_bps <= nic_mbps * 1e6 * 0.9 * 1.001, (n, nic_mbps)
+    # 6 cameras of 1GigE on 10GbE don't need any delay
+    assert all(cam["scpd"] == 0 for cam in plan["cams"].values())
+
+
+def test_worst_latency():
+    # All at once: 6 frames through 0.9 Gbps
+    plan = plan_nic(get_infos(6), 1000)
+    assert 60 < plan["worst_latency_ms"] < 80
+    # 2 at once: 3 rounds of faster transfers, about the same total
+    plan2 = plan_nic(get_infos(6), 1000, concurrent=2)
+    assert plan2["cams"]["192.168.1.2"]["scpd"] < plan["cams"]["192.168.1.2"]["scpd"]
+    assert abs(plan2["worst_latency_ms"] - plan["worst_latency_ms"]) < 5
+
+
+def test_plan_bandwidth_applies_scpd():
+    ips = ["192.168.30.%d" % i for i in range(2, 8)]
+    cams = fake_mvs.new_cameras(ips)
+    with cams:
+        plans = cams.plan_bandwidth(nic_mbps=1000)
+        assert list(plans) == ["192.168.30.1"]
+        assert {ip: cams[ip]["GevSCPSPacketSize"] for ip in ips} == {ip: 8164 for ip in ips}
+        scpds = {ip: cams[ip]["GevSCPD"] for ip in ips}
+        assert scpds == {
+            ip: cam["scpd"] for ip, cam in plans["192.168.30.1"]["cams"].items()
+        }
+        assert min(scpds.values()) > 0
+
+
+def test_high_speed_lock_is_kept():
+    from hik_camera.hik_camera import _HikCamera
+
+    cam = fake_mvs.new_camera("192.168.30.2")
+    # Public name of older versions, still a lock shared by every camera
+    assert cam.high_speed_lock is _HikCamera.high_speed_lock
+    with cam.high_speed_lock:
+        # Packet size detection locks per NIC and does not wait for it
+        with cam:
+            cam.set_OptimalPacketSize()
+            assert cam["GevSCPSPacketSize"] == 8164
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera import hik_camera
+from hik_camera.hik_camera import HikCamera, get_host_ip_by_target_ip
+
+
+def get_ips(n, subnet="10.60.0"):
+    return ["%s.%d" % (subnet, i) for i in range(2, n + 2)]
+
+
+def set_latency(ips, open_latency=0.02, register_latency=0.001):
+    for ip in ips:
+        device = fake_mvs.get_device(ip)
+        device.open_latency = open_latency
+        device.register_latency = register_latency
+
+
+def test_route_cache():
+    hik_camera._target_ip_to_host_ip.clear()
+    hik_camera._subnet_to_host_ip.clear()
+    host_ip = get_host_ip_by_target_ip("10.61.0.2")
+    assert hik_camera._target_ip_to_host_ip == {"10.61.0.2": host_ip}
+    hik_camera._target_ip_to_host_ip["10.61.0.2"] = "10.61.0.1"
+    assert get_host_ip_by_target_ip("10.61.0.2") == "10.61.0.1"
+    assert get_host_ip_by_target_ip("10.61.0.2", cache=False) == host_ip
+    # Another camera of the subnet may be routed through another NIC, looked up again
+    hik_camera._subnet_to_host_ip["10.61.0"] = "10.61.0.1"
+    assert get_host_ip_by_target_ip("10.61.0.3") == host_ip
+    # Unless the subnet cache is asked for
+    hik_camera._subnet_to_host_ip["10.61.0"] = "10.61.0.1"
+    assert get_host_ip_by_target_ip("10.61.0.4", per_subnet=True) == "10.61.0.1"
+
+
+def test_bounded_bringup():
+    fake_mvs.reset()
+    ips = get_ips(6)
+    set_latency(ips)
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+
+    class CountingCamera(HikCamera):
+        def _open(self):
+            with lock:
+                active.append(self.ip)
+                peak[0] = max(peak[0], len(active))
+            try:
+                super()._open()
+            finally:
+                with lock:
+                    active.remove(self.ip)
+
+    cams = CountingCamera.get_cams(ips, max_workers=2, host_ip="10.60.0.1")
+    assert list(cams) == ips
+    with cams:
+        assert all(cam.is_open for cam in cams.values())
+        assert peak[0] == 2
+        info = cams.get_bringup_info()
+    assert set(info["phases"]) == {"route", "create_handle", "open", "configure", "start"}
+    assert sorted(info["per_camera"]) == ips
+    assert info["phases"]["open"]["max"] >= 0.02
+    # 3 rounds of 2 cameras
+    assert info["total"] >= 3 * 0.02
+
+
+def test_parallel_bringup_is_about_one_camera():
+    fake_mvs.reset()
+    ips = get_ips(16)
+    set_latency(ips)
+    one = HikCamera(ips[0], host_ip="10.60.0.1")
+    with one:
+        pass
+    single = sum(one.bringup_timing.values())
+    cams = HikCamera.get_cams(ips, host_ip="10.60.0.1")
+    begin = time.perf_counter()
+    with cams:
+        pass
+    assert time.perf_counter() - begin < single * 4
+
+
+def benchmark(n=16):
+    """
+    Bring-up of n cameras, serial against parallel, with simulated GigE latency.
+    """
+    fake_mvs.reset()
+    ips = get_ips(n)
+    set_latency(ips)
+    begin = time.perf_counter()
+    serial = {ip: HikCamera(ip, host_ip="10.60.0.1") for ip in ips}
+    for cam in serial.values():
+        cam.__enter__()
+    print(f"serial {n} cameras: {(time.perf_counter() - begin) * 1e3:.1f}ms")
+    [cam.__exit__() for cam in serial.values()]
+    begin = time.perf_counter()
+    cams = HikCamera.get_cams(ips, host_ip="10.60.0.1")
+    with cams:
+        print(f"parallel {n} cameras: {(time.perf_counter() - begin) * 1e3:.1f}ms")
+        for phase, stat in cams.get_bringup_info()["phases"].items():
+            print(f"    {phase:14}mean {stat['mean'] * 1e3:6.2f}ms  max {stat['max'] * 1e3:6.2f}ms")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
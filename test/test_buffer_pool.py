@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.buffer_pool import FrameBufferPool, aligned_empty
+
+ip = "10.140.0.2"
+
+
+def get_cam(pixel_format=None, **config):
+    def setting(cam):
+        fake_mvs.fixed_exposure(cam)
+        if pixel_format is not None:
+            cam.setitem("PixelFormat", pixel_format)
+
+    return fake_mvs.new_camera(ip, setting=setting, **config)
+
+
+def addr(arr):
+    return arr.__array_interface__["data"][0]
+
+
+def test_aligned_empty():
+    for shape, dtype in [(100, np.uint8), ((3, 5, 7), np.uint16)]:
+        arr = aligned_empty(shape, dtype)
+        assert addr(arr) % 4096 == 0 and arr.flags.c_contiguous
+    arr = aligned_empty((3, 5, 7), np.uint16, align=64)
+    assert arr.shape == (3, 5, 7) and arr.dtype == np.uint16 and addr(arr) % 64 == 0
+
+
+def test_pool_release():
+    pool = FrameBufferPool(1000, n=2)
+    slot = pool.acquire()
+    view = pool.buffer(slot)[10:20]
+    assert pool.n_free == 1 and pool.slot_of(view) == slot
+    assert not pool.release(np.empty(10, np.uint8))
+    assert pool.release(view) and pool.n_free == 2
+    # Released twice, still one slot
+    pool.release_slot(slot)
+    assert pool.n_free == 2
+
+
+def test_pool_reuse():
+    with get_cam(buffer_pool=2) as cam:
+        addrs = []
+        for _ in range(6):
+            img = cam.get_frame()
+            addrs.append(addr(img))
+            cam.release_frame(img)
+        assert cam.buffer_pool.n_free == 2
+    # The frames cycle through the 2 slots, nothing is allocated per frame
+    assert len(set(addrs)) == 2 and addrs[:2] == addrs[2:4] == addrs[4:]
+
+
+def test_pool_decode_out_is_reused():
+    # 12bit packed is unpacked into a uint16 output owned by the slot
+    with get_cam("BayerRG12Packed", buffer_pool=1) as cam:
+        img = cam.get_frame()
+        first = addr(img)
+        cam.release_frame(img)
+        img = cam.get_frame()
+        assert img.dtype == np.uint16 and addr(img) == first
+        assert cam.buffer_pool.slot_of(img) == 0
+
+
+def test_pool_exhausted():
+    with get_cam(buffer_pool=2) as cam:
+        cam.TIMEOUT_MS = 100
+        imgs = [cam.get_frame(), cam.get_frame()]
+        begin = time.time()
+        try:
+            cam.get_frame()
+            raise AssertionError("Should time out waiting for a free buffer")
+        except TimeoutError:
+            assert time.time() - begin >= 0.09
+        # A failed get_frame keeps nothing, and a released frame frees a buffer
+        assert cam.buffer_pool.n_free == 0
+        cam.release_frame(imgs[0])
+        img = cam.get_frame()
+        assert addr(img) == addr(imgs[0])
+        # Frames not from the pool are ignored
+        cam.release_frame(np.empty(3))
+        assert cam.buffer_pool.n_free == 0
+
+
+def test_out_direct():
+    with get_cam() as cam:
+        out = np.empty((48, 64, 3), np.uint8)
+        img = cam.get_frame(out=out)
+        expected = cam.get_frame()
+        # The SDK wrote into out, the frame is a view on it
+        assert np.shares_memory(img, out) and (out == expected).all()
+
+
+def test_out_copy():
+    with get_cam("BayerRG12Packed") as cam:
+        out = np.empty((48, 64), np.uint16)
+        img = cam.get_frame(out=out)
+        assert img is out and (out == cam.get_frame()).all()
+    with get_cam() as cam:
+        # Not C-contiguous, the frame is copied into out
+        out = np.empty((48, 64, 6), np.uint8)[..., :3]
+        assert cam.get_frame(out=out) is out and (out == cam.get_frame()).all()
+
+
+def test_out_shape_and_dtype_are_checked():
+    with get_cam() as cam:
+        for out in [
+            np.empty((48, 64), np.uint8),
+            np.empty((48, 64, 3), np.float32),
+            # Broadcastable into the frame
+            np.empty((64, 3), np.uint8),
+        ]:
+            try:
+                cam.get_frame(out=out)
+                raise ValueError(f"{out.shape} {out.dtype} should be rejected")
+            except AssertionError as e:
+                assert "(48, 64, 3) uint8" in str(e)
+        # The camera still works
+        assert cam.get_frame().shape == (48, 64, 3)
+
+
+def benchmark(n=100):
+    for config in [{}, dict(buffer_pool=3)]:
+        with get_cam(**config) as cam:
+            begin = time.perf_counter()
+            for _ in range(n):
+                cam.release_frame(cam.get_frame())
+            spend = (time.perf_counter() - begin) / n
+            print(f"get_frame {config}: {spend * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
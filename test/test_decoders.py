@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+import test_base
+
+from hik_camera.decoders import (
+    get_decoder,
+    name_to_pixel_type,
+    pixel_type_to_decoder,
+    unpack_12bit_packed,
+)
+
+
+def random_buf(decoder, h, w, extra=0):
+    nbytes = h * w * ((decoder.pixel_type >> 16) & 0xFF) // 8
+    return np.random.randint(0, 256, nbytes + extra, np.uint8)
+
+
+def pack_12bit(img):
+    pairs = img.reshape(-1, 2).astype(np.uint16)
+    packed = np.empty((len(pairs), 3), np.uint8)
+    packed[:, 0] = pairs[:, 0] >> 4
+    packed[:, 1] = ((pairs[:, 0] & 15) << 4) | (pairs[:, 1] & 15)
+    packed[:, 2] = pairs[:, 1] >> 4
+    return packed.reshape(-1)
+
+
+def pack_12bit_lsb(img):
+    pairs = img.reshape(-1, 2).astype(np.uint16)
+    packed = np.empty((len(pairs), 3), np.uint8)
+    packed[:, 0] = pairs[:, 0] & 255
+    packed[:, 1] = ((pairs[:, 1] & 15) << 4) | (pairs[:, 0] >> 8)
+    packed[:, 2] = pairs[:, 1] >> 4
+    return packed.reshape(-1)
+
+
+def legacy_unpack_12bit(buf, h, w):
+    # The 12bit branch of get_frame before the unpack kernel
+    arr = np.array(buf).copy().astype(np.uint16)
+    arr2 = arr[1::3]
+    arrl = (arr[::3] << 4) + ((arr2 & ~np.uint16(15)) >> 4)
+    arrr = (arr[2::3] << 4) + (arr2 & np.uint16(15))
+    return np.concatenate([arrl[..., None], arrr[..., None]], 1).reshape(h, w)
+
+
+def pack_10bit(img):
+    pairs = img.reshape(-1, 2).astype(np.uint16)
+    packed = np.empty((len(pairs), 3), np.uint8)
+    packed[:, 0] = pairs[:, 0] >> 2
+    packed[:, 1] = ((pairs[:, 0] & 3) << 4) | (pairs[:, 1] & 3)
+    packed[:, 2] = pairs[:, 1] >> 2
+    return packed.reshape(-1)
+
+
+def test_all_decoders_shape_and_out():
+    h, w = 6, 8
+    for pixel_type, decoder in pixel_type_to_decoder.items():
+        # Extra bytes emulate chunk data after the image
+        buf = random_buf(decoder, h, w, extra=7)
+        img = decoder(buf, h, w)
+        assert img.shape == decoder.get_shape(h, w), decoder.name
+        assert img.dtype == decoder.dtype, decoder.name
+        assert np.may_share_memory(img, buf) == decoder.view, decoder.name
+        out = np.empty(decoder.get_shape(h, w), decoder.dtype)
+        assert decoder(buf, h, w, out) is out
+        assert (out == img).all(), decoder.name
+
+
+def test_12bit_packed():
+    h, w = 4, 6
+    img = np.random.randint(0, 4096, (h, w)).astype(np.uint16)
+    decoder = get_decoder(name_to_pixel_type["BayerRG12Packed"])
+    assert (decoder(pack_12bit(img), h, w) == img).all()
+
+
+def test_unpack_12bit_layouts_and_threads():
+    h, w = 37, 20
+    img = np.random.randint(0, 4096, (h, w)).astype(np.uint16)
+    gige, lsb = pack_12bit(img), pack_12bit_lsb(img)
+    assert (legacy_unpack_12bit(gige, h, w) == img).all()
+    for threads in [1, 3, 8]:
+        out = np.zeros((h, w), np.uint16)
+        assert unpack_12bit_packed(gige, h, w, out, threads=threads) is out
+        assert (out == img).all()
+        out = unpack_12bit_packed(lsb, h, w, layout="lsb", threads=threads)
+        assert (out == img).all()
+    decoder = get_decoder(name_to_pixel_type["BayerRG12p"])
+    assert (decoder(lsb, h, w) == img).all()
+
+
+def test_10bit_packed():
+    h, w = 4, 6
+    img = np.random.randint(0, 1024, (h, w)).astype(np.uint16)
+    decoder = get_decoder(name_to_pixel_type["BayerGB10Packed"])
+    assert decoder.bit == 10
+    assert (decoder(pack_10bit(img), h, w) == img).all()
+
+
+def test_16bit_is_little_endian_view():
+    img = np.random.randint(0, 4096, (4, 6)).astype("<u2")
+    decoder = get_decoder(name_to_pixel_type["Mono12"])
+    assert decoder.bit == 12
+    assert (decoder(img.view(np.uint8).reshape(-1), 4, 6) == img).all()
+
+
+def test_bgr8_and_gray_yuv():
+    h, w = 2, 4
+    rgb = np.random.randint(0, 256, (h, w, 3), np.uint8)
+    bgr8 = get_decoder(name_to_pixel_type["BGR8Packed"])
+    assert (bgr8(rgb[..., ::-1].copy().reshape(-1), h, w) == rgb).all()
+    # U = V = 128 means gray, R = G = B = Y
+    yuyv = np.full((h, w // 2, 4), 128, np.uint8)
+    yuyv[..., 0], yuyv[..., 2] = 10, 200
+    img = get_decoder(name_to_pixel_type["YUV422_8"])(yuyv.reshape(-1), h, w)
+    assert (img[:, ::2] == 10).all() and (img[:, 1::2] == 200).all()
+
+
+def test_unknown_pixel_type():
+    try:
+        get_decoder(0x0123)
+    except NotImplementedError:
+        return
+    raise AssertionError("should raise NotImplementedError")
+
+
+def benchmark(h=3036, w=4024, repeat=5):
+    """
+    Decode time of every registered pixel type on synthetic 12MP buffers.
+    """
+    print(f"Decode {h}x{w}, best of {repeat}:")
+    print("%-18s %12s %12s" % ("pixel_format", "new array", "out="))
+    for pixel_type, decoder in pixel_type_to_decoder.items():
+        buf = random_buf(decoder, h, w)
+        out = np.empty(decoder.get_shape(h, w), decoder.dtype)
+        spends = []
+        for kwargs in [{}, dict(out=out)]:
+            best = float("inf")
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                if decoder.view and not kwargs:
+                    # What get_frame does without buffer pool: copy out of data_buf
+                    img = decoder(buf, h, w, np.empty(out.shape, out.dtype))
+                else:
+                    img = decoder(buf, h, w, **kwargs)
+                best = min(best, time.perf_counter() - begin)
+            spends.append(best)
+        print("%-18s %10.2fms %10.2fms" % (decoder.name, *[t * 1e3 for t in spends]))
+
+
+def benchmark_unpack_12bit(h=3036, w=4024, repeat=10):
+    """
+    Throughput of the unpack kernel against the 12bit branch of get_frame before it.
+    """
+    img = np.random.randint(0, 4096, (h, w)).astype(np.uint16)
+    buf = pack_12bit(img)
+    out = np.empty((h, w), np.uint16)
+    cases = {
+        "legacy get_frame": lambda: legacy_unpack_12bit(buf, h, w),
+        "kernel threads=1": lambda: unpack_12bit_packed(buf, h, w, out, threads=1),
+        "kernel": lambda: unpack_12bit_packed(buf, h, w, out),
+        "kernel lsb": lambda: unpack_12bit_packed(buf, h, w, out, layout="lsb"),
+    }
+    print(f"Unpack Bayer12Packed {h}x{w}, best of {repeat}:")
+    for name, func in cases.items():
+        best = float("inf")
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - begin)
+        print("%-18s %8.2fms %8.1f MPix/s" % (name, best * 1e3, h * w / best / 1e6))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
+    benchmark_unpack_12bit()
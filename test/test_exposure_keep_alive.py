@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.exposure_keep_alive import get_keep_alive_group
+from hik_camera.hik_camera import HikCamera
+
+
+class KeepAliveCamera(HikCamera):
+    interval = 0.1
+
+    def setting(self):
+        self.continuous_adjust_exposure(type(self).interval)
+
+
+def get_cams(subnet, n, **config):
+    get_keep_alive_group(subnet + ".1").min_gap = 0
+    ips = ["%s.%d" % (subnet, i) for i in range(2, n + 2)]
+    return fake_mvs.new_cameras(ips, KeepAliveCamera, reset_devices=False, **config)
+
+
+def test_keep_alive_frames():
+    fake_mvs.reset()
+    cams = get_cams("10.90.0", 3)
+    with cams:
+        time.sleep(0.55)
+        frames = {ip: fake_mvs.get_device(ip).frame_num for ip in cams}
+    # One keep-alive frame per interval, none before the first interval
+    assert all(4 <= n <= 6 for n in frames.values()), frames
+
+
+def test_closed_cameras_are_dropped():
+    fake_mvs.reset()
+    cams = get_cams("10.95.0", 2)
+    group = get_keep_alive_group("10.95.0.1")
+    closed, kept = cams.values()
+    with cams:
+        thread = group.thread
+        assert thread.is_alive()
+        closed.__exit__()
+        n = fake_mvs.get_device(closed.ip).frame_num
+        time.sleep(0.35)
+        # No keep-alive frame of the closed camera, the other one goes on
+        assert fake_mvs.get_device(closed.ip).frame_num == n
+        assert fake_mvs.get_device(kept.ip).frame_num >= 2
+        assert list(group.cams) == [kept.ip]
+        closed.__enter__()
+    # The worker ends with the last camera
+    thread.join(1)
+    assert not thread.is_alive() and group.thread is None and group.cams == {}
+
+
+def test_production_frames_postpone_keep_alive():
+    fake_mvs.reset()
+    cams = get_cams("10.91.0", 2)
+    busy, idle = cams.values()
+    with cams:
+        for _ in range(12):
+            busy.get_frame()
+            time.sleep(0.04)
+    assert fake_mvs.get_device(busy.ip).frame_num == 12
+    assert fake_mvs.get_device(idle.ip).frame_num >= 3
+
+
+def test_group_per_lock_name_or_nic():
+    fake_mvs.reset()
+    cams_a = get_cams("10.92.0", 1)
+    cams_b = get_cams("10.93.0", 1, lock_name="shared")
+    with cams_a, cams_b:
+        (cam_a,), (cam_b,) = cams_a.values(), cams_b.values()
+        assert cam_a._keep_alive is get_keep_alive_group("10.92.0.1")
+        assert cam_b._keep_alive is get_keep_alive_group("lock_name=shared")
+
+
+def test_touch_races_remove():
+    fake_mvs.reset()
+    cams = get_cams("10.96.0", 2)
+    group = get_keep_alive_group("10.96.0.1")
+    cam, other = cams.values()
+    with cams:
+        stop = threading.Event()
+        errors = []
+
+        def touch():
+            while not stop.is_set():
+                try:
+                    group.touch(cam)
+                    group.touch(other)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=touch) for _ in range(4)]
+        [t.start() for t in threads]
+        for _ in range(50):
+            group.remove(cam)
+            group.add(cam, cam.interval)
+        group.remove(cam)
+        stop.set()
+        [t.join() for t in threads]
+        # A touch after remove does not leave a due time behind
+        assert not errors and set(group.due) == set(group.cams) == {other.ip}
+        group.add(cam, cam.interval)
+
+
+def benchmark(n=32, seconds=1.0):
+    """
+    Keep-alive of n cameras of one NIC, interval 0.2s: frames taken and lateness.
+    """
+    fake_mvs.reset()
+    KeepAliveCamera.interval = 0.2
+    cams = get_cams("10.94.0", n)
+    with cams:
+        time.sleep(seconds)
+        frames = sum(fake_mvs.get_device(ip).frame_num for ip in cams)
+        now = time.time()
+        late = max(now - cam.last_time_get_frame - cam.interval for cam in cams.values())
+    print(f"{n} cameras, {seconds}s: {frames} keep-alive frames, worst lateness {max(late, 0) * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
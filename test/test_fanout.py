@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.hik_camera import HikCamera
+
+ips = ["10.140.0.2", "10.140.0.3", "10.140.1.2", "10.140.1.3"]
+
+
+class SlowCamera(HikCamera):
+    # Seconds of each get_frame, to see whether the cameras run in parallel
+    delay = 0.1
+    fail_exit = False
+
+    def get_frame(self, out=None, timeout_ms=None):
+        self.threads.append(threading.current_thread().name)
+        time.sleep(self.delay)
+        return super().get_frame(out, timeout_ms)
+
+    def __exit__(self, *l):
+        super().__exit__(*l)
+        if self.fail_exit:
+            raise RuntimeError(f"__exit__ of {self.ip}")
+
+
+def get_cams():
+    cams = fake_mvs.new_cameras(ips, SlowCamera, setting=fake_mvs.fixed_exposure)
+    for cam in cams.values():
+        cam.threads = []
+    return cams
+
+
+def get_worker_threads(cams):
+    return [worker.thread for worker in cams.__dict__.get("_workers", {}).values()]
+
+
+def test_parallel_get_frame():
+    with get_cams() as cams:
+        begin = time.perf_counter()
+        imgs = cams.get_frame()
+        spend = time.perf_counter() - begin
+        cams.get_frame()
+        assert list(imgs) == sorted(ips)
+        assert all(img.shape == (48, 64, 3) for img in imgs.values())
+        # 4 cameras of 0.1s each, side by side
+        assert spend < SlowCamera.delay * 2.5, spend
+        for ip, cam in cams.items():
+            # Each camera always runs on its own worker
+            assert cam.threads == [f"HikCamera-{ip}"] * 2
+        stats = cams.get_fanout_stats()
+    assert stats["n"] == 2 and 0 <= stats["mean"] <= stats["max"] < SlowCamera.delay
+
+
+def test_attributes_are_gathered():
+    cams = get_cams()
+    assert cams.ip == {ip: ip for ip in ips}
+
+
+def test_exception_propagates():
+    with get_cams() as cams:
+        bad_ip = ips[2]
+        fake_mvs.get_device(bad_ip).fail_frames = 1
+        try:
+            cams.get_frame()
+            raise ValueError("Should raise the error of " + bad_ip)
+        except AssertionError as e:
+            # The SDK return code assert of the failed camera
+            assert bad_ip in str(e)
+        # The workers survive the error
+        imgs = cams.get_frame()
+        assert sorted(imgs) == ips
+        for cam in cams.values():
+            assert cam.threads == [f"HikCamera-{cam.ip}"] * 2
+
+
+def test_workers_stop_on_exit():
+    cams = get_cams()
+    with cams:
+        cams.get_frame()
+        threads = get_worker_threads(cams)
+        assert len(threads) == len(ips) and all(t.is_alive() for t in threads)
+    assert not get_worker_threads(cams)
+    assert not any(t.is_alive() for t in threads)
+    assert not any(cam.is_open for cam in cams.values())
+
+
+def test_workers_stop_when_exit_fails():
+    cams = get_cams()
+    cams[ips[1]].fail_exit = True
+    try:
+        with cams:
+            threads = get_worker_threads(cams)
+        raise ValueError("Should raise the __exit__ error")
+    except RuntimeError as e:
+        assert ips[1] in str(e)
+    assert not get_worker_threads(cams)
+    assert not any(t.is_alive() for t in threads)
+    # The other cameras are closed anyway
+    assert not any(cam.is_open for ip, cam in cams.items() if ip != ips[1])
+
+
+def benchmark(n=200):
+    cams = get_cams()
+    for cam in cams.values():
+        cam.delay = 0
+    with cams:
+        for _ in range(n):
+            cams.get_frame()
+        stats = cams.get_fanout_stats()
+    print(
+        f"fan-out overhead of {len(ips)} cameras: mean {stats['mean'] * 1e6:.0f}us, "
+        f"p99 {stats['p99'] * 1e6:.0f}us"
+    )
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
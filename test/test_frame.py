@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.frame import Frame
+
+ip = "10.140.0.2"
+
+
+def get_cam(**config):
+    return fake_mvs.new_camera(ip, setting=fake_mvs.fixed_exposure, **config)
+
+
+def test_ndarray_by_default():
+    with get_cam() as cam:
+        assert type(cam.get_frame()) is np.ndarray
+
+
+def test_return_frame():
+    with get_cam(return_frame=True) as cam:
+        before = time.time()
+        frame = cam.get_frame()
+        second = cam.get_frame()
+    assert isinstance(frame, Frame)
+    assert frame.ip == ip and frame.complete and frame.lost_packet == 0
+    assert frame.shape == (48, 64, 3) and np.asarray(frame) is frame.img
+    assert frame.frame_len == frame.img.nbytes
+    assert second.frame_num == frame.frame_num + 1
+    assert second.dev_timestamp > frame.dev_timestamp
+    assert before <= frame.host_timestamp <= second.host_timestamp and frame.age >= 0
+    assert not hasattr(frame, "__dict__")
+
+
+def test_dropped_and_lost_packet_accounting():
+    with get_cam(return_frame=True) as cam:
+        device = fake_mvs.get_device(ip)
+        cam.get_frame()
+        # 2 frames lost on the way
+        device.frame_num += 2
+        cam.get_frame()
+        device.lost_packet_next = 3
+        frame = cam.get_frame()
+        assert not frame.complete and frame.lost_packet == 3
+        stats = cam.get_frame_stats()
+    assert stats == dict(frames=3, dropped=2, lost_packets=3, incomplete=1, retriggered=0)
+
+
+def test_retrigger_incomplete():
+    with get_cam(return_frame=True, retrigger_incomplete=2) as cam:
+        fake_mvs.get_device(ip).lost_packet_next = 5
+        frame = cam.get_frame()
+        stats = cam.get_frame_stats()
+    assert frame.complete and frame.lost_packet == 0
+    assert stats["retriggered"] == 1 and stats["incomplete"] == 1 and stats["frames"] == 2
+
+
+def test_stream_frames():
+    with get_cam(return_frame=True) as cam:
+        frames = []
+        for frame in cam.stream():
+            frames.append(frame)
+            if len(frames) == 3:
+                break
+    assert all(isinstance(frame, Frame) for frame in frames)
+    assert [f.frame_num for f in frames] == sorted(f.frame_num for f in frames)
+
+
+def benchmark(n=100000):
+    """
+    Size and creation time of a Frame.
+    """
+    info = fake_mvs.MV_FRAME_OUT_INFO_EX()
+    img = np.zeros((2, 2), np.uint8)
+    begin = time.time()
+    for _ in range(n):
+        frame = Frame(img, ip, info, 0.0, True)
+    print(f"Frame(): {(time.time() - begin) / n * 1e6:.2f}us, {sys.getsizeof(frame)} bytes")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
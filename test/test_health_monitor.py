@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.health_monitor import CameraUnhealthyError, get_health_monitor
+
+ips = ["10.80.0.2", "10.80.0.3"]
+
+
+def wait_state(cam, state, timeout=2):
+    begin = time.time()
+    while cam.get_health()["state"] != state:
+        assert time.time() - begin < timeout, (cam.ip, cam.get_health())
+        time.sleep(0.005)
+    return time.time() - begin
+
+
+def get_cams():
+    return fake_mvs.new_cameras(ips, health_monitor=dict(interval=0.02, failures=2))
+
+
+def test_fail_fast_and_reconnect():
+    cams = get_cams()
+    changes = []
+
+    def on_change(cam, old, new):
+        changes.append((cam.ip, new))
+
+    get_health_monitor().subscribe(on_change)
+    with cams:
+        assert all(h["state"] == "healthy" for h in cams.get_health().values())
+        cam = cams[ips[0]]
+        device = fake_mvs.get_device(ips[0])
+        device.connected = False
+        # Noticed in about interval * failures
+        assert wait_state(cam, "unhealthy") < 0.5
+        begin = time.time()
+        try:
+            cam.robust_get_frame()
+        except CameraUnhealthyError:
+            pass
+        else:
+            raise AssertionError("should fail fast")
+        assert time.time() - begin < 0.05
+        # The other camera is not affected
+        assert cams[ips[1]].get_frame().shape
+        device.connected = True
+        wait_state(cam, "healthy")
+        assert cam.get_health()["reconnects"] == 1
+        assert cam.get_frame().shape
+    assert (ips[0], "unhealthy") in changes and changes[-1] == (ips[0], "healthy")
+    assert get_health_monitor().get_states() == {}
+    get_health_monitor().subscribers.remove(on_change)
+
+
+def test_reopen_is_monitored():
+    cam = fake_mvs.new_camera(ips[0], health_monitor=dict(interval=0.02))
+    monitor = get_health_monitor()
+    for _ in range(2):
+        with cam:
+            # Closed and opened again before the stopping thread exits
+            old_thread = monitor._thread
+            monitor.unregister(cam)
+            monitor.register(cam)
+            begin = time.time()
+            while cam.get_health()["last_check"] is None:
+                assert time.time() - begin < 1, "the reopened camera is not checked"
+                time.sleep(0.005)
+            assert monitor._thread.is_alive() and monitor._thread is not old_thread
+        old_thread.join(1)
+        assert not old_thread.is_alive()
+    assert monitor._thread is None
+
+
+def test_no_monitor_by_default():
+    cam = fake_mvs.new_camera(ips[0])
+    with cam:
+        assert cam.get_health() is None
+        assert ips[0] not in get_health_monitor().cams
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
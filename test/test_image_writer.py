@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.image_writer import (
+    AsyncImageWriter,
+    encode_npy,
+    get_encoder,
+    get_image_writer,
+    register_encoder,
+)
+
+
+@register_encoder([".slow"])
+def encode_slow(img, delay=0.05):
+    # Stands for a 12 MP PNG/DNG encode
+    time.sleep(delay)
+    return encode_npy(img)
+
+
+def frames(n, shape=(8, 12)):
+    return [np.full(shape, i, np.uint8) for i in range(n)]
+
+
+def test_submit_and_stats():
+    dirr = tempfile.mkdtemp()
+    with AsyncImageWriter(workers=2) as writer:
+        futures = [
+            writer.submit(img, os.path.join(dirr, f"{i}.npy"))
+            for i, img in enumerate(frames(5))
+        ]
+        paths = [future.result(5) for future in futures]
+    for i, path in enumerate(paths):
+        assert (np.load(path) == i).all()
+    stats = writer.get_stats()
+    assert stats["submitted"] == stats["written"] == 5
+    assert stats["queue_depth"] == 0 and stats["failed"] == 0
+    assert stats["last_encode_s"] is not None and stats["mean_write_s"] >= 0
+    assert not [name for name in os.listdir(dirr) if name.endswith(".tmp")]
+
+
+def test_backpressure_block():
+    dirr = tempfile.mkdtemp()
+    writer = AsyncImageWriter(workers=1, max_queue=1, backpressure="block")
+    begin = time.time()
+    futures = [
+        writer.submit(img, os.path.join(dirr, f"{i}.slow"))
+        for i, img in enumerate(frames(4))
+    ]
+    # The 4th submit waits for the 2nd frame to be taken from the queue
+    assert time.time() - begin >= 0.05
+    writer.close()
+    assert all(future.done() and not future.cancelled() for future in futures)
+    stats = writer.get_stats()
+    assert stats["written"] == 4 and stats["blocked_s"] > 0 and stats["max_queue_depth"] == 1
+
+
+def test_backpressure_drop():
+    dirr = tempfile.mkdtemp()
+    released = []
+    writer = AsyncImageWriter(workers=1, max_queue=1, backpressure="drop")
+    begin = time.time()
+    futures = [
+        writer.submit(img, os.path.join(dirr, f"{i}.slow"), release=released.append)
+        for i, img in enumerate(frames(6))
+    ]
+    assert time.time() - begin < 0.05
+    writer.close()
+    cancelled = [future.cancelled() for future in futures]
+    assert any(cancelled) and not all(cancelled)
+    stats = writer.get_stats()
+    assert stats["dropped"] == sum(cancelled) and stats["written"] == 6 - sum(cancelled)
+    # Every frame is released once, written or dropped
+    assert len(released) == 6
+
+
+def test_backpressure_spill():
+    dirr = tempfile.mkdtemp()
+    spill_dir = tempfile.mkdtemp()
+    writer = AsyncImageWriter(
+        workers=1, max_queue=1, backpressure="spill", spill_dir=spill_dir
+    )
+    begin = time.time()
+    futures = [
+        writer.submit(img, os.path.join(dirr, f"{i}.slow"))
+        for i, img in enumerate(frames(6))
+    ]
+    assert time.time() - begin < 0.05
+    assert writer.flush(5)
+    for i, future in enumerate(futures):
+        assert (np.load(future.result()) == i).all()
+    stats = writer.get_stats()
+    assert stats["spilled"] > 0 and stats["written"] == 6 and stats["spilled_pending"] == 0
+    assert os.listdir(spill_dir) == []
+    writer.close()
+
+
+def test_encode_error():
+    dirr = tempfile.mkdtemp()
+    with AsyncImageWriter() as writer:
+        future = writer.submit(frames(1)[0], os.path.join(dirr, "a.slow"), delay="x")
+        assert isinstance(future.exception(5), TypeError)
+    assert writer.get_stats()["failed"] == 1
+
+
+def test_same_path():
+    # Like the default /tmp/{ip}.jpg of save_async, every frame goes to one path
+    path = os.path.join(tempfile.mkdtemp(), "frame.slow")
+    imgs = frames(16, (256, 256))
+    with AsyncImageWriter(workers=4, max_queue=16) as writer:
+        futures = [writer.submit(img, path, delay=0.02) for img in imgs]
+        for future in futures:
+            assert future.result(5) == path
+            img = np.load(path)
+            assert img.shape == (256, 256) and (img == img[0, 0]).all()
+    assert writer.get_stats()["failed"] == 0
+    # Temporary files are all renamed
+    assert os.listdir(os.path.dirname(path)) == ["frame.slow"]
+
+
+def test_get_image_writer():
+    writer = get_image_writer(workers=1)
+    assert get_image_writer() is writer and get_image_writer(workers=1) is writer
+    try:
+        get_image_writer(workers=3)
+        raise AssertionError("Other kwargs should be rejected")
+    except ValueError:
+        pass
+    writer.close()
+    assert get_image_writer(workers=3).workers == 3
+
+
+def test_jpeg_png():
+    try:
+        import cv2
+    except ImportError:
+        print("test_jpeg_png: skipped, no cv2")
+        return
+    dirr = tempfile.mkdtemp()
+    rgb = np.zeros((16, 16, 3), np.uint8)
+    rgb[..., 0] = 255
+    with AsyncImageWriter() as writer:
+        png = writer.submit(rgb, os.path.join(dirr, "a.png")).result(5)
+        jpg = writer.submit(rgb, os.path.join(dirr, "a.jpg"), quality=90).result(5)
+    assert (cv2.imread(png)[..., ::-1] == rgb).all()
+    assert cv2.imread(jpg)[..., 2].min() > 240
+
+
+def test_cam_save_async():
+    path = os.path.join(tempfile.mkdtemp(), "frame.npy")
+    cam = fake_mvs.new_camera("10.120.0.2")
+    with cam:
+        img = cam.get_frame()
+        future = cam.save_async(img, path)
+    assert (np.load(future.result(5)) == img).all()
+
+
+def benchmark(shape=(3036, 4024, 3), n=4):
+    """
+    Time the acquisition thread spends per saved 12 MP frame: synchronous encode against submit.
+    """
+    try:
+        import cv2
+
+        ext = ".png"
+    except ImportError:
+        ext = ".npy"
+    dirr = tempfile.mkdtemp()
+    img = np.random.randint(0, 256, shape, np.uint8)
+    begin = time.time()
+    for i in range(n):
+        # What HikCamera.save does on the acquisition thread
+        with open(os.path.join(dirr, f"s{i}{ext}"), "wb") as f:
+            f.write(get_encoder(f.name).encode(img))
+    sync = (time.time() - begin) / n
+    writer = AsyncImageWriter(workers=2, max_queue=n)
+    begin = time.time()
+    futures = [writer.submit(img, os.path.join(dirr, f"a{i}{ext}")) for i in range(n)]
+    submit = (time.time() - begin) / n
+    [future.result() for future in futures]
+    print(f"{ext} sync save: {sync * 1e3:.1f}ms per frame, async submit: {submit * 1e3:.2f}ms per frame")
+    print(writer.get_stats())
+    writer.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
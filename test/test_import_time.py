@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Import cost of hik_camera: heavy dependencies must load on first use, not on import.
+Run as a script to print the import-time benchmark.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import test_base
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+heavy_modules = ["boxx", "pandas", "MvCameraControl_class", "asyncio"]
+
+
+def loaded_after(code):
+    check = (
+        f"import sys; sys.path.insert(0, {root!r}); {code}; "
+        f"print(' '.join(m for m in {heavy_modules!r} if m in sys.modules))"
+    )
+    out = subprocess.check_output([sys.executable, "-c", check], cwd=root)
+    return out.decode().split()
+
+
+def test_import_is_light():
+    assert loaded_after("import hik_camera") == []
+    assert loaded_after("import hik_camera.decoders") == []
+    assert loaded_after("import hik_camera.hik_camera") == []
+
+
+def test_sdk_loads_with_hik_camera_class():
+    code = (
+        f"sys.path.insert(0, {os.path.join(root, 'test')!r}); "
+        "import fake_mvs; fake_mvs.install(); "
+        "from hik_camera import hik_camera; "
+        "assert not hik_camera.hik.is_loaded; "
+        "from hik_camera import HikCamera; "
+        "assert hik_camera.hik.is_loaded and HikCamera is hik_camera.HikCamera"
+    )
+    # Only the SDK, boxx and pandas still load on first use
+    assert loaded_after(code) == ["MvCameraControl_class"]
+
+
+def test_subclass_of_sdk_mvcamera():
+    code = (
+        f"sys.path.insert(0, {os.path.join(root, 'test')!r}); "
+        "import fake_mvs; fake_mvs.install(); "
+        "from hik_camera.hik_camera import HikCamera, hik; "
+        "created = []\n"
+        "class Cam(HikCamera):\n"
+        "    def MV_CC_CreateHandle(self, info):\n"
+        "        created.append(self.ip)\n"
+        "        return super().MV_CC_CreateHandle(info)\n"
+        "cam = Cam('10.40.0.2', host_ip='10.40.0.1')\n"
+        "assert isinstance(cam, hik.MvCamera) and cam.handle is not None\n"
+        "from hik_camera.hik_camera import _HikCamera\n"
+        "assert HikCamera.__bases__ == (_HikCamera, hik.MvCamera)\n"
+        "assert created == ['10.40.0.2']\n"
+        "cam.__enter__(); assert cam.get_frame().shape; cam.__exit__()"
+    )
+    assert "MvCameraControl_class" in loaded_after(code)
+
+
+def test_nodes_py_matches_csv():
+    from hik_camera import _nodes
+    # HikCamera without the SDK
+    from hik_camera.hik_camera import _HikCamera, gen_nodes_py, get_node_table
+
+    assert _HikCamera.node_table == get_node_table(_HikCamera.setting_df)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = gen_nodes_py(os.path.join(tmpdir, "_nodes.py"))
+        with open(path) as f, open(_nodes.__file__) as f2:
+            assert f.read() == f2.read(), "Run gen_nodes_py() after editing the CSV"
+
+
+def benchmark(repeat=5):
+    """
+    Wall time of fresh interpreters running each import, best of `repeat`, minus a bare interpreter.
+    """
+    stmts = [
+        "pass",
+        "import numpy",
+        "import hik_camera",
+        "import hik_camera.decoders",
+        "import hik_camera.hik_camera",
+        "import boxx",
+    ]
+    results = {}
+    for stmt in stmts:
+        best = float("inf")
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            subprocess.check_call(
+                [sys.executable, "-c", f"import sys; sys.path.insert(0, {root!r}); {stmt}"],
+                cwd=root,
+            )
+            best = min(best, time.perf_counter() - begin)
+        results[stmt] = best
+    for stmt, spend in results.items():
+        print("%-36s %8.1fms" % (stmt, (spend - results["pass"]) * 1e3))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
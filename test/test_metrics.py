@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import gc
+import os
+import tempfile
+import time
+import urllib.request
+import weakref
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera import metrics
+from hik_camera.metrics import Histogram, Metrics
+
+ip = "10.140.0.2"
+
+
+def get_cam(**config):
+    cam = fake_mvs.new_camera(ip, **config)
+    cam.metrics.reset()
+    return cam
+
+
+def test_histogram_quantile():
+    histogram = Histogram()
+    assert histogram.get_stats()["p50"] is None
+    for i in range(1, 1001):
+        histogram.observe(i / 1000)
+    stats = histogram.get_stats()
+    assert stats["count"] == 1000 and stats["max"] == 1
+    assert abs(stats["mean"] - 0.5005) < 1e-9
+    # Bucket bounds are a factor of sqrt(2) apart
+    assert 0.5 / 1.42 < stats["p50"] < 0.5 * 1.42
+    assert 0.99 / 1.42 < stats["p99"] <= 1
+
+
+def test_camera_metrics():
+    with get_cam() as cam:
+        for _ in range(3):
+            cam.get_frame()
+        snapshot = cam.get_metrics()
+    histograms = snapshot["histograms"]
+    for name in ["camera_lock_wait", "trigger", "sdk_wait", "lock_wait", "grab", "decode"]:
+        assert histograms[name]["count"] == 3, name
+    assert histograms["get_frame"]["count"] == 3
+    assert histograms["grab"]["p50"] <= histograms["get_frame"]["max"]
+    assert snapshot["counters"]["frames"] == 3
+    assert snapshot["gauges"]["healthy"]
+
+
+def test_prometheus():
+    with get_cam() as cam:
+        cam.get_frame()
+    text = metrics.to_prometheus()
+    assert "# TYPE hik_camera_sdk_wait_seconds histogram" in text
+    assert f'hik_camera_sdk_wait_seconds_count{{ip="{ip}"}} 1' in text
+    assert f'hik_camera_sdk_wait_seconds_bucket{{ip="{ip}",le="+Inf"}} 1' in text
+    assert f'hik_camera_frames_total{{ip="{ip}"}} 1.0' in text
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = metrics.write_prometheus(os.path.join(tmpdir, "hik_camera.prom"))
+        with open(path) as f:
+            assert "hik_camera_frames_total" in f.read()
+    server = metrics.serve_prometheus(0)
+    try:
+        url = "http://127.0.0.1:%d/metrics" % server.server_address[1]
+        with urllib.request.urlopen(url) as response:
+            assert "hik_camera_decode_seconds_bucket" in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_reset_observation():
+    cam = get_cam()
+    # The fake cameras do not go down on DeviceReset
+    cam.RESET_DOWN_TIMEOUT = 0
+    with cam:
+        cam.reset()
+        reset = cam.get_metrics()["histograms"]["reset"]
+    assert reset["count"] == 1 and 0 <= reset["p50"] <= reset["max"] < 5
+    assert cam.get_metrics()["counters"]["resets"] == 1
+
+
+def test_camera_is_not_kept_alive():
+    cam = get_cam()
+    with cam:
+        cam.get_frame()
+    ref = weakref.ref(cam)
+    del cam
+    gc.collect()
+    assert ref() is None
+    # The histograms outlive the camera, its collector is skipped
+    snapshot = metrics.snapshot()[ip]
+    assert snapshot["histograms"]["get_frame"]["count"] == 1
+    assert "frames" not in snapshot["counters"]
+
+
+def test_metrics_disabled():
+    with get_cam(metrics=False) as cam:
+        cam.get_frame()
+        assert cam.get_metrics()["histograms"] == {}
+    assert ip not in metrics.snapshot()
+    # Enabled again for the other tests
+    get_cam()
+
+
+def benchmark(n=100000):
+    """
+    Cost of an observation, to compare with a frame time.
+    """
+    m = Metrics("benchmark")
+    begin = time.perf_counter()
+    for _ in range(n):
+        m.observe("sdk_wait", 0.01)
+    print(f"Metrics.observe: {(time.perf_counter() - begin) / n * 1e6:.2f}us")
+    with get_cam() as cam:
+        begin = time.perf_counter()
+        for _ in range(100):
+            cam.get_frame()
+        print(f"get_frame with metrics: {(time.perf_counter() - begin) * 10:.2f}ms")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.hik_camera import get_node_table, get_setting_df
+
+
+def get_cam():
+    return fake_mvs.new_camera("10.30.0.2")
+
+
+def test_node_table():
+    df = get_setting_df()
+    node_table = get_node_table(df)
+    assert set(node_table) == set(df.key)
+    for key, node in node_table.items():
+        assert node["dtype"] == df[df.key == key]["dtype"].iloc[0], key
+    assert node_table["ActionGroupKey"]["depend"] == "ActionSelector"
+
+
+def test_getitem_setitem():
+    with get_cam() as cam:
+        cam["ExposureAuto"] = "Off"
+        cam["ExposureTime"] = 2500.5
+        assert cam["ExposureTime"] == 2500.5
+        cam["Width"] = 32
+        assert cam["Width"] == 32 and isinstance(cam["Width"], int)
+        assert cam["TriggerMode"] == 1
+        cam["DeviceUserID"] = "left"
+        assert cam["DeviceUserID"] == b"left"
+        # 64 bit integers are not truncated
+        cam["GevTimestampControlLatch"] = None
+        assert cam["GevTimestampValue"] > 2**32
+        try:
+            cam["NotANode"]
+        except KeyError:
+            pass
+        else:
+            raise AssertionError("should raise KeyError")
+
+
+def test_get_items_set_items():
+    with get_cam() as cam:
+        cam.set_items(dict(ExposureAuto="Off", ExposureTime=1000.0, Gain=2.0))
+        items = cam.get_items(["ExposureTime", "Gain", "ExposureAuto"])
+        assert items == dict(ExposureTime=1000.0, Gain=2.0, ExposureAuto=0)
+
+
+def benchmark(n=2000):
+    """
+    Per-call latency of getitem/setitem, against the pandas lookup they used to do per call.
+    The SDK round trip is simulated, so this is the Python overhead only.
+    """
+    with get_cam() as cam:
+        df = cam.setting_df
+        cases = {
+            "pandas dtype lookup": lambda: df[df.key == "ExposureTime"]["dtype"].iloc[0],
+            'cam["ExposureTime"]': lambda: cam["ExposureTime"],
+            'cam["Gain"] = 0.0': lambda: cam.setitem("Gain", 0.0),
+            "get_items(3 keys)": lambda: cam.get_items(["ExposureTime", "Gain", "Width"]),
+        }
+        for name, func in cases.items():
+            func()
+            begin = time.perf_counter()
+            for _ in range(n):
+                func()
+            print("%-22s %8.2fus" % (name, (time.perf_counter() - begin) / n * 1e6))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
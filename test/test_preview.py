@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.decoders import get_decoder, name_to_pixel_type, pixel_type_to_decoder
+from hik_camera.hik_camera import HikCamera
+from hik_camera.preview import decode_preview
+from hik_camera.raw_pipeline import get_lut, get_raw_converter
+
+
+def random_buf(decoder, h, w):
+    nbytes = h * w * ((decoder.pixel_type >> 16) & 0xFF) // 8
+    if decoder.view and decoder.dtype == np.uint16:
+        # Valid samples of the 10/12bit containers
+        return np.random.randint(0, 1 << decoder.bit, h * w, np.uint16).view(np.uint8)
+    return np.random.randint(0, 256, nbytes, np.uint8)
+
+
+def reference_preview(decoder, buf, h, w, scale, poww):
+    # Full decode, then a 2x2 superpixel of every sampled quad
+    img = decoder(buf, h, w)
+    if not decoder.name.startswith("Bayer"):
+        img = img[::scale, ::scale]
+        # 8bit frames are developed by the camera, shown as they are
+        return get_lut(decoder.bit, poww)[img] if img.dtype != np.uint8 else img
+    step = scale + scale % 2
+    pattern = dict(GB="GBRG", GR="GRBG", RG="RGGB", BG="BGGR")[decoder.name[5:7]]
+    planes = {}
+    for i, c in enumerate(pattern):
+        plane = img[i // 2 :: step, i % 2 :: step][: h // step, : w // step]
+        planes.setdefault(c, []).append(plane.astype(np.uint32))
+    green = (planes["G"][0] + planes["G"][1] + 1) >> 1
+    raw = np.stack([planes["R"][0], green, planes["B"][0]], -1)
+    return get_lut(decoder.bit, poww)[raw]
+
+
+def test_matches_full_decode():
+    h, w = 24, 40
+    for decoder in pixel_type_to_decoder.values():
+        buf = random_buf(decoder, h, w)
+        for scale in (1, 2, 3, 4):
+            for poww in (1, 0.5):
+                preview = decode_preview(buf, h, w, decoder, scale, poww)
+                expected = reference_preview(decoder, buf, h, w, scale, poww)
+                assert preview.dtype == np.uint8, decoder.name
+                assert (preview == expected).all(), (decoder.name, scale, poww)
+
+
+def test_bayer_preview_shape():
+    decoder = get_decoder(name_to_pixel_type["BayerRG12Packed"])
+    buf = random_buf(decoder, 48, 64)
+    assert decode_preview(buf, 48, 64, decoder, scale=4).shape == (12, 16, 3)
+    # Odd scales of Bayer are rounded up to even
+    assert decode_preview(buf, 48, 64, decoder, scale=3).shape == (12, 16, 3)
+
+
+def test_rgb8_preview_is_unchanged():
+    with fake_mvs.new_camera("10.120.0.2", setting=fake_mvs.fixed_exposure) as cam:
+        for scale in (1, 3, 4):
+            preview = cam.get_preview(scale=scale, poww=0.5)
+            frame = cam.get_frame()
+            assert (preview == frame[::scale, ::scale]).all(), scale
+
+
+def test_cam_get_preview():
+    cam = fake_mvs.new_camera("10.120.0.2", setting=HikCamera.set_raw)
+    with cam:
+        preview = cam.get_preview(scale=4)
+        raw = cam.get_frame()
+    assert preview.shape == (raw.shape[0] // 4, raw.shape[1] // 4, 3)
+    assert preview.dtype == np.uint8
+    # The flat-colored ramp of fake_mvs gets brighter to the right
+    assert preview[..., 1].mean(0)[-1] > preview[..., 1].mean(0)[0]
+
+    cam = fake_mvs.new_camera("10.120.0.2", setting=fake_mvs.fixed_exposure)
+    with cam:
+        rgb = cam.get_frame()
+        preview = cam.get_preview(scale=3, poww=1)
+    assert (preview == rgb[::3, ::3]).all()
+
+
+def benchmark(shape=(3036, 4024), scale=4, repeat=5):
+    """
+    12 MP BayerRG12Packed live view: full decode + demosaic + [::scale, ::scale] against decode_preview.
+    """
+    h, w = shape
+    decoder = get_decoder(name_to_pixel_type["BayerRG12Packed"])
+    buf = random_buf(decoder, h, w)
+    convert = get_raw_converter(12, 0.5, "RGGB", "fast")
+    raw = np.empty(shape, np.uint16)
+    rgb = np.empty(shape + (3,), np.uint8)
+    methods = {
+        "full decode + fast demosaic": lambda: convert(decoder(buf, h, w, raw), rgb)[
+            ::scale, ::scale
+        ],
+        "decode_preview": lambda: decode_preview(buf, h, w, decoder, scale, 0.5),
+    }
+    for name, func in methods.items():
+        func()
+        begin = time.time()
+        for _ in range(repeat):
+            func()
+        print(f"{name}: {(time.time() - begin) / repeat * 1e3:.1f}ms per frame")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
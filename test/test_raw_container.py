@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.decoders import get_decoder, name_to_pixel_type
+from hik_camera.hik_camera import HikCamera
+from hik_camera.raw_container import HEADER_SIZE, FRAME_INFO, RawReader, RawWriter
+
+
+def test_write_and_read():
+    path = os.path.join(tempfile.mkdtemp(), "a.hikraw")
+    pixel_type = name_to_pixel_type["BayerRG12Packed"]
+    h, w = 6, 8
+    bufs = [np.random.randint(0, 256, h * w * 3 // 2 + 16, np.uint8) for _ in range(3)]
+    with RawWriter(path, pixel_type, h, w, "RGGB", ip="10.0.0.1") as writer:
+        for i, buf in enumerate(bufs):
+            assert writer.write(buf, dict(frame_num=i, dev_timestamp=1 << 40 | i)) == i
+    # Header + fixed size records of the wire bytes, 1.5 bytes per pixel
+    assert os.path.getsize(path) == HEADER_SIZE + 3 * (FRAME_INFO.itemsize + h * w * 3 // 2)
+    reader = RawReader(path)
+    assert len(reader) == 3 and reader.header["ip"] == "10.0.0.1"
+    assert reader.pattern == "RGGB" and reader.bit == 12
+    decoder = get_decoder(pixel_type)
+    for i, buf in enumerate(bufs):
+        assert (reader[i] == decoder(buf, h, w)).all()
+        assert (reader.get_raw(i) == buf[: h * w * 3 // 2]).all()
+    assert reader.get_info(2)["dev_timestamp"] == 1 << 40 | 2
+    assert list(reader.infos["frame_num"]) == [0, 1, 2]
+    assert len(reader[1:]) == 2 and (reader[-1] == reader[2]).all()
+
+
+def test_truncated_record():
+    path = os.path.join(tempfile.mkdtemp(), "a.hikraw")
+    pixel_type = name_to_pixel_type["BayerRG8"]
+    with RawWriter(path, pixel_type, 4, 4) as writer:
+        writer.write(np.arange(16, dtype=np.uint8))
+        writer.write(np.arange(16, dtype=np.uint8))
+    with open(path, "r+b") as f:
+        # A crash in the middle of the 2nd frame
+        f.truncate(os.path.getsize(path) - 5)
+    reader = RawReader(path)
+    assert len(reader) == 1
+    assert (reader[0] == np.arange(16).reshape(4, 4)).all()
+    # A view-decoded frame is a copy, not the read-only memmap
+    reader[0][0, 0] = 1
+
+
+def test_write_without_writev():
+    # Windows has no os.writev
+    writev = os.__dict__.pop("writev", None)
+    try:
+        path = os.path.join(tempfile.mkdtemp(), "a.hikraw")
+        bufs = [np.random.randint(0, 256, 16, np.uint8) for _ in range(2)]
+        with RawWriter(path, name_to_pixel_type["BayerRG8"], 4, 4) as writer:
+            for buf in bufs:
+                writer.write(buf, dict(frame_num=7))
+    finally:
+        if writev is not None:
+            os.writev = writev
+    reader = RawReader(path)
+    assert len(reader) == 2 and list(reader.infos["frame_num"]) == [7, 7]
+    for i, buf in enumerate(bufs):
+        assert (reader.get_raw(i) == buf).all()
+
+
+def test_cam_open_raw_writer():
+    path = os.path.join(tempfile.mkdtemp(), "cam.hikraw")
+    cam = fake_mvs.new_camera("10.120.0.2", setting=HikCamera.set_raw)
+    with cam, cam.open_raw_writer(path) as writer:
+        raws, frame_nums = [], []
+        for i in range(3):
+            cam.get_frame_with_config()
+            writer.write(cam.data_arr, cam.stFrameInfo)
+            raws.append(cam._decode_frame(cam.data_arr).copy())
+            frame_nums.append(cam.stFrameInfo.nFrameNum)
+    reader = RawReader(path)
+    assert reader.header["pixel_format"] == "BayerRG12Packed" and reader.pattern == "RGGB"
+    assert list(reader.infos["frame_num"]) == frame_nums
+    for i in range(3):
+        assert (reader[i] == raws[i]).all()
+    assert (reader.infos["exposure"] > 0).all()
+
+
+def benchmark(shape=(3036, 4024), n=20):
+    """
+    12 MP Bayer12Packed: write throughput, and time to open the file and read a random frame.
+    """
+    h, w = shape
+    path = os.path.join(tempfile.mkdtemp(), "bench.hikraw")
+    buf = np.random.randint(0, 256, h * w * 3 // 2, np.uint8)
+    begin = time.time()
+    with RawWriter(path, name_to_pixel_type["BayerRG12Packed"], h, w, "RGGB") as writer:
+        for i in range(n):
+            writer.write(buf)
+    spend = time.time() - begin
+    print(f"write: {spend / n * 1e3:.1f}ms per frame, {os.path.getsize(path) / n / 1e6:.1f} MB per frame")
+    begin = time.time()
+    reader = RawReader(path)
+    opened = time.time()
+    reader[n // 2]
+    print(f"open: {(opened - begin) * 1e3:.2f}ms, random frame decode: {(time.time() - opened) * 1e3:.1f}ms")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.hik_camera import HikCamera
+from hik_camera.raw_pipeline import FastRawToRgb, get_lut, get_raw_converter
+
+patterns = ["RGGB", "BGGR", "GRBG", "GBRG"]
+
+
+def mosaic(rgb, pattern):
+    raw = np.empty(rgb.shape[:2], rgb.dtype)
+    for i, c in enumerate(pattern):
+        raw[i // 2 :: 2, i % 2 :: 2] = rgb[i // 2 :: 2, i % 2 :: 2, "RGB".index(c)]
+    return raw
+
+
+def reference_bilinear(raw, pattern):
+    # Normalized convolution of each colour plane, in float
+    h, w = raw.shape
+    kernels = dict(
+        G=np.array([[0, 1, 0], [1, 4, 1], [0, 1, 0]]) / 4,
+        RB=np.array([[1, 2, 1], [2, 4, 2], [1, 2, 1]]) / 4,
+    )
+    rgb = np.zeros((h, w, 3))
+    for ch, c in enumerate("RGB"):
+        mask = np.zeros((h, w))
+        for i, cc in enumerate(pattern):
+            if cc == c:
+                mask[i // 2 :: 2, i % 2 :: 2] = 1
+        kernel = kernels["G" if c == "G" else "RB"]
+        values = np.pad(raw * mask, 1, mode="reflect")
+        weights = np.pad(mask, 1, mode="reflect")
+        num, den = np.zeros((h, w)), np.zeros((h, w))
+        for dy in range(3):
+            for dx in range(3):
+                num += kernel[dy, dx] * values[dy : dy + h, dx : dx + w]
+                den += kernel[dy, dx] * weights[dy : dy + h, dx : dx + w]
+        rgb[..., ch] = num / den
+    return rgb
+
+
+def test_lut():
+    lut = get_lut(12, 0.5)
+    assert lut.shape == (4096,) and lut[0] == 0 and lut[-1] == 255
+    assert lut[1024] == round((1024 / 4095) ** 0.5 * 255)
+
+
+def test_flat_field():
+    rgb = np.empty((8, 10, 3), np.uint16)
+    rgb[:] = [1000, 2000, 3000]
+    for pattern in patterns:
+        out = FastRawToRgb(12, 1, pattern)(mosaic(rgb, pattern))
+        assert (out == get_lut(12, 1)[[1000, 2000, 3000]]).all(), pattern
+
+
+def test_matches_reference_bilinear():
+    rng = np.random.default_rng(0)
+    smooth = rng.integers(0, 4096, (6, 8, 3)).repeat(8, 0).repeat(8, 1)
+    for pattern in patterns:
+        raw = mosaic(smooth, pattern).astype(np.uint16)
+        expected = reference_bilinear(raw, pattern) / 4095 * 255
+        out = FastRawToRgb(12, 1, pattern)(raw)
+        assert np.abs(out - expected).max() <= 1.5, pattern
+
+
+def test_preallocated_out_and_cache():
+    raw = np.random.randint(0, 4096, (48, 64), np.uint16)
+    convert = get_raw_converter(12, 0.5, "RGGB", "fast")
+    assert convert is get_raw_converter(12, 0.5, "RGGB", "fast")
+    out = np.empty((48, 64, 3), np.uint8)
+    assert convert(raw, out) is out
+    assert (convert(raw) == out).all()
+
+
+def test_cam_raw_to_uint8_rgb():
+    cam = fake_mvs.new_camera("10.120.0.2", setting=HikCamera.set_raw)
+    with cam:
+        raw = cam.get_frame()
+        rgb = cam.raw_to_uint8_rgb(raw, poww=0.5, demosaicing_method="fast")
+        assert rgb.shape == raw.shape + (3,) and rgb.dtype == np.uint8
+
+
+def benchmark(shape=(3036, 4024), repeat=3):
+    """
+    12 MP raw12 to uint8 RGB: fast path against process_raw Malvar2004.
+    """
+    raw = np.random.randint(0, 4096, shape, np.uint16)
+    out = np.empty(shape + (3,), np.uint8)
+    methods = ["fast", "Malvar2004"]
+    for method in methods:
+        try:
+            convert = get_raw_converter(12, 0.5, "RGGB", method)
+        except ImportError as e:
+            print(f"{method}: skipped, {e}")
+            continue
+        convert(raw)
+        begin = time.time()
+        for _ in range(repeat):
+            convert(raw, out) if method == "fast" else convert(raw)
+        print(f"{method}: {(time.time() - begin) / repeat * 1e3:.1f}ms per frame")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
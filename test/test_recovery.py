@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import socket
+import struct
+import threading
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.recovery import gvcp_probe
+
+ip = "10.70.0.2"
+
+
+def get_cam(**recovery):
+    return fake_mvs.new_camera(
+        ip,
+        setting=lambda cam: cam.setitem("Gain", 2.0),
+        recovery=dict(dict(backoff=0.001), **recovery),
+    )
+
+
+def test_levels():
+    cam = get_cam()
+    device = fake_mvs.get_device(ip)
+    device.reboot_s = 0.05
+    faults = [
+        ("retry", lambda: setattr(device, "fail_frames", 1)),
+        ("restart_grabbing", lambda: setattr(device, "stalled", True)),
+        ("reopen", lambda: setattr(cam, "broken", True)),
+        ("device_reset", lambda: setattr(device, "hung", True)),
+    ]
+    with cam:
+        for level, inject in faults:
+            inject()
+            assert cam.robust_get_frame().shape == (48, 64, 3)
+            assert cam.get_recovery_stats()["last_incident"]["recovered_by"] == level
+            # Settings are back after reopen and reset
+            assert cam["Gain"] == 2.0
+        stats = cam.get_recovery_stats()
+    assert stats["incidents"] == 4 and stats["unrecovered"] == 0
+    assert stats["levels"]["retry"] == dict(
+        attempts=4, successes=1, spend=stats["levels"]["retry"]["spend"]
+    )
+    assert stats["levels"]["device_reset"]["successes"] == 1
+
+
+def test_budget_exhausted():
+    cam = get_cam(budgets=dict(retry=3, device_reset=0))
+    device = fake_mvs.get_device(ip)
+    with cam:
+        device.hung = True
+        try:
+            cam.robust_get_frame()
+        except AssertionError:
+            pass
+        else:
+            raise AssertionError("should raise after all levels failed")
+        stats = cam.get_recovery_stats()
+        assert stats["unrecovered"] == 1
+        assert stats["last_incident"]["attempts"] == 3 + 1 + 1 + 1
+        assert stats["levels"]["device_reset"]["attempts"] == 0
+        device.hung = False
+
+
+def test_backoff():
+    cam = get_cam(budgets=dict(retry=4), backoff=0.01, backoff_factor=2)
+    device = fake_mvs.get_device(ip)
+    with cam:
+        device.fail_frames = 4
+        cam.robust_get_frame()
+        # 0.01 + 0.02 + 0.04 + 0.08
+        assert 0.15 <= cam.get_recovery_stats()["last_incident"]["spend"] < 0.5
+
+
+def test_probe_timeout():
+    cam = get_cam(budgets=dict(device_reset=0), probe_timeout_ms=50)
+    device = fake_mvs.get_device(ip)
+    with cam:
+        cam.TIMEOUT_MS = 300
+        # Triggers are lost, every grab waits for its whole timeout
+        device.trigger = lambda: None
+        begin = time.time()
+        try:
+            cam.robust_get_frame()
+            raise ValueError("Should raise after all levels failed")
+        except AssertionError:
+            pass
+        spend = time.time() - begin
+        del device.trigger
+        levels = cam.get_recovery_stats()["levels"]
+    # 300ms for the first grab, then 50ms per level instead of TIMEOUT_MS
+    assert spend < 0.3 + 4 * 0.2, spend
+    for level in ["retry", "clear_buffer", "restart_grabbing", "reopen"]:
+        assert levels[level]["attempts"] == 1 and levels[level]["spend"] < 0.2, level
+
+
+def test_unreachable_escalates():
+    cam = get_cam(budgets=dict(device_reset=0))
+    device = fake_mvs.get_device(ip)
+    with cam:
+        device.connected = False
+        try:
+            cam.robust_get_frame()
+            raise ValueError("Should raise while the camera is unreachable")
+        except AssertionError:
+            pass
+        device.connected = True
+        stats = cam.get_recovery_stats()
+        cam._recover_reopen()
+    # Nothing to do on the open connection, straight to reopen
+    assert [level for level, s in stats["levels"].items() if s["attempts"]] == ["reopen"]
+    assert stats["last_incident"]["attempts"] == 1
+
+
+def gvcp_responder(sock):
+    data, addr = sock.recvfrom(1024)
+    key, flags, command, length, req_id = struct.unpack(">BBHHH", data[:8])
+    assert key == 0x42 and command == 0x0002
+    sock.sendto(struct.pack(">HHHH", 0, 0x0003, 0, req_id) + bytes(248), addr)
+
+
+def test_gvcp_probe():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        thread = threading.Thread(target=gvcp_responder, args=(sock,))
+        thread.start()
+        assert gvcp_probe("127.0.0.1", port=port)
+        thread.join()
+        # Nobody answers now
+        begin = time.time()
+        assert not gvcp_probe("127.0.0.1", timeout=0.05, port=port)
+        assert time.time() - begin < 0.5
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    cam = get_cam()
+    with cam:
+        for fault in ["fail_frames", "stalled"]:
+            setattr(fake_mvs.get_device(ip), fault, 1)
+            begin = time.time()
+            cam.robust_get_frame()
+            level = cam.get_recovery_stats()["last_incident"]["recovered_by"]
+            print(f"{fault}: recovered by {level} in {(time.time() - begin) * 1e3:.1f}ms")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.sequence_recorder import SequenceReader, SequenceRecorder
+
+ips = ["10.130.0.%d" % i for i in range(2, 5)]
+
+
+def get_cams():
+    return fake_mvs.new_cameras(ips)
+
+
+def record(recorder, cams, n):
+    frames, times = [], []
+    for _ in range(n):
+        recorder.capture(cams)
+        # What was written: the frame left in each camera's buffer
+        frames.append({ip: cam._decode_frame(cam.data_arr).copy() for ip, cam in cams.items()})
+        times.append(time.time())
+        time.sleep(0.01)
+    return frames, times
+
+
+def test_record_and_query():
+    dirr = tempfile.mkdtemp()
+    cams = get_cams()
+    with cams, SequenceRecorder(dirr, segment_bytes=1 << 20) as recorder:
+        frames, times = record(recorder, cams, 5)
+    # The preallocated tail of the last segment is given back
+    assert os.path.getsize(os.path.join(dirr, "00000001.seg")) == recorder.stats["bytes"]
+    reader = SequenceReader(dirr)
+    assert len(reader) == 15 and sorted(reader.cameras) == ips
+    for i, t in enumerate(times):
+        entries = reader.query(t - 0.002)
+        assert sorted(entries) == ips
+        assert len({entry["frame_num"] for entry in entries.values()}) == 1
+        synced = reader.get_synced(t - 0.002)
+        for ip in ips:
+            assert (synced[ip] == frames[i][ip]).all()
+    assert reader.query(times[-1] + 100, max_skew=1) == {}
+
+
+def test_rotate_and_evict():
+    dirr = tempfile.mkdtemp()
+    cams = get_cams()
+    frame_bytes = 64 * 48 * 3
+    segment_bytes = frame_bytes * 4
+    with cams, SequenceRecorder(
+        dirr, segment_bytes=segment_bytes, disk_budget=segment_bytes * 3
+    ) as recorder:
+        _, times = record(recorder, cams, 10)
+    assert recorder.stats["evicted"] > 0
+    segments = SequenceReader.list_segments(dirr)
+    total = sum(os.path.getsize(os.path.join(dirr, f"{sid:08d}.seg")) for sid in segments)
+    assert total <= segment_bytes * 3
+    reader = SequenceReader(dirr)
+    # The oldest frames are gone, the nearest are the first frames kept
+    assert len(reader) == total // frame_bytes < 30
+    entries = reader.query(times[0])
+    assert min(entry["host_time"] for entry in entries.values()) > times[0]
+    assert sorted(reader.query(times[-1])) == ips
+
+
+def test_record_without_pwrite():
+    # Windows has no os.pwrite
+    pwrite = os.__dict__.pop("pwrite", None)
+    dirr = tempfile.mkdtemp()
+    cams = get_cams()
+    try:
+        with cams, SequenceRecorder(dirr, segment_bytes=1 << 20) as recorder:
+            frames, times = record(recorder, cams, 3)
+    finally:
+        if pwrite is not None:
+            os.pwrite = pwrite
+    reader = SequenceReader(dirr)
+    assert len(reader) == 9
+    synced = reader.get_synced(times[-1] - 0.002)
+    for ip in ips:
+        assert (synced[ip] == frames[-1][ip]).all()
+
+
+def test_append_to_existing_directory():
+    dirr = tempfile.mkdtemp()
+    cams = get_cams()
+    with cams:
+        with SequenceRecorder(dirr, segment_bytes=1 << 20) as recorder:
+            record(recorder, cams, 2)
+        with SequenceRecorder(dirr, segment_bytes=1 << 20) as recorder:
+            record(recorder, cams, 2)
+    assert SequenceReader.list_segments(dirr) == [1, 2]
+    assert len(SequenceReader(dirr)) == 12
+
+
+def benchmark(n_cams=4, shape=(3036, 4024), n=10):
+    """
+    Write throughput of 12 MP Bayer12Packed frames of several cameras from their own threads.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    class Info:
+        nHeight, nWidth, enPixelType = shape[0], shape[1], 0x010C002B
+        nDevTimeStampHigh = nDevTimeStampLow = nFrameNum = 0
+
+    buf = np.random.randint(0, 256, shape[0] * shape[1] * 3 // 2, np.uint8)
+    dirr = tempfile.mkdtemp()
+    with SequenceRecorder(dirr, segment_bytes=1 << 30) as recorder:
+        begin = time.time()
+        with ThreadPoolExecutor(n_cams) as pool:
+            list(pool.map(lambda i: recorder.write(f"cam{i % n_cams}", buf, Info), range(n * n_cams)))
+        spend = time.time() - begin
+    print(
+        f"{n * n_cams} frames of {n_cams} cameras: {spend / n / n_cams * 1e3:.1f}ms per frame, "
+        f"{recorder.stats['bytes'] / spend / 1e6:.0f} MB/s"
+    )
+    begin = time.time()
+    reader = SequenceReader(dirr)
+    print(f"open index of {len(reader)} frames: {(time.time() - begin) * 1e3:.2f}ms")
+    for sid in SequenceReader.list_segments(dirr):
+        os.remove(os.path.join(dirr, f"{sid:08d}.seg"))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera.hik_camera import HikCamera
+
+ip = "10.50.0.2"
+
+
+class SettingCamera(HikCamera):
+    def setting(self):
+        self.setitem("ExposureAuto", "Off")
+        self.setitem("ExposureTime", 5000.1)
+        self.setitem("Gain", 3.0)
+        self.setitem("GevSCPD", 1000)
+        self.setitem("DeviceUserID", "left")
+
+
+def get_cam():
+    return fake_mvs.new_camera(ip, SettingCamera)
+
+
+def test_snapshot_records_writes_in_order():
+    cam = get_cam()
+    with cam:
+        snapshot = cam.settings_snapshot
+        assert list(snapshot)[-5:] == [
+            "ExposureAuto",
+            "ExposureTime",
+            "Gain",
+            "GevSCPD",
+            "DeviceUserID",
+        ]
+        assert snapshot["ExposureAuto"] == "Off" and snapshot["DeviceUserID"] == b"left"
+    # __exit__ turns trigger mode off, that is not part of the configuration
+    assert cam.settings_snapshot["TriggerMode"] == 1
+
+
+def test_reopen_writes_nothing():
+    cam = get_cam()
+    with cam:
+        pass
+    device = fake_mvs.get_device(ip)
+    device.write_count = 0
+    with cam:
+        # TriggerMode/AcquisitionFrameRateEnable changed by __exit__ are written back,
+        # and ExposureAuto, written by name but read back as an integer
+        assert sorted(cam.last_restore_info["written"]) == [
+            "AcquisitionFrameRateEnable",
+            "ExposureAuto",
+            "TriggerMode",
+        ]
+        assert device.write_count == 3
+        # The recorded nodes are read back, the device may have changed while closed
+        assert cam.last_restore_info["read"] == list(cam.settings_snapshot)
+        assert cam.get_frame().shape
+
+
+def test_reopen_after_power_loss():
+    cam = get_cam()
+    with cam:
+        device = fake_mvs.get_device(ip)
+        # PoE blip: the device is back to its factory settings
+        device.nodes.update(device.defaults)
+        cam._recover_reopen()
+        assert cam["TriggerMode"] == 1 and cam["ExposureAuto"] == 0
+        assert cam["Gain"] == 3.0 and cam["DeviceUserID"] == b"left"
+        assert abs(cam["ExposureTime"] - 5000.1) < 1e-2
+        assert cam.get_frame().shape
+    # Changed by another process (e.g. MVS GUI) between __exit__ and __enter__
+    device.nodes["Gain"] = 10.0
+    with cam:
+        assert "Gain" in cam.last_restore_info["written"] and cam["Gain"] == 3.0
+
+
+def device_reset(cam):
+    # HikCamera.reset without waiting for the camera to reboot
+    cam.MV_CC_SetCommandValue("DeviceReset")
+    cam._on_device_reset()
+    cam._init()
+    cam.__enter__()
+
+
+def test_reset_restores_only_diff():
+    cam = get_cam()
+    with cam:
+        for i in range(2):
+            device_reset(cam)
+            info = cam.last_restore_info
+            # Defaults are read after the first reset only
+            assert len(info["read"]) == (len(cam.settings_snapshot) if i == 0 else 0)
+            assert set(info["written"]) == {
+                "TriggerMode",
+                "AcquisitionFrameRateEnable",
+                "ExposureAuto",
+                "ExposureTime",
+                "Gain",
+                "GevSCPD",
+                "DeviceUserID",
+            }
+            # In the order of the original writes: ExposureAuto off before ExposureTime
+            assert info["written"].index("ExposureAuto") < info["written"].index("ExposureTime")
+            assert cam["ExposureAuto"] == 0 and cam["Gain"] == 3.0
+            assert abs(cam["ExposureTime"] - 5000.1) < 1e-2
+
+
+class DirectCamera(HikCamera):
+    def setting(self):
+        self.n_setting = getattr(self, "n_setting", 0) + 1
+        self.set_exposure_by_second(0.023)
+        # Written past setitem, not in the snapshot
+        assert not self.MV_CC_SetIntValue("GevSCPD", 1234)
+
+
+def test_setting_survives_reset():
+    cam = fake_mvs.new_camera(ip, DirectCamera)
+    # The fake cameras do not go down on DeviceReset
+    cam.RESET_DOWN_TIMEOUT = 0
+    with cam:
+        assert cam["ExposureTime"] == 23000
+        cam.reset()
+        assert cam["ExposureTime"] == 23000 and cam["ExposureAuto"] == 0
+        assert cam["GevSCPD"] == 1234
+        # setting() runs again, its side effects are redone
+        assert cam.n_setting == 2
+        assert "ExposureTime" in cam.last_restore_info["written"]
+        cam.__exit__()
+        device = fake_mvs.get_device(ip)
+        device.write_count = 0
+        cam.__enter__()
+        # Reopen: ExposureTime is known to be set, only the direct write is repeated
+        assert "ExposureTime" not in cam.last_restore_info["written"]
+        assert device.write_count == 1 + len(cam.last_restore_info["written"])
+
+
+def test_full_configure_without_fast_restore():
+    cam = get_cam()
+    cam.config = dict(fast_restore=False)
+    with cam:
+        pass
+    with cam:
+        assert not hasattr(cam, "last_restore_info")
+
+
+def benchmark(register_latency=0.002, repeat=3):
+    """
+    Reopen and reset time with full configuration against diff restore, with simulated GVCP latency.
+    """
+    for fast_restore in [False, True]:
+        cam = get_cam()
+        cam.config = dict(fast_restore=fast_restore)
+        fake_mvs.get_device(ip).register_latency = register_latency
+        with cam:
+            pass
+        for name in ["reopen", "reset"]:
+            best = float("inf")
+            for _ in range(repeat):
+                begin = time.time()
+                if name == "reopen":
+                    cam.__enter__()
+                else:
+                    device_reset(cam)
+                best = min(best, time.time() - begin)
+                cam.__exit__()
+            print(f"fast_restore={fast_restore}: {name} {best * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
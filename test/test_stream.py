@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+ip = "10.140.0.2"
+
+
+def get_cam(**config):
+    return fake_mvs.new_camera(ip, setting=fake_mvs.fixed_exposure, **config)
+
+
+def assert_software_trigger(cam):
+    assert cam.getitem("TriggerMode") == 1 and cam._grabbing
+    # The camera is usable again after the stream
+    assert cam.get_frame().shape == (48, 64, 3)
+
+
+def test_image_buffers_are_freed():
+    with get_cam() as cam:
+        n = 0
+        for img in cam.stream():
+            # The frame was copied out of the SDK buffer, which is already given back
+            assert not cam._sdk_bufs and img.shape == (48, 64, 3)
+            n += 1
+            if n == 5:
+                break
+        assert not cam._sdk_bufs
+        assert_software_trigger(cam)
+
+
+def test_decode_error_frees_image_buffer():
+    with get_cam() as cam:
+
+        def decode_detached(pData, frame_info):
+            raise ValueError("decode")
+
+        cam._decode_detached = decode_detached
+        try:
+            next(cam.stream())
+            raise AssertionError("Should raise the decode error")
+        except ValueError:
+            pass
+        del cam._decode_detached
+        assert not cam._sdk_bufs
+        assert_software_trigger(cam)
+
+
+def test_trigger_mode_restored():
+    with get_cam() as cam:
+        # Early break, the generator is closed as soon as it is dropped
+        for img in cam.stream(fps=30):
+            assert cam.getitem("TriggerMode") == 0
+            assert cam.getitem("AcquisitionFrameRate") == 30
+            break
+        assert_software_trigger(cam)
+        # Explicit close
+        frames = cam.stream()
+        next(frames)
+        frames.close()
+        assert_software_trigger(cam)
+        # Exception in the consumer
+        try:
+            for img in cam.stream():
+                raise KeyError("consumer")
+        except KeyError:
+            pass
+        assert_software_trigger(cam)
+
+
+def test_grab_timeout_restores_trigger_mode():
+    with get_cam() as cam:
+        frames = cam.stream()
+        next(frames)
+        fake_mvs.get_device(ip).fail_frames = 1
+        try:
+            next(frames)
+            raise ValueError("Should fail on MV_E_NODATA")
+        except AssertionError:
+            pass
+        assert not cam._sdk_bufs
+        assert_software_trigger(cam)
+
+
+def test_backpressure():
+    with get_cam() as cam:
+        for backpressure, strategy in [
+            ("drop_oldest", fake_mvs.MV_GrabStrategy_LatestImages),
+            ("block", fake_mvs.MV_GrabStrategy_OneByOne),
+        ]:
+            frames = cam.stream(node_num=4, backpressure=backpressure)
+            next(frames)
+            assert cam.grab_strategy == strategy and cam.image_node_num == 4
+            if backpressure == "drop_oldest":
+                assert cam.output_queue_size == 4
+            frames.close()
+        # get_frame runs with the buffers of a new handle again
+        assert (cam.image_node_num, cam.grab_strategy, cam.output_queue_size) == (
+            1,
+            fake_mvs.MV_GrabStrategy_OneByOne,
+            1,
+        )
+        # Buffers set by the caller are kept
+        cam.MV_CC_StopGrabbing()
+        cam._set_grab_buffers(3, fake_mvs.MV_GrabStrategy_OneByOne)
+        cam.MV_CC_StartGrabbing()
+        for img in cam.stream(node_num=6):
+            assert cam.image_node_num == 6
+            break
+        assert cam.image_node_num == 3 and cam.grab_strategy == 0
+        try:
+            next(cam.stream(backpressure="newest"))
+            raise ValueError("Unknown backpressure should be rejected")
+        except AssertionError:
+            pass
+        assert_software_trigger(cam)
+
+
+def test_stream_with_buffer_pool():
+    with get_cam(buffer_pool=2) as cam:
+        n = 0
+        for img in cam.stream():
+            assert cam.buffer_pool.slot_of(img) is not None
+            cam.release_frame(img)
+            n += 1
+            if n == 5:
+                break
+        assert cam.buffer_pool.n_free == 2
+
+
+def benchmark(n=200):
+    with get_cam() as cam:
+        begin = time.perf_counter()
+        for i, img in enumerate(cam.stream()):
+            if i == n:
+                break
+        print(f"stream: {(time.perf_counter() - begin) / n * 1000:.3f}ms per frame")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    benchmark()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import threading
+import time
+
+import fake_mvs
+
+fake_mvs.install()
+
+import test_base
+
+from hik_camera import transfer_scheduler
+from hik_camera.transfer_scheduler import TransferScheduler, compute_slots, get_scheduler
+
+
+def run_cameras(scheduler, n_cam, n_frame, cam_mbps, spend=0.02):
+    order = []
+
+    def grab(cam):
+        for _ in range(n_frame):
+            with scheduler.transfer(cam, cam_mbps):
+                order.append(cam)
+                time.sleep(spend)
+
+    threads = [threading.Thread(target=grab, args=(i,)) for i in range(n_cam)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    return order
+
+
+def test_compute_slots():
+    assert compute_slots(10000, 2500) == 3
+    assert compute_slots(10000, 1000) == 9
+    assert compute_slots(1000, 1000) == 1
+    assert compute_slots(1000, 10000) == 1
+
+
+def test_concurrency_limit():
+    scheduler = TransferScheduler("10.0.0.1", 10000)
+    run_cameras(scheduler, 6, 3, 2500)
+    assert scheduler.peak_active == 3
+    assert scheduler.active == 0 and scheduler.reserved == 0
+    stats = scheduler.get_stats()
+    assert set(stats["per_camera"]) == set(range(6))
+    assert stats["wait_max"] > 0
+
+
+def test_round_robin():
+    scheduler = TransferScheduler("10.0.0.1", 1000)
+    hold = scheduler.acquire("busy", 1000)
+    order = []
+
+    def grab(cam):
+        ticket = scheduler.acquire(cam, 1000)
+        order.append(cam)
+        scheduler.release(ticket)
+
+    threads = []
+    for cam in ["a", "a", "b", "b"]:
+        # a, a, b, b queue up behind "busy"
+        threads.append(threading.Thread(target=grab, args=(cam,)))
+        threads[-1].start()
+        time.sleep(0.02)
+    scheduler.release(hold)
+    [t.join() for t in threads]
+    assert order == ["a", "b", "a", "b"], order
+
+
+def test_timeout():
+    scheduler = TransferScheduler("10.0.0.1", 1000)
+    hold = scheduler.acquire("a", 1000)
+    try:
+        scheduler.acquire("b", 1000, timeout=0.05)
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("should raise TimeoutError")
+    scheduler.release(hold)
+    # The timed out ticket must not hold the queue
+    scheduler.release(scheduler.acquire("c", 1000, timeout=0.05))
+
+
+def test_get_frame_with_scheduler():
+    ips = ["10.20.0.%d" % i for i in range(2, 6)]
+    cams = fake_mvs.new_cameras(ips, transfer_scheduler=True, nic_mbps=3000)
+    with cams:
+        for _ in range(3):
+            cams.get_frame()
+    stats = cams[ips[0]].get_transfer_stats()
+    assert stats["nic_mbps"] == 3000
+    assert sorted(stats["per_camera"]) == ips
+    assert all(s["n"] == 3 for s in stats["per_camera"].values())
+
+
+def test_reserve_by_payload():
+    scheduler = TransferScheduler("10.0.0.1", 1000)
+    # 1 MB at 1000 Mbps is 8ms on the wire after 20ms of exposure
+    hold = scheduler.acquire("a", 1000, nbytes=1e6, lead=0.02)
+    try:
+        scheduler.acquire("b", 1000, timeout=0.01)
+        raise AssertionError("The NIC is still reserved")
+    except TimeoutError:
+        pass
+    # "a" still waits for its SDK buffer but no longer holds the NIC
+    begin = time.perf_counter()
+    ticket = scheduler.acquire("b", 1000, timeout=1)
+    assert 0.015 < time.perf_counter() - begin < 0.2
+    assert scheduler.active == 2 and scheduler.reserved == 900
+    scheduler.release(hold)
+    scheduler.release(ticket)
+    assert scheduler.active == 0 and scheduler.reserved == 0
+    # Small frames overlap, where a flat reservation runs them one at a time
+    for nbytes, peak in [(None, 1), (1e4, 4)]:
+        scheduler = TransferScheduler("10.0.0.1", 1000)
+
+        def grab(cam):
+            for _ in range(5):
+                with scheduler.transfer(cam, 1000, nbytes):
+                    time.sleep(0.02)
+
+        threads = [threading.Thread(target=grab, args=(i,)) for i in range(4)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        assert scheduler.peak_active == peak, (nbytes, scheduler.peak_active)
+
+
+def test_get_scheduler_nic_mbps():
+    host_ip = "10.30.0.1"
+    scheduler = get_scheduler(host_ip, 2500)
+    assert get_scheduler(host_ip) is scheduler
+    assert get_scheduler(host_ip, 2500) is scheduler
+    try:
+        get_scheduler(host_ip, 10000)
+        raise AssertionError("A different nic_mbps should be rejected")
+    except ValueError as e:
+        assert "2500" in str(e)
+
+
+def test_unknown_nic_speed_is_reported():
+    get_nic_speed_mbps = transfer_scheduler.get_nic_speed_mbps
+    transfer_scheduler.get_nic_speed_mbps = lambda host_ip: None
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            assert get_scheduler("10.30.1.1").nic_mbps == 1000
+    finally:
+        transfer_scheduler.get_nic_speed_mbps = get_nic_speed_mbps
+    assert "10.30.1.1" in out.getvalue() and "psutil" in out.getvalue()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+    print("All tests passed")
+    for cam_mbps in [10000, 2500]:
+        scheduler = TransferScheduler("10.0.0.1", 10000)
+        begin = time.time()
+        run_cameras(scheduler, 6, 10, cam_mbps, spend=0.03)
+        stats = scheduler.get_stats()
+        print(
+            f"6 cams of {cam_mbps}Mbps on 10GbE: {time.time() - begin:.2f}s, "
+            f"peak_active={stats['peak_active']}, wait_mean={stats['wait_mean'] * 1e3:.1f}ms"
+        )